@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Admission control for Edge Foundry
+Bounds how many inference requests may be outstanding per model and sheds
+requests that cannot start in time, so bursts fail fast with a retry hint
+instead of queueing until clients time out.
+"""
+
+import logging
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is refused; retry_after is a hint in whole seconds"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    """
+    One admitted request. Run its job through call() or stream() so it is shed if it
+    waited too long and released when it finishes; release() is safe to call again.
+    """
+
+    def __init__(self, controller: "AdmissionController", model_key: str, weight: int):
+        self.controller = controller
+        self.model_key = model_key
+        self.weight = weight
+        self.admitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self._released = False
+
+    def start(self):
+        """Mark the job as running; raises AdmissionRejected if it waited past max_wait_ms"""
+        self.controller._start(self)
+
+    def release(self):
+        """Give the ticket's queue slots back"""
+        self.controller._release(self)
+
+    def abandon(self):
+        """Release the ticket only if its job never started, e.g. because the caller went away"""
+        self.controller._release(self, only_waiting=True)
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking job under this ticket"""
+        try:
+            self.start()
+            return fn(*args, **kwargs)
+        finally:
+            self.release()
+
+    def stream(self, fn: Callable[..., Iterable[Any]], *args, **kwargs) -> Iterator[Any]:
+        """Run a streaming job under this ticket, relaying what it yields"""
+        try:
+            self.start()
+            yield from fn(*args, **kwargs)
+        finally:
+            self.release()
+
+
+class AdmissionController:
+    """
+    Per-model bounded queues with a depth limit and a maximum queue wait.
+    A limit of None leaves that dimension unbounded.
+    """
+
+    def __init__(self, max_queue_depth: Optional[int] = 16, max_wait_ms: Optional[float] = 30000,
+                 concurrency: int = 1, overrides: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.max_queue_depth = max_queue_depth
+        self.max_wait_ms = max_wait_ms
+        self.concurrency = max(1, concurrency)
+        # Per-model max_queue_depth / max_wait_ms
+        self.overrides = overrides or {}
+        self._lock = threading.Lock()
+        self._queues: Dict[str, Dict[str, Any]] = {}
+
+    def _limits(self, model_key: str):
+        override = self.overrides.get(model_key, {}) or {}
+        return (
+            override.get("max_queue_depth", self.max_queue_depth),
+            override.get("max_wait_ms", self.max_wait_ms)
+        )
+
+    def _queue(self, model_key: str) -> Dict[str, Any]:
+        queue = self._queues.get(model_key)
+        if queue is None:
+            queue = {
+                "waiting": 0,
+                "running": 0,
+                "admitted": 0,
+                "completed": 0,
+                "rejected": 0,
+                "shed": 0,
+                "total_wait_ms": 0.0,
+                "started": 0,
+                # Moving average of service time per request, used for Retry-After
+                "avg_service_ms": None
+            }
+            self._queues[model_key] = queue
+        return queue
+
+    def _retry_after(self, queue: Dict[str, Any], model_key: str) -> int:
+        """Seconds until the queue has likely drained enough to take another request"""
+        service_ms = queue["avg_service_ms"] or (self._limits(model_key)[1] or 10000) / 10
+        outstanding = queue["waiting"] + queue["running"]
+        return max(1, math.ceil(service_ms * outstanding / self.concurrency / 1000))
+
+    def admit(self, model_key: str, weight: int = 1) -> AdmissionTicket:
+        """
+        Take weight queue slots for a model.
+        Raises AdmissionRejected if the model's queue is full or the expected wait
+        already exceeds max_wait_ms.
+        """
+        max_depth, max_wait_ms = self._limits(model_key)
+        with self._lock:
+            queue = self._queue(model_key)
+            outstanding = queue["waiting"] + queue["running"]
+            # An idle queue always takes a request, however heavy (e.g. a large batch)
+            if max_depth is not None and outstanding and outstanding + weight > max_depth:
+                queue["rejected"] += weight
+                raise AdmissionRejected(
+                    f"Queue for model {model_key} is full ({outstanding}/{max_depth} requests)",
+                    self._retry_after(queue, model_key)
+                )
+
+            # Shed up front when the backlog alone would blow the wait budget
+            if max_wait_ms is not None and queue["avg_service_ms"] is not None:
+                expected_wait_ms = queue["avg_service_ms"] * outstanding / self.concurrency
+                if expected_wait_ms > max_wait_ms:
+                    queue["rejected"] += weight
+                    raise AdmissionRejected(
+                        f"Expected wait for model {model_key} is {expected_wait_ms:.0f}ms, "
+                        f"over the {max_wait_ms:.0f}ms limit",
+                        self._retry_after(queue, model_key)
+                    )
+
+            queue["waiting"] += weight
+            queue["admitted"] += weight
+        return AdmissionTicket(self, model_key, weight)
+
+    def _start(self, ticket: AdmissionTicket):
+        _, max_wait_ms = self._limits(ticket.model_key)
+        now = time.time()
+        wait_ms = (now - ticket.admitted_at) * 1000
+        with self._lock:
+            if ticket._released:
+                raise AdmissionRejected("Request was abandoned before it started", 1)
+            if ticket.started_at is not None:
+                return
+            queue = self._queue(ticket.model_key)
+            if max_wait_ms is not None and wait_ms > max_wait_ms:
+                queue["shed"] += ticket.weight
+                retry_after = self._retry_after(queue, ticket.model_key)
+                raise AdmissionRejected(
+                    f"Request for model {ticket.model_key} waited {wait_ms:.0f}ms, "
+                    f"over the {max_wait_ms:.0f}ms limit",
+                    retry_after
+                )
+            ticket.started_at = now
+            queue["waiting"] -= ticket.weight
+            queue["running"] += ticket.weight
+            queue["started"] += ticket.weight
+            queue["total_wait_ms"] += wait_ms * ticket.weight
+
+    def _release(self, ticket: AdmissionTicket, only_waiting: bool = False):
+        with self._lock:
+            if ticket._released or (only_waiting and ticket.started_at is not None):
+                return
+            ticket._released = True
+            queue = self._queue(ticket.model_key)
+            if ticket.started_at is None:
+                queue["waiting"] -= ticket.weight
+                return
+
+            queue["running"] -= ticket.weight
+            queue["completed"] += ticket.weight
+            service_ms = (time.time() - ticket.started_at) * 1000 / ticket.weight
+            if queue["avg_service_ms"] is None:
+                queue["avg_service_ms"] = service_ms
+            else:
+                queue["avg_service_ms"] = 0.8 * queue["avg_service_ms"] + 0.2 * service_ms
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get depth, wait time and rejection counters per model"""
+        with self._lock:
+            stats = {}
+            for model_key, queue in self._queues.items():
+                max_depth, max_wait_ms = self._limits(model_key)
+                stats[model_key] = {
+                    "queue_depth": queue["waiting"],
+                    "running": queue["running"],
+                    "max_queue_depth": max_depth,
+                    "max_wait_ms": max_wait_ms,
+                    "admitted": queue["admitted"],
+                    "completed": queue["completed"],
+                    "rejected": queue["rejected"],
+                    "shed": queue["shed"],
+                    "avg_wait_ms": round(queue["total_wait_ms"] / queue["started"], 2) if queue["started"] else 0,
+                    "avg_service_ms": round(queue["avg_service_ms"] or 0, 2)
+                }
+            return stats
@@ -5,16 +5,34 @@ Exposes POST /inference endpoint for model inference with model switching suppor
 """
 
 import os
+import json
+import asyncio
 import time
 import logging
 import yaml
-from typing import Dict, Any, List, Optional
-from fastapi import FastAPI, HTTPException, Query
+import psutil
+import secrets
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Iterator, Tuple
+from fastapi import FastAPI, HTTPException, Query, Header, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+import llama_cpp
 from llama_cpp import Llama
-from telemetry import telemetry_db, get_memory_usage, count_tokens
-from model_manager import model_manager
+from telemetry import telemetry_db, TelemetryWriter, TelemetryCompactor, token_counts
+from model_manager import model_manager, ModelNotResidentError, format_prompt, stream_completion, perf_timings, trace_phases
+from inference_executor import InferenceExecutor, QueueFullError
+from response_cache import ResponseCache
+from admission import AdmissionController, AdmissionRejected, AdmissionTicket
+from prometheus import CONTENT_TYPE as PROMETHEUS_CONTENT_TYPE, InferenceMetrics
+from metrics_stream import MetricsBroadcaster
+from resource_sampler import ResourceSampler
+from profiler import (
+    DEFAULT_PROFILE_DIR, StackSampler, profile_call, profile_name, write_call_profile, write_sampled_profile
+)
+from telemetry_export import parse_time
+from tracing import JsonlSpanExporter, OtlpHttpSpanExporter, RingSpanExporter, TracingMiddleware, tracer
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -64,6 +82,138 @@ app.add_middleware(
 # Global model instance (for backward compatibility)
 model = None
 
+# Blocking model work runs here so the event loop keeps serving other endpoints.
+# llama.cpp contexts are not thread-safe, so one worker is the default unless a
+# model uses continuous batching, which needs one worker per concurrent sequence.
+executor_config = config.get("inference", {}) or {}
+inference_executor = InferenceExecutor(
+    max_workers=executor_config.get("workers", model_manager.get_max_concurrency()),
+    max_queue_size=executor_config.get("max_queue_size", 32)
+)
+
+# Per-model bounded queues in front of the executor; requests over the limits get a 429.
+# With admission disabled the queues are unbounded (limits of None, reported as null)
+# but still report depth and wait.
+admission_config = config.get("admission", {}) or {}
+admission_enabled = admission_config.get("enabled", True)
+admission = AdmissionController(
+    max_queue_depth=admission_config.get("max_queue_depth", 16) if admission_enabled else None,
+    max_wait_ms=admission_config.get("max_wait_ms", 30000) if admission_enabled else None,
+    concurrency=inference_executor.max_workers,
+    overrides={
+        model_id: model_config.get("admission")
+        for model_id, model_config in model_manager.demo_models.items()
+        if admission_enabled and model_config.get("admission")
+    }
+)
+
+# Telemetry is buffered and written in batches off the request path
+telemetry_config = config.get("telemetry", {}) or {}
+telemetry_writer = TelemetryWriter(
+    telemetry_db,
+    max_queue_size=telemetry_config.get("max_queue_size", 10000),
+    batch_size=telemetry_config.get("batch_size", 256),
+    flush_interval=telemetry_config.get("flush_interval_ms", 1000) / 1000,
+    when_full=telemetry_config.get("when_full", "drop")
+)
+
+# In-process counters for /metrics/prometheus, updated as requests finish
+inference_metrics = InferenceMetrics()
+
+# Gauges refreshed from live state at scrape time
+PROCESS = psutil.Process()
+queue_depth_gauge = inference_metrics.registry.gauge(
+    "edgefoundry_queue_depth", "Requests admitted and waiting", ["model"])
+running_gauge = inference_metrics.registry.gauge(
+    "edgefoundry_requests_running", "Requests generating now", ["model"])
+# Admission control keeps this count, so the collector mirrors it into a counter
+rejected_counter = inference_metrics.registry.counter(
+    "edgefoundry_requests_rejected_total", "Requests refused or shed by admission control", ["model"])
+executor_queue_gauge = inference_metrics.registry.gauge(
+    "edgefoundry_executor_queue_depth", "Jobs waiting for an inference worker")
+model_resident_gauge = inference_metrics.registry.gauge(
+    "edgefoundry_model_resident", "Models loaded in the resident pool", ["model"])
+model_load_gauge = inference_metrics.registry.gauge(
+    "edgefoundry_model_load_seconds", "Duration of the model's most recent load", ["model"])
+rss_gauge = inference_metrics.registry.gauge(
+    "edgefoundry_process_resident_memory_bytes", "Resident memory of the agent process")
+
+
+def collect_runtime_metrics():
+    """Refresh the scrape-time gauges; reads in-memory state only"""
+    for gauge in (queue_depth_gauge, running_gauge, model_resident_gauge, model_load_gauge):
+        gauge.clear()
+    for model_key, stats in admission.get_stats().items():
+        queue_depth_gauge.set(stats["queue_depth"], model=model_key)
+        running_gauge.set(stats["running"], model=model_key)
+        rejected_counter.set(stats["rejected"] + stats["shed"], model=model_key)
+    executor_queue_gauge.set(inference_executor.get_stats()["queue_depth"])
+    for resident in model_manager.get_pool_stats()["resident"]:
+        model_resident_gauge.set(1, model=resident["model_id"])
+        model_load_gauge.set(resident["load_seconds"], model=resident["model_id"])
+    rss_gauge.set(PROCESS.memory_info().rss)
+
+
+inference_metrics.registry.add_collector(collect_runtime_metrics)
+
+# Live summary pushed to dashboards over /metrics/stream, kept in memory; workers
+# started by `edgefoundry start --workers N` each see only their own inferences
+metrics_broadcaster = MetricsBroadcaster(
+    telemetry_db,
+    summary_interval=telemetry_config.get("stream_summary_interval_ms", 5000) / 1000,
+    worker=os.environ.get("EDGEFOUNDRY_WORKER_ID")
+)
+
+# Background time series of process and system resources, plus per-request peak RSS
+resource_config = telemetry_config.get("resources", {}) or {}
+resource_sampler = ResourceSampler(
+    telemetry_db,
+    interval=resource_config.get("interval_ms", 5000) / 1000,
+    include_mapped_files=resource_config.get("mapped_files", True)
+)
+
+# Profiling endpoints stay disabled until a debug token is configured
+debug_config = config.get("debug", {}) or {}
+DEBUG_TOKEN = os.environ.get("EDGEFOUNDRY_DEBUG_TOKEN") or debug_config.get("token") or None
+PROFILE_DIR = debug_config.get("profile_dir", DEFAULT_PROFILE_DIR)
+MAX_PROFILE_SECONDS = debug_config.get("max_profile_seconds", 60)
+profile_lock = asyncio.Lock()
+
+# Opt-in request tracing; the middleware is only installed when tracing is enabled
+tracing_config = config.get("tracing", {}) or {}
+TRACED_PATHS = ("/inference", "/inference/batch", "/inference/stream")
+if tracing_config.get("enabled", False):
+    span_exporters = [RingSpanExporter(tracing_config.get("ring_size", 2048))]
+    if tracing_config.get("jsonl_path"):
+        span_exporters.append(JsonlSpanExporter(tracing_config["jsonl_path"]))
+    if tracing_config.get("otlp_endpoint"):
+        span_exporters.append(OtlpHttpSpanExporter(
+            tracing_config["otlp_endpoint"],
+            service_name=tracing_config.get("service_name", "edgefoundry"),
+            headers=tracing_config.get("otlp_headers")
+        ))
+    tracer.configure(span_exporters, sample_ratio=tracing_config.get("sample_ratio", 1.0))
+    app.add_middleware(TracingMiddleware, tracer=tracer, paths=TRACED_PATHS)
+
+# Opt-in retention policy, applied by a background compaction thread
+retention_config = dict(telemetry_config.get("retention", {}) or {})
+telemetry_compactor = None
+if retention_config:
+    telemetry_compactor = TelemetryCompactor(
+        telemetry_db,
+        interval=retention_config.pop("compact_interval_minutes", 60) * 60,
+        **retention_config
+    )
+
+# Opt-in cache of responses to repeated deterministic requests
+cache_config = config.get("response_cache", {}) or {}
+response_cache = None
+if cache_config.get("enabled", False):
+    response_cache = ResponseCache(
+        max_bytes=cache_config.get("max_bytes", 64 * 1024 * 1024),
+        persist_path=cache_config.get("persist_path")
+    )
+
 
 class InferenceRequest(BaseModel):
     prompt: str
@@ -78,6 +228,25 @@ class InferenceResponse(BaseModel):
     model_info: Dict[str, Any]
 
 
+class BatchInferenceRequest(BaseModel):
+    items: List[InferenceRequest]
+
+
+class BatchInferenceItem(BaseModel):
+    index: int
+    response: Optional[str] = None
+    processing_time: Optional[float] = None
+    model_info: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+
+class BatchInferenceResponse(BaseModel):
+    results: List[BatchInferenceItem]
+    processing_time: float
+    succeeded: int
+    failed: int
+
+
 class ModelSwitchRequest(BaseModel):
     model_id: str
 
@@ -136,6 +305,32 @@ def load_model():
 async def startup_event():
     """Load model on startup"""
     load_model()
+    inference_executor.start()
+    telemetry_writer.start()
+    metrics_broadcaster.start()
+    resource_sampler.start()
+    if tracer.enabled:
+        tracer.start()
+    if telemetry_compactor is not None:
+        telemetry_compactor.start()
+    if response_cache is not None:
+        response_cache.load()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Drain queued inference jobs, flush telemetry and free loaded models before exiting"""
+    inference_executor.shutdown()
+    await metrics_broadcaster.stop()
+    resource_sampler.stop()
+    tracer.stop()
+    if telemetry_compactor is not None:
+        telemetry_compactor.stop()
+    telemetry_writer.stop()
+    telemetry_db.close()
+    if response_cache is not None:
+        response_cache.save()
+    model_manager.unload_all()
 
 
 @app.get("/")
@@ -150,6 +345,8 @@ async def health_check():
     return {
         "status": "healthy",
         "model_loaded": model is not None,
+        "inference_queue": inference_executor.get_stats(),
+        "model_pool": model_manager.get_pool_stats(),
         "config": config
     }
 
@@ -194,9 +391,27 @@ async def get_sample_prompts(model_id: str):
 
 @app.post("/demo-models/switch")
 async def switch_model(request: ModelSwitchRequest):
-    """Switch to a different demo model"""
+    """
+    Switch to a different demo model.
+    With model_switching.hot_swap enabled the model loads in the background while the
+    current one keeps serving, and a 202 with a pollable switch job is returned.
+    """
+    if model_manager.hot_swap_enabled():
+        if model_manager.get_model_config(request.model_id) is None:
+            raise HTTPException(status_code=400, detail=f"Unknown model: {request.model_id}")
+        job = model_manager.start_switch(request.model_id)
+        return JSONResponse(status_code=202, content={
+            "message": f"Switching to model: {request.model_id}",
+            "job": job,
+            "status_url": f"/demo-models/switch/{job['job_id']}"
+        })
+
     try:
-        success = model_manager.switch_model(request.model_id)
+        # Switch on the inference executor so the load queues behind jobs already waiting
+        # in this process. It is not serialized with generations on other executor threads
+        # or other worker processes (the dispatcher fans switches out to every worker);
+        # those keep the model they acquired until they finish.
+        success, _ = await inference_executor.run(model_manager.switch_model, request.model_id)
         if success:
             return {
                 "message": f"Successfully switched to model: {request.model_id}",
@@ -204,11 +419,46 @@ async def switch_model(request: ModelSwitchRequest):
             }
         else:
             raise HTTPException(status_code=400, detail=f"Failed to switch to model: {request.model_id}")
+    except HTTPException:
+        raise
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error switching model: {e}")
         raise HTTPException(status_code=500, detail=f"Error switching model: {str(e)}")
 
 
+@app.get("/demo-models/switch/{job_id}")
+async def get_switch_job(job_id: str):
+    """Get the status of a background model switch"""
+    job = model_manager.get_switch_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown switch job: {job_id}")
+    response = {"job": job}
+    if job["status"] == "completed":
+        response["current_model"] = model_manager.get_current_model_info()
+    return response
+
+
+async def ensure_model_resident(model_id: Optional[str]):
+    """
+    In hot-swap mode, load a requested model in the background before queueing work
+    for it, so inference workers keep serving the current model during the load.
+    """
+    if not model_id or not model_manager.hot_swap_enabled() or model_manager.is_resident(model_id):
+        return
+    with tracer.span("model_manager.hot_swap", model_id=model_id):
+        job = model_manager.start_switch(model_id)
+        future = model_manager.switch_future(job["job_id"])
+        if future is not None:
+            switched = await asyncio.wrap_future(future)
+        else:
+            # The job already finished and was pruned from the history
+            switched = model_manager.is_resident(model_id)
+    if not switched:
+        raise HTTPException(status_code=400, detail=f"Failed to switch to model: {model_id}")
+
+
 @app.get("/demo-models/current")
 async def get_current_model():
     """Get information about the currently loaded model"""
@@ -221,178 +471,928 @@ async def get_metrics():
     try:
         db = telemetry_db
         metrics_data = db.get_metrics_summary(20)
+        # Per-minute trend for the last hour, read from the rollups
+        since = (datetime.now() - timedelta(hours=1)).isoformat()
+        metrics_data["timeseries"] = db.get_timeseries("minute", since=since)
+        if response_cache is not None:
+            metrics_data["response_cache"] = response_cache.get_stats()
+        metrics_data["admission"] = admission.get_stats()
+        metrics_data["telemetry_writer"] = telemetry_writer.get_stats()
+        metrics_data["metrics_stream"] = metrics_broadcaster.get_stats()
+        metrics_data["resources"] = resource_sampler.get_latest()
+        if tracer.enabled:
+            metrics_data["tracing"] = tracer.get_stats()
+        if telemetry_compactor is not None:
+            metrics_data["telemetry_compaction"] = telemetry_compactor.get_stats()
         return metrics_data
     except Exception as e:
         logger.error(f"Error getting metrics: {e}")
         return {"error": "Failed to retrieve metrics"}
 
 
-@app.post("/inference", response_model=InferenceResponse)
-async def inference(request: InferenceRequest):
+@app.get("/metrics/prometheus")
+async def get_prometheus_metrics():
+    """Prometheus text exposition of in-process counters; never reads the telemetry database"""
+    return PlainTextResponse(inference_metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@app.get("/metrics/stream")
+async def stream_metrics(keepalive_s: float = Query(15.0, gt=0, le=300)):
     """
-    Run inference on the loaded model with the provided prompt.
-    Supports model switching via model_id parameter.
+    Live metrics as Server-Sent Events, served from memory.
+    Starts with a `snapshot` event shaped like GET /metrics, then sends an `inference`
+    event per finished inference and a `summary` event with updated totals and
+    percentiles whenever new inferences arrived; comments keep idle connections open.
     """
-    global model
+    subscription = metrics_broadcaster.subscribe()
+
+    async def event_stream():
+        try:
+            yield format_sse("snapshot", metrics_broadcaster.snapshot())
+            while True:
+                event = await subscription.get(timeout=keepalive_s)
+                if event is None:
+                    yield ": keep-alive\n\n"
+                else:
+                    yield format_sse(*event)
+        finally:
+            metrics_broadcaster.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/metrics/resources")
+async def get_metrics_resources(
+    window_minutes: int = Query(60, ge=1, le=60 * 24 * 30),
+    limit: int = Query(1000, ge=1, le=10000)
+):
+    """Resource samples (RSS, mapped-file residency, CPU, threads, available memory) over a recent window"""
+    since = (datetime.now() - timedelta(minutes=window_minutes)).isoformat()
+    return {
+        "latest": resource_sampler.get_latest(),
+        "sampler": resource_sampler.get_stats(),
+        "samples": telemetry_db.get_resource_samples(since=since, limit=limit)
+    }
+
+
+def authorize_debug(authorization: Optional[str], x_debug_token: Optional[str]):
+    """404 while no debug token is configured, 401 unless the request presents it"""
+    if not DEBUG_TOKEN:
+        raise HTTPException(status_code=404, detail="Profiling is disabled; set debug.token to enable it")
+    presented = x_debug_token
+    if authorization and authorization.lower().startswith("bearer "):
+        presented = authorization[7:].strip()
+    if not presented or not secrets.compare_digest(presented, DEBUG_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid or missing debug token",
+                            headers={"WWW-Authenticate": "Bearer"})
+
+
+def profile_requested(x_profile: Optional[str]) -> bool:
+    """Whether an X-Profile header asks for profiling; 0, false, no, off and empty do not"""
+    return x_profile is not None and x_profile.strip().lower() not in ("", "0", "false", "no", "off")
+
+
+def profile_urls(files: Dict[str, str]) -> Dict[str, str]:
+    return {kind: f"/debug/profiles/{filename}" for kind, filename in files.items()}
+
+
+@app.get("/debug/profile")
+async def debug_profile(
+    seconds: float = Query(5.0, gt=0),
+    interval_ms: float = Query(5.0, ge=1, le=1000),
+    authorization: Optional[str] = Header(None),
+    x_debug_token: Optional[str] = Header(None)
+):
+    """
+    Sample the stacks of every agent thread for `seconds` and write the result under
+    the profile directory as collapsed stacks (flamegraph input) and a pstats file.
+    """
+    authorize_debug(authorization, x_debug_token)
+    if seconds > MAX_PROFILE_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be at most {MAX_PROFILE_SECONDS}")
+    if profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+
+    async with profile_lock:
+        sampler = StackSampler(interval=interval_ms / 1000)
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            sampler.stop()
+        name = profile_name("sampled")
+        # Aggregating the samples and writing pstats is CPU-bound; keep it off the loop
+        loop = asyncio.get_running_loop()
+        files = await loop.run_in_executor(None, write_sampled_profile, sampler, PROFILE_DIR, name)
+    logger.info(f"Wrote sampled profile {name} ({sampler.samples} samples)")
+
+    return {
+        "name": name,
+        "seconds": round(sampler.duration, 2),
+        "samples": sampler.samples,
+        "threads": len({thread_name for thread_name, _ in sampler.stacks}),
+        "files": profile_urls(files)
+    }
+
+
+@app.get("/debug/profiles/{filename}")
+async def download_profile(
+    filename: str,
+    authorization: Optional[str] = Header(None),
+    x_debug_token: Optional[str] = Header(None)
+):
+    """Download a profile written by /debug/profile or an X-Profile request"""
+    authorize_debug(authorization, x_debug_token)
+    path = os.path.join(PROFILE_DIR, os.path.basename(filename))
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail=f"Profile {filename} not found")
+    return FileResponse(path, filename=os.path.basename(path))
+
+
+def trace_ring() -> RingSpanExporter:
+    ring = tracer.get_exporter(RingSpanExporter)
+    if ring is None:
+        raise HTTPException(status_code=404, detail="Tracing is disabled; set tracing.enabled to enable it")
+    return ring
+
+
+@app.get("/debug/traces")
+async def list_traces(
+    limit: int = Query(50, ge=1, le=500),
+    authorization: Optional[str] = Header(None),
+    x_debug_token: Optional[str] = Header(None)
+):
+    """Newest traces kept in memory, each with its root span, span count and duration"""
+    authorize_debug(authorization, x_debug_token)
+    return {"traces": trace_ring().get_traces(limit), "tracer": tracer.get_stats()}
+
+
+@app.get("/debug/traces/{trace_id}")
+async def get_trace(
+    trace_id: str,
+    authorization: Optional[str] = Header(None),
+    x_debug_token: Optional[str] = Header(None)
+):
+    """Every span of one trace in start order"""
+    authorize_debug(authorization, x_debug_token)
+    spans = trace_ring().get_trace(trace_id.lower())
+    if not spans:
+        raise HTTPException(status_code=404, detail=f"Trace {trace_id} not found")
+    return {"trace_id": trace_id.lower(), "spans": spans}
+
+
+@app.get("/metrics/records")
+async def get_metrics_records(
+        limit: int = Query(100, ge=1, le=1000, description="Records per page"),
+        before_id: Optional[int] = Query(None, description="Page cursor: records older than this id, newest first"),
+        since_id: Optional[int] = Query(None, description="Delta mode: only records newer than this id, oldest first"),
+        model_path: Optional[str] = Query(None, description="Only records for this model"),
+        since: Optional[str] = Query(None, description="Start time: ISO timestamp or age like 30m, 12h, 7d"),
+        until: Optional[str] = Query(None, description="End time: ISO timestamp or age"),
+        min_latency_ms: Optional[float] = Query(None, ge=0),
+        max_latency_ms: Optional[float] = Query(None, ge=0)
+):
+    """Page through telemetry records with keyset pagination on id"""
     try:
-        # Handle model switching if requested
-        if request.model_id and request.model_id != model_manager.current_model:
+        page = telemetry_db.get_records(
+            limit=limit,
+            before_id=before_id,
+            since_id=since_id,
+            since=parse_time(since),
+            until=parse_time(until),
+            model_path=model_path,
+            min_latency_ms=min_latency_ms,
+            max_latency_ms=max_latency_ms
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return page
+
+
+@app.get("/metrics/timeseries")
+async def get_metrics_timeseries(
+        resolution: str = Query("minute", description="Bucket size: minute or hour"),
+        window_minutes: int = Query(60, ge=1, description="How far back to go"),
+        model_path: Optional[str] = Query(None, description="Only this model; all models combined if omitted")
+):
+    """Get per-minute or per-hour telemetry statistics from the rollup tables"""
+    since = (datetime.now() - timedelta(minutes=window_minutes)).isoformat()
+    try:
+        series = telemetry_db.get_timeseries(resolution, since=since, model_path=model_path)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"resolution": resolution, "since": since, "timeseries": series}
+
+
+# Stop sequences used by the legacy (non model manager) path
+LEGACY_STOP = ["Human:", "User:", "Student:", "\n\n", "Assistant:"]
+
+# Phases of an inference's latency stored with its telemetry, besides queue_wait_ms
+LATENCY_PHASES = ("tokenize_ms", "prompt_eval_ms", "decode_ms", "decode_per_token_ms", "postprocess_ms")
+
+
+def legacy_prompt_tokens(request: InferenceRequest) -> Tuple[List[int], float]:
+    """Tokenize the prompt for the legacy model and reset its perf counters; returns tokens and ms taken"""
+    started = time.perf_counter()
+    tokens = model.tokenize(format_prompt(request.prompt).encode("utf-8"), add_bos=True, special=True)
+    tokenize_ms = (time.perf_counter() - started) * 1000
+    llama_cpp.llama_perf_context_reset(model.ctx)
+    return tokens, tokenize_ms
+
+
+def latency_phases(usage: Optional[Dict[str, Any]], postprocess_ms: float) -> Dict[str, Optional[float]]:
+    """Phase timings reported by the model wrapper, plus our own post-processing time"""
+    timings = (usage or {}).get("timings") or {}
+    phases = {phase: timings.get(phase) for phase in LATENCY_PHASES}
+    phases["postprocess_ms"] = postprocess_ms
+    return phases
+
+
+def rounded_phases(queue_wait_ms: float, phases: Dict[str, Optional[float]]) -> Dict[str, Optional[float]]:
+    """Queue wait and phase timings for a response's model_info"""
+    return {
+        phase: round(value, 2) if value is not None else None
+        for phase, value in {"queue_wait_ms": queue_wait_ms, **phases}.items()
+    }
+
+
+def model_unloaded(model_id: str) -> HTTPException:
+    """503 for a hot-swapped model evicted after it was loaded for the request"""
+    return HTTPException(
+        status_code=503,
+        detail=f"Model {model_id} was unloaded before the request ran, retry",
+        headers={"Retry-After": "1"}
+    )
+
+
+def prepare_model(request: InferenceRequest) -> Dict[str, Any]:
+    """
+    Switch to the requested model (or make sure the legacy model is loaded) and
+    describe the model that will serve the request. Runs on the inference executor.
+    """
+    global model
+
+    # Handle model switching if requested
+    if request.model_id and request.model_id != model_manager.current_model:
+        if model_manager.hot_swap_enabled():
+            # ensure_model_resident loaded it in the background; serve it from the pool
+            # rather than loading on an inference worker if it was evicted since
+            if not model_manager.is_resident(request.model_id):
+                raise model_unloaded(request.model_id)
+        else:
             logger.info(f"Switching to model: {request.model_id}")
             if not model_manager.switch_model(request.model_id):
                 raise HTTPException(status_code=400, detail=f"Failed to switch to model: {request.model_id}")
 
-        # Use model manager if available, otherwise fall back to legacy
-        if model_manager.current_wrapper:
-            # Use new model manager
-            logger.info(f"Using model manager with model: {model_manager.current_model}")
-            
-            # Log the incoming request
-            logger.info(f"Received inference request: {request.prompt[:100]}...")
+    if model_manager.current_wrapper:
+        model_id = request.model_id or model_manager.current_model
+        current_model_info = model_manager.get_resident_model_info(model_id)
+        return {
+            "model_id": model_id,
+            "model_name": current_model_info.get("name", "unknown"),
+            "model_path": current_model_info.get("name", "unknown"),
+            "runtime": current_model_info.get("runtime", "unknown"),
+        }
 
-            # Get initial memory usage
-            initial_memory = get_memory_usage()
+    # Fallback to legacy method
+    # Ensure model is loaded
+    if model is None:
+        model = load_model()
+    return {
+        "model_path": config.get("model_path", "unknown"),
+        "runtime": config.get("runtime", "unknown"),
+    }
 
-            # Start timing
-            start_time = time.time()
 
-            # Count prompt tokens (approximate)
-            prompt_tokens = count_tokens(request.prompt)
+def generate(request: InferenceRequest, model_info: Dict[str, Any]) -> Dict[str, Any]:
+    """Run the completion on the prepared model and return llama.cpp's result"""
+    # Use model manager if available, otherwise fall back to legacy
+    if model_manager.current_wrapper:
+        logger.debug(f"Using model manager with model: {model_manager.current_model}")
 
-            # Run inference using model manager
+        # Run inference using model manager, on the model prepared for this request;
+        # in hot-swap mode it may have been evicted since prepare_model checked
+        try:
             result = model_manager.run_inference(
                 request.prompt,
+                model_id=model_info["model_id"],
                 max_tokens=request.max_tokens,
                 temperature=request.temperature
             )
+        except ModelNotResidentError as e:
+            raise model_unloaded(e.model_id)
+    else:
+        # Format and tokenize the prompt for better responses (using existing logic)
+        prompt_tokens, tokenize_ms = legacy_prompt_tokens(request)
 
-            # Calculate processing time
-            processing_time = time.time() - start_time
-            latency_ms = processing_time * 1000
+        # Run inference
+        with tracer.span("llama_cpp.generate", prompt_tokens=len(prompt_tokens)):
+            result = model(
+                prompt_tokens,
+                max_tokens=request.max_tokens,
+                stop=LEGACY_STOP,
+                echo=False,
+                temperature=request.temperature
+            )
+            result["usage"]["timings"] = perf_timings(model, tokenize_ms)
+            trace_phases(result["usage"]["timings"], time.time_ns())
+    return result
 
-            # Extract response text
-            response_text = result["choices"][0]["text"]
 
-            # Count generated tokens (approximate)
-            generated_tokens = count_tokens(response_text)
+def run_generation(request: InferenceRequest) -> Dict[str, Any]:
+    """
+    Blocking part of an inference request: switch model if requested and run generation.
+    Executed on the inference executor, never directly on the event loop.
+    """
+    with tracer.span("agent.prepare_model", requested_model_id=request.model_id):
+        model_info = prepare_model(request)
 
-            # Get final memory usage
-            final_memory = get_memory_usage()
-            memory_used = final_memory - initial_memory
+    # RSS change and peak while generating, polled by the resource sampler
+    with resource_sampler.track() as peak, tracer.span("agent.generate", max_tokens=request.max_tokens):
+        result = generate(request, model_info)
+    generated_at = time.perf_counter()
 
-            # Get current model info
-            current_model_info = model_manager.get_current_model_info()
-            model_path = current_model_info.get("name", "unknown")
+    # Token counts as llama.cpp reported them
+    usage = result.get("usage", {})
+    counts = token_counts(usage, format_prompt(request.prompt), result["choices"][0]["text"])
 
-            # Record telemetry data
-            try:
-                telemetry_db.record_inference(
-                    prompt_length=prompt_tokens,
-                    latency_ms=latency_ms,
-                    tokens_generated=generated_tokens,
-                    memory_mb=memory_used,
-                    model_path=model_path,
-                    temperature=request.temperature,
-                    max_tokens=request.max_tokens
-                )
-                logger.info(f"Telemetry recorded: {latency_ms:.2f}ms, {generated_tokens} tokens, {memory_used:.2f}MB")
-            except Exception as te:
-                logger.error(f"Failed to record telemetry: {te}")
-
-            # Log the response and timing
-            logger.info(f"Generated response in {processing_time:.2f}s: {response_text[:100]}...")
-
-            return InferenceResponse(
-                response=response_text,
-                processing_time=processing_time,
-                model_info={
-                    "model_id": model_manager.current_model,
-                    "model_name": current_model_info.get("name", "unknown"),
-                    "model_path": model_path,
-                    "runtime": current_model_info.get("runtime", "unknown"),
-                    "device": config.get("device", "unknown"),
-                    "max_tokens": request.max_tokens,
-                    "temperature": request.temperature
-                }
-            )
-        else:
-            # Fallback to legacy method
-            # Ensure model is loaded
-            if model is None:
-                model = load_model()
+    return {
+        "result": result,
+        **counts,
+        # Prompt tokens served from the KV prefix cache (model manager path only)
+        "cached_prompt_tokens": usage.get("cached_prompt_tokens"),
+        "memory_used": peak.delta_mb,
+        "peak_rss_mb": peak.peak_rss_mb,
+        "model_info": model_info,
+        "phases": latency_phases(usage, (time.perf_counter() - generated_at) * 1000)
+    }
 
-            # Log the incoming request
-            logger.info(f"Received inference request (legacy): {request.prompt[:100]}...")
 
-            # Get initial memory usage
-            initial_memory = get_memory_usage()
+def stream_generation(request: InferenceRequest, state: Dict[str, Any]) -> Iterator[str]:
+    """
+    Streaming counterpart of run_generation: yields text pieces as llama.cpp produces
+    them and fills state with usage (token counts and timings), cached_prompt_tokens, memory_used
+    (RSS change), peak_rss_mb, phases and model_info.
+    """
+    state["model_info"] = prepare_model(request)
+    state["usage"] = {}
+    tokenize_ms = None
+
+    if model_manager.current_wrapper:
+        logger.info(f"Streaming with model manager model: {model_manager.current_model}")
+        pieces = model_manager.stream_inference(
+            request.prompt,
+            usage=state["usage"],
+            model_id=state["model_info"]["model_id"],
+            max_tokens=request.max_tokens,
+            temperature=request.temperature
+        )
+    else:
+        # Tokenized here so the prompt's token count is known without a second pass
+        prompt_tokens, tokenize_ms = legacy_prompt_tokens(request)
+        pieces = stream_completion(
+            model,
+            prompt_tokens,
+            state["usage"],
+            max_tokens=request.max_tokens,
+            stop=LEGACY_STOP,
+            echo=False,
+            temperature=request.temperature
+        )
 
-            # Start timing
-            start_time = time.time()
+    with resource_sampler.track() as peak:
+        try:
+            for piece in pieces:
+                yield piece
+        except ModelNotResidentError as e:
+            raise model_unloaded(e.model_id)
 
-            # Format the prompt for better responses (using existing logic)
-            formatted_prompt = f"Human: {request.prompt}\nAssistant:"
+    if tokenize_ms is not None:
+        # Legacy model: read llama.cpp's timings directly
+        state["usage"]["timings"] = perf_timings(model, tokenize_ms)
+        trace_phases(state["usage"]["timings"], time.time_ns())
+    generated_at = time.perf_counter()
+    state["cached_prompt_tokens"] = state["usage"].get("cached_prompt_tokens")
+    state["memory_used"] = peak.delta_mb
+    state["peak_rss_mb"] = peak.peak_rss_mb
+    state["phases"] = latency_phases(state["usage"], (time.perf_counter() - generated_at) * 1000)
 
-            # Count prompt tokens (approximate)
-            prompt_tokens = count_tokens(formatted_prompt)
 
-            # Run inference
-            result = model(
-                formatted_prompt,
-                max_tokens=request.max_tokens,
-                stop=["Human:", "User:", "Student:", "\n\n", "Assistant:"],
-                echo=False,
-                temperature=request.temperature
-            )
+def trace_queue_wait(submitted_ns: int, queue_wait_ms: float):
+    """Record the time a job waited for an inference worker as a span of the current request"""
+    tracer.record_span("inference_executor.queue_wait", submitted_ns, submitted_ns + int(queue_wait_ms * 1e6))
 
-            # Calculate processing time
-            processing_time = time.time() - start_time
-            latency_ms = processing_time * 1000
 
-            # Extract response text
-            response_text = result["choices"][0]["text"]
+def admission_key(model_id: Optional[str]) -> str:
+    """Requests queue under the model that will serve them"""
+    return model_id or model_manager.current_model or "default"
 
-            # Count generated tokens (approximate)
-            generated_tokens = count_tokens(response_text)
 
-            # Get final memory usage
-            final_memory = get_memory_usage()
-            memory_used = final_memory - initial_memory
+def rejected(e: AdmissionRejected) -> HTTPException:
+    """429 telling the client when to retry"""
+    logger.warning(f"Rejected inference request: {e}")
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
 
-            # Record telemetry data
-            try:
-                telemetry_db.record_inference(
-                    prompt_length=prompt_tokens,
-                    latency_ms=latency_ms,
-                    tokens_generated=generated_tokens,
-                    memory_mb=memory_used,
-                    model_path=config.get("model_path", "unknown"),
-                    temperature=request.temperature,
-                    max_tokens=request.max_tokens
+
+def model_label(model_info: Dict[str, Any]) -> str:
+    """Model id used to label metrics; the model path on the legacy path"""
+    return model_info.get("model_id") or model_info.get("model_path") or "unknown"
+
+
+async def submit_telemetry(records: List[Dict[str, Any]]) -> int:
+    """
+    Queue records for the telemetry writer and return how many were accepted. With
+    when_full "block", waiting for buffer space happens on a thread, so it holds back
+    only the request that produced the records, never the event loop.
+    """
+    if telemetry_writer.when_full == "block":
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, telemetry_writer.submit_many, records)
+    return telemetry_writer.submit_many(records)
+
+
+async def record_telemetry(request: InferenceRequest, endpoint: str, model_info: Dict[str, Any],
+                           prompt_tokens: int, latency_ms: float, generated_tokens: int,
+                           memory_used: float, **extra):
+    """
+    Count an inference in the in-process metrics and queue it for the telemetry writer;
+    a full buffer drops the record instead of failing the request
+    """
+    record = dict(
+        prompt_length=prompt_tokens,
+        latency_ms=latency_ms,
+        tokens_generated=generated_tokens,
+        memory_mb=memory_used,
+        model_path=model_info["model_path"],
+        temperature=request.temperature,
+        max_tokens=request.max_tokens,
+        **extra
+    )
+    inference_metrics.observe(endpoint, model_label(model_info), record)
+    metrics_broadcaster.publish(record, model_label(model_info))
+    queued = await submit_telemetry([record])
+    if queued:
+        logger.info(f"Telemetry recorded: {latency_ms:.2f}ms, {generated_tokens} tokens, {memory_used:.2f}MB")
+    else:
+        logger.warning("Telemetry buffer full, dropped record")
+
+
+def build_model_info(request: InferenceRequest, model_info: Dict[str, Any], **extra) -> Dict[str, Any]:
+    """Build the model_info block returned with inference responses"""
+    info = dict(model_info)
+    info.update({
+        "device": config.get("device", "unknown"),
+        "max_tokens": request.max_tokens,
+        "temperature": request.temperature
+    })
+    info.update(extra)
+    return info
+
+
+def response_cache_key(request: InferenceRequest) -> Optional[str]:
+    """Cache key for a request, or None when the response cache does not apply"""
+    if response_cache is None:
+        return None
+    # Sampled generations differ from run to run unless caching them is allowed
+    if request.temperature > 0 and cache_config.get("deterministic_only", True):
+        return None
+
+    model_id = request.model_id or model_manager.current_model
+    model_config = model_manager.get_model_config(model_id) if model_id else None
+    if model_config is not None:
+        seed = (model_config.get("config", {}) or {}).get("seed")
+    else:
+        # Legacy model loaded from edgefoundry.yaml
+        model_id = config.get("model_path", "unknown")
+        seed = 1337
+
+    return ResponseCache.make_key(
+        model_id, format_prompt(request.prompt), request.max_tokens, request.temperature, seed
+    )
+
+
+async def serve_cached_response(request: InferenceRequest, cached: Dict[str, Any],
+                                received_at: float) -> InferenceResponse:
+    """Answer a request from the response cache, recording it as a cache hit"""
+    latency_ms = (time.time() - received_at) * 1000
+    await record_telemetry(
+        request,
+        endpoint="inference",
+        model_info=cached["model_info"],
+        prompt_tokens=cached["prompt_tokens"],
+        latency_ms=latency_ms,
+        generated_tokens=cached["tokens_generated"],
+        memory_used=0.0,
+        peak_rss_mb=resource_sampler.rss_mb(),
+        queue_wait_ms=0.0,
+        cache_hit=True,
+        # Entries cached before exact token accounting carry estimates
+        tokens_exact=cached.get("tokens_exact", False)
+    )
+    logger.info(f"Served response from cache in {latency_ms:.2f}ms")
+
+    return InferenceResponse(
+        response=cached["response"],
+        processing_time=latency_ms / 1000,
+        model_info=build_model_info(request, cached["model_info"], queue_wait_ms=0.0, cache_hit=True)
+    )
+
+
+@app.post("/inference", response_model=InferenceResponse)
+async def inference(
+    request: InferenceRequest,
+    response: Response,
+    x_profile: Optional[str] = Header(None),
+    authorization: Optional[str] = Header(None),
+    x_debug_token: Optional[str] = Header(None)
+):
+    """
+    Run inference on the loaded model with the provided prompt.
+    Supports model switching via model_id parameter. With an X-Profile header (and the
+    debug token), the generation runs under cProfile and the profile is linked from
+    model_info.profile.
+    """
+    received_at = time.time()
+    profiled = profile_requested(x_profile)
+    if profiled:
+        authorize_debug(authorization, x_debug_token)
+    try:
+        # Log the incoming request
+        logger.info(f"Received inference request: {request.prompt[:100]}...")
+
+        # Repeated deterministic requests skip the queue entirely; profiled ones always generate
+        cache_key = response_cache_key(request) if not profiled else None
+        if cache_key is not None:
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                return await serve_cached_response(request, cached, received_at)
+
+        # Wait for a worker; generation time excludes time spent queued
+        await ensure_model_resident(request.model_id)
+        ticket = admission.admit(admission_key(request.model_id))
+        submitted_ns = time.time_ns()
+        try:
+            if profiled:
+                (generation, profile), timings = await inference_executor.run(
+                    ticket.call, profile_call, run_generation, request
                 )
-                logger.info(f"Telemetry recorded: {latency_ms:.2f}ms, {generated_tokens} tokens, {memory_used:.2f}MB")
-            except Exception as te:
-                logger.error(f"Failed to record telemetry: {te}")
-
-            # Log the response and timing
-            logger.info(f"Generated response in {processing_time:.2f}s: {response_text[:100]}...")
-
-            return InferenceResponse(
-                response=response_text,
-                processing_time=processing_time,
-                model_info={
-                    "model_path": config.get("model_path", "unknown"),
-                    "runtime": config.get("runtime", "unknown"),
-                    "device": config.get("device", "unknown"),
-                    "max_tokens": request.max_tokens,
-                    "temperature": request.temperature
-                }
+            else:
+                generation, timings = await inference_executor.run(ticket.call, run_generation, request)
+        finally:
+            ticket.abandon()
+        queue_wait_ms = timings["queue_wait_ms"]
+        latency_ms = timings["execution_ms"]
+        processing_time = latency_ms / 1000
+        trace_queue_wait(submitted_ns, queue_wait_ms)
+
+        # Extract response text
+        response_text = generation["result"]["choices"][0]["text"]
+        generated_tokens = generation["completion_tokens"]
+
+        # Record telemetry data
+        await record_telemetry(
+            request,
+            endpoint="inference",
+            model_info=generation["model_info"],
+            prompt_tokens=generation["prompt_tokens"],
+            latency_ms=latency_ms,
+            generated_tokens=generated_tokens,
+            memory_used=generation["memory_used"],
+            peak_rss_mb=generation["peak_rss_mb"],
+            queue_wait_ms=queue_wait_ms,
+            cache_hit=False if cache_key is not None else None,
+            cached_prompt_tokens=generation["cached_prompt_tokens"],
+            tokens_exact=generation["tokens_exact"],
+            **generation["phases"]
+        )
+
+        if cache_key is not None:
+            response_cache.put(cache_key, {
+                "response": response_text,
+                "prompt_tokens": generation["prompt_tokens"],
+                "tokens_generated": generated_tokens,
+                "tokens_exact": generation["tokens_exact"],
+                "model_info": generation["model_info"]
+            })
+
+        # Log the response and timing
+        logger.info(f"Generated response in {processing_time:.2f}s "
+                    f"(queued {queue_wait_ms:.2f}ms): {response_text[:100]}...")
+
+        profile_info = {}
+        if profiled:
+            name = profile_name("request")
+            loop = asyncio.get_running_loop()
+            files = await loop.run_in_executor(None, write_call_profile, profile, PROFILE_DIR, name)
+            response.headers["X-Profile-Id"] = name
+            profile_info["profile"] = profile_urls(files)
+
+        return InferenceResponse(
+            response=response_text,
+            processing_time=processing_time,
+            model_info=build_model_info(
+                request,
+                generation["model_info"],
+                queue_wait_ms=round(queue_wait_ms, 2),
+                cached_prompt_tokens=generation["cached_prompt_tokens"],
+                phases=rounded_phases(queue_wait_ms, generation["phases"]),
+                **profile_info
             )
+        )
 
+    except HTTPException:
+        raise
+    except AdmissionRejected as e:
+        raise rejected(e)
+    except QueueFullError as e:
+        logger.warning(f"Rejected inference request: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error during inference: {str(e)}")
+        inference_metrics.observe_error("inference", admission_key(request.model_id))
         raise HTTPException(status_code=500, detail=f"Inference failed: {str(e)}")
 
 
+def run_batch_generation(items: List[InferenceRequest],
+                         load_errors: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+    """
+    Blocking part of a batch request: run every item through the model in one executor job.
+    Items are grouped by model so each model is switched to at most once, and a failing
+    item records its error without affecting the others. Items for a model in load_errors
+    are not run and report that model's load error.
+    """
+    load_errors = load_errors or {}
+    batch_started = time.time()
+
+    groups: Dict[Optional[str], List[int]] = {}
+    for index, item in enumerate(items):
+        groups.setdefault(item.model_id or model_manager.current_model, []).append(index)
+
+    # Serve the already loaded model first so items without a model_id run on it
+    ordered_groups = sorted(groups.items(), key=lambda group: group[0] != model_manager.current_model)
+
+    outcomes: List[Dict[str, Any]] = [{} for _ in items]
+    for _, indexes in ordered_groups:
+        for index in indexes:
+            if items[index].model_id in load_errors:
+                outcomes[index] = {"error": load_errors[items[index].model_id]}
+                continue
+            started_at = time.time()
+            try:
+                with tracer.span("agent.batch_item", index=index):
+                    outcome = run_generation(items[index])
+            except HTTPException as e:
+                outcome = {"error": e.detail}
+            except Exception as e:
+                outcome = {"error": f"Inference failed: {str(e)}"}
+            # Time spent behind earlier items counts as queue wait for this one
+            outcome["offset_ms"] = (started_at - batch_started) * 1000
+            outcome["execution_ms"] = (time.time() - started_at) * 1000
+            outcomes[index] = outcome
+
+    return outcomes
+
+
+def run_admitted_batch(tickets: List[AdmissionTicket], items: List[InferenceRequest],
+                       load_errors: Dict[str, str]) -> List[Dict[str, Any]]:
+    """Run a batch under its admission tickets, shedding it if it waited too long"""
+    try:
+        for ticket in tickets:
+            ticket.start()
+        return run_batch_generation(items, load_errors)
+    finally:
+        for ticket in tickets:
+            ticket.release()
+
+
+@app.post("/inference/batch", response_model=BatchInferenceResponse)
+async def inference_batch(request: BatchInferenceRequest):
+    """
+    Run inference for many prompts in one request.
+    Returns a result or an error per item and records telemetry in one bulk write.
+    """
+    max_batch_size = executor_config.get("max_batch_size", 256)
+    if not request.items:
+        raise HTTPException(status_code=400, detail="Batch must contain at least one item")
+    if len(request.items) > max_batch_size:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {len(request.items)} items exceeds the limit of {max_batch_size}"
+        )
+
+    logger.info(f"Received batch inference request with {len(request.items)} items")
+
+    # A model that fails to load fails its items with the load error, without running them
+    load_errors: Dict[str, str] = {}
+    for model_id in dict.fromkeys(item.model_id for item in request.items):
+        try:
+            await ensure_model_resident(model_id)
+        except HTTPException as e:
+            load_errors[model_id] = e.detail
+
+    # Each item takes a slot in its model's queue
+    weights: Dict[str, int] = {}
+    for item in request.items:
+        key = admission_key(item.model_id)
+        weights[key] = weights.get(key, 0) + 1
+    tickets = []
+    try:
+        for key, weight in weights.items():
+            tickets.append(admission.admit(key, weight))
+        submitted_ns = time.time_ns()
+        outcomes, timings = await inference_executor.run(run_admitted_batch, tickets, request.items, load_errors)
+    except AdmissionRejected as e:
+        raise rejected(e)
+    except QueueFullError as e:
+        logger.warning(f"Rejected batch inference request: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error during batch inference: {str(e)}")
+        for item in request.items:
+            inference_metrics.observe_error("batch", admission_key(item.model_id))
+        raise HTTPException(status_code=500, detail=f"Batch inference failed: {str(e)}")
+    finally:
+        for ticket in tickets:
+            ticket.abandon()
+    trace_queue_wait(submitted_ns, timings["queue_wait_ms"])
+
+    results: List[BatchInferenceItem] = []
+    telemetry_records: List[Dict[str, Any]] = []
+    for index, (item, outcome) in enumerate(zip(request.items, outcomes)):
+        if "error" in outcome:
+            inference_metrics.observe_error("batch", admission_key(item.model_id))
+            results.append(BatchInferenceItem(index=index, error=outcome["error"]))
+            continue
+
+        response_text = outcome["result"]["choices"][0]["text"]
+        queue_wait_ms = timings["queue_wait_ms"] + outcome["offset_ms"]
+        latency_ms = outcome["execution_ms"]
+        record = {
+            "prompt_length": outcome["prompt_tokens"],
+            "latency_ms": latency_ms,
+            "tokens_generated": outcome["completion_tokens"],
+            "memory_mb": outcome["memory_used"],
+            "peak_rss_mb": outcome["peak_rss_mb"],
+            "model_path": outcome["model_info"]["model_path"],
+            "temperature": item.temperature,
+            "max_tokens": item.max_tokens,
+            "queue_wait_ms": queue_wait_ms,
+            "cached_prompt_tokens": outcome["cached_prompt_tokens"],
+            "tokens_exact": outcome["tokens_exact"],
+            **outcome["phases"]
+        }
+        inference_metrics.observe("batch", model_label(outcome["model_info"]), record)
+        metrics_broadcaster.publish(record, model_label(outcome["model_info"]))
+        telemetry_records.append(record)
+        results.append(BatchInferenceItem(
+            index=index,
+            response=response_text,
+            processing_time=latency_ms / 1000,
+            model_info=build_model_info(
+                item,
+                outcome["model_info"],
+                queue_wait_ms=round(queue_wait_ms, 2),
+                cached_prompt_tokens=outcome["cached_prompt_tokens"],
+                phases=rounded_phases(queue_wait_ms, outcome["phases"])
+            )
+        ))
+
+    # The writer stores the whole batch in bulk
+    dropped = len(telemetry_records) - await submit_telemetry(telemetry_records)
+    if dropped:
+        logger.warning(f"Telemetry buffer full, dropped {dropped} batch records")
+
+    succeeded = len(telemetry_records)
+    failed = len(results) - succeeded
+    processing_time = timings["execution_ms"] / 1000
+    logger.info(f"Batch of {len(results)} items finished in {processing_time:.2f}s "
+                f"({succeeded} succeeded, {failed} failed)")
+
+    return BatchInferenceResponse(
+        results=results,
+        processing_time=processing_time,
+        succeeded=succeeded,
+        failed=failed
+    )
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Format a Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/inference/stream")
+async def inference_stream(request: InferenceRequest):
+    """
+    Run inference and stream the output as Server-Sent Events.
+    Emits a `token` event per generated piece, then a `done` event with the full
+    response, token usage and timings, or an `error` event if generation fails.
+    """
+    logger.info(f"Received streaming inference request: {request.prompt[:100]}...")
+    received_at = time.time()
+    state: Dict[str, Any] = {}
+
+    await ensure_model_resident(request.model_id)
+    try:
+        ticket = admission.admit(admission_key(request.model_id))
+    except AdmissionRejected as e:
+        raise rejected(e)
+    try:
+        submitted_ns = time.time_ns()
+        stream = inference_executor.stream(ticket.stream, stream_generation, request, state)
+    except QueueFullError as e:
+        ticket.abandon()
+        logger.warning(f"Rejected streaming inference request: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+
+    async def event_stream():
+        pieces: List[str] = []
+        token_times: List[float] = []
+        try:
+            async for piece in stream:
+                token_times.append(time.time())
+                pieces.append(piece)
+                yield format_sse("token", {"token": piece, "index": len(pieces) - 1})
+        except asyncio.CancelledError:
+            # The client went away: drop the job if it is still queued, or stop it
+            # at its next token, instead of decoding to max_tokens for nobody
+            logger.info(f"Client disconnected after {len(pieces)} streamed tokens")
+            stream.cancel()
+            raise
+        except HTTPException as e:
+            yield format_sse("error", {"detail": e.detail})
+            return
+        except AdmissionRejected as e:
+            logger.warning(f"Shed streaming inference request: {e}")
+            yield format_sse("error", {"detail": str(e), "retry_after": e.retry_after})
+            return
+        except Exception as e:
+            logger.error(f"Error during streaming inference: {str(e)}")
+            inference_metrics.observe_error("stream", admission_key(request.model_id))
+            yield format_sse("error", {"detail": f"Inference failed: {str(e)}"})
+            return
+        finally:
+            # Stops generation early if the client disconnected
+            stream.cancel()
+            ticket.abandon()
+
+        queue_wait_ms = stream.timings.get("queue_wait_ms", 0.0)
+        trace_queue_wait(submitted_ns, queue_wait_ms)
+        latency_ms = stream.timings.get("execution_ms", 0.0)
+        response_text = "".join(pieces)
+        counts = token_counts(state.get("usage"), format_prompt(request.prompt), response_text)
+
+        # Time to first token is measured from arrival, so it includes queueing
+        ttft_ms = (token_times[0] - received_at) * 1000 if token_times else None
+        inter_token_ms = None
+        if len(token_times) > 1:
+            inter_token_ms = (token_times[-1] - token_times[0]) * 1000 / (len(token_times) - 1)
+
+        await record_telemetry(
+            request,
+            endpoint="stream",
+            model_info=state["model_info"],
+            prompt_tokens=counts["prompt_tokens"],
+            latency_ms=latency_ms,
+            generated_tokens=counts["completion_tokens"],
+            memory_used=state.get("memory_used", 0.0),
+            peak_rss_mb=state.get("peak_rss_mb"),
+            queue_wait_ms=queue_wait_ms,
+            ttft_ms=ttft_ms,
+            inter_token_ms=inter_token_ms,
+            cached_prompt_tokens=state.get("cached_prompt_tokens"),
+            tokens_exact=counts["tokens_exact"],
+            **state.get("phases", {})
+        )
+        logger.info(f"Streamed response in {latency_ms / 1000:.2f}s "
+                    f"(TTFT {ttft_ms or 0:.2f}ms): {response_text[:100]}...")
+
+        yield format_sse("done", {
+            "response": response_text,
+            "processing_time": latency_ms / 1000,
+            "usage": counts,
+            "model_info": build_model_info(
+                request,
+                state["model_info"],
+                queue_wait_ms=round(queue_wait_ms, 2),
+                ttft_ms=round(ttft_ms, 2) if ttft_ms is not None else None,
+                inter_token_ms=round(inter_token_ms, 2) if inter_token_ms is not None else None,
+                cached_prompt_tokens=state.get("cached_prompt_tokens"),
+                phases=rounded_phases(queue_wait_ms, state.get("phases", {}))
+            )
+        })
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 if __name__ == "__main__":
     import uvicorn
 
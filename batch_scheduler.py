@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+Continuous batching scheduler for Edge Foundry
+Shares every llama.cpp decode step between all in-flight requests by giving each
+request its own sequence id in a multi-sequence context. Requests join and leave
+the batch at token boundaries, so aggregate tokens/sec grows with concurrency.
+"""
+
+import codecs
+import logging
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import CancelledError, Future
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+import llama_cpp
+from llama_cpp import Llama
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of a streamed sequence on its token queue
+_STREAM_END = object()
+
+
+class _Sequence:
+    """State of one request while it is scheduled"""
+
+    def __init__(self, prompt_tokens: List[int], max_tokens: int, temperature: float,
+                 stop: List[str], future: Future, stream: Optional[queue.Queue] = None,
+                 tokenize_ms: float = 0.0):
+        self.prompt_tokens = prompt_tokens
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.stop = [text for text in stop if text]
+        self.max_stop_len = max((len(text) for text in stop), default=0)
+        self.future = future
+        self.stream = stream
+
+        self.seq_id = -1
+        self.n_past = 0          # Tokens already in the KV cache for this sequence
+        self.prefilled = 0       # Prompt tokens submitted so far
+        self.next_token = None   # Sampled token still to be decoded
+        self.generated: List[int] = []
+        self.text = ""
+        # Keeps a token's trailing partial UTF-8 bytes until the next token completes them
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        self.emitted = 0         # Characters already pushed to the stream
+        self.cancelled = False   # Set when the consumer stops reading
+        self.enqueued_at = time.time()
+
+        # Wall-clock phases; decode steps are shared, so these include other sequences' work
+        self.tokenize_ms = tokenize_ms
+        self.admitted_at: Optional[float] = None
+        self.first_token_at: Optional[float] = None
+
+
+class ContinuousBatchScheduler:
+    """Runs many completions concurrently on one multi-sequence llama.cpp context"""
+
+    def __init__(self, llama: Llama, max_sequences: int = 4, n_ctx: Optional[int] = None,
+                 n_batch: Optional[int] = None, seed: Optional[int] = None,
+                 top_k: int = 40, top_p: float = 0.95):
+        self.llama = llama
+        self.max_sequences = max(1, max_sequences)
+        self.n_ctx = n_ctx or llama.n_ctx()
+        self.n_batch = n_batch or llama.n_batch
+        self.top_k = top_k
+        self.top_p = top_p
+        self.n_vocab = llama.n_vocab()
+        self.eos_token = llama.token_eos()
+        self._vocab = llama_cpp.llama_model_get_vocab(llama.model)
+        self._rng = np.random.default_rng(seed)
+
+        # A dedicated context over the already loaded weights, sized for all sequences
+        params = llama_cpp.llama_context_params.from_buffer_copy(llama.context_params)
+        params.n_ctx = self.n_ctx
+        params.n_batch = self.n_batch
+        params.n_ubatch = min(params.n_ubatch, self.n_batch)
+        params.n_seq_max = self.max_sequences
+        self._ctx = llama_cpp.llama_init_from_model(llama.model, params)
+        if not self._ctx:
+            raise RuntimeError("Failed to create batching context")
+        self._batch = llama_cpp.llama_batch_init(self.n_batch, 0, self.max_sequences)
+        # Each sequence gets an equal share of the context
+        self.seq_ctx = llama_cpp.llama_n_ctx(self._ctx) // self.max_sequences
+
+        self._waiting: "queue.Queue[_Sequence]" = queue.Queue()
+        self._active: List[_Sequence] = []
+        self._free_seq_ids = list(range(self.max_sequences))
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+
+        # Counters exposed through get_stats()
+        self._completed = 0
+        self._failed = 0
+        self._cancelled = 0
+        self._decode_steps = 0
+        self._tokens_generated = 0
+        self._started_at = time.time()
+
+    def start(self):
+        """Start the scheduling thread (idempotent)"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="batch-scheduler", daemon=True)
+        self._thread.start()
+        logger.info(f"Continuous batching started: {self.max_sequences} sequences, "
+                    f"{self.seq_ctx} context tokens each")
+
+    def submit(self, prompt: str, max_tokens: int = 64, temperature: float = 0.7,
+               stop: Optional[List[str]] = None, stream: Optional[queue.Queue] = None) -> Future:
+        """
+        Schedule a completion. The future resolves to a llama_cpp style completion dict.
+        If stream is given, text pieces are put on it as they are generated.
+        """
+        return self._enqueue(prompt, max_tokens, temperature, stop or [], stream).future
+
+    def _enqueue(self, prompt: str, max_tokens: int, temperature: float, stop: List[str],
+                 stream: Optional[queue.Queue]) -> _Sequence:
+        """Tokenize a prompt and queue its sequence for the scheduling thread"""
+        if self._stopped.is_set():
+            raise RuntimeError("Batch scheduler is stopped")
+
+        started = time.perf_counter()
+        prompt_tokens = self.llama.tokenize(prompt.encode("utf-8"), add_bos=True, special=True)
+        tokenize_ms = (time.perf_counter() - started) * 1000
+        if len(prompt_tokens) >= self.seq_ctx:
+            raise ValueError(
+                f"Prompt of {len(prompt_tokens)} tokens exceeds the per-sequence context of {self.seq_ctx}"
+            )
+
+        future: Future = Future()
+        future.set_running_or_notify_cancel()
+        seq = _Sequence(prompt_tokens, max_tokens, temperature, stop, future, stream, tokenize_ms=tokenize_ms)
+        self._waiting.put(seq)
+        if self._thread is None:
+            self.start()
+        return seq
+
+    def stream(self, prompt: str, max_tokens: int = 64, temperature: float = 0.7,
+               stop: Optional[List[str]] = None,
+               usage: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        """
+        Schedule a completion and yield text pieces as they are generated.
+        If usage is given, it is filled with the completion's token counts at the end.
+        Closing the generator early (e.g. the client disconnected) cancels the sequence.
+        """
+        pieces: queue.Queue = queue.Queue()
+        seq = self._enqueue(prompt, max_tokens, temperature, stop or [], pieces)
+        try:
+            while True:
+                piece = pieces.get()
+                if piece is _STREAM_END:
+                    break
+                yield piece
+        finally:
+            if not seq.future.done():
+                # Retired by the scheduling thread before its next decode step
+                seq.cancelled = True
+        # Surface scheduling errors to the caller
+        result = seq.future.result()
+        if usage is not None:
+            usage.update(result["usage"])
+
+    def _run(self):
+        """Scheduling loop: admit, build one batch, decode, sample, retire"""
+        while not self._stopped.is_set():
+            self._admit()
+            self._retire_cancelled()
+            if not self._active:
+                continue
+            try:
+                self._step()
+            except Exception as e:
+                logger.error(f"Batch decode failed: {e}")
+                for seq in list(self._active):
+                    self._finish(seq, error=e)
+
+    def _admit(self):
+        """Move waiting requests into free sequence slots at a token boundary"""
+        while self._free_seq_ids:
+            try:
+                # Block only when there is nothing else to do
+                seq = self._waiting.get(timeout=0.1) if not self._active else self._waiting.get_nowait()
+            except queue.Empty:
+                return
+            seq.seq_id = self._free_seq_ids.pop(0)
+            seq.admitted_at = time.time()
+            self._active.append(seq)
+
+    def _retire_cancelled(self):
+        """Free the slots of sequences nobody is reading any more"""
+        for seq in [seq for seq in self._active if seq.cancelled]:
+            self._finish(seq, error=CancelledError("Sequence cancelled by its consumer"))
+
+    def _step(self):
+        """Decode one batch covering every active sequence"""
+        batch = self._batch
+        n_tokens = 0
+        logit_rows: Dict[int, _Sequence] = {}
+
+        def add(token: int, pos: int, seq: _Sequence, want_logits: bool):
+            nonlocal n_tokens
+            batch.token[n_tokens] = token
+            batch.pos[n_tokens] = pos
+            batch.n_seq_id[n_tokens] = 1
+            batch.seq_id[n_tokens][0] = seq.seq_id
+            batch.logits[n_tokens] = want_logits
+            if want_logits:
+                logit_rows[n_tokens] = seq
+            n_tokens += 1
+
+        # Generating sequences go first so a long prompt never stalls decoding
+        for seq in self._active:
+            if seq.next_token is not None:
+                add(seq.next_token, seq.n_past, seq, True)
+                seq.n_past += 1
+                seq.next_token = None
+
+        # Fill the remaining budget with prompt chunks (chunked prefill)
+        for seq in self._active:
+            while seq.prefilled < len(seq.prompt_tokens) and n_tokens < self.n_batch:
+                last = seq.prefilled == len(seq.prompt_tokens) - 1
+                add(seq.prompt_tokens[seq.prefilled], seq.n_past, seq, last)
+                seq.prefilled += 1
+                seq.n_past += 1
+
+        if n_tokens == 0:
+            return
+        batch.n_tokens = n_tokens
+
+        result = llama_cpp.llama_decode(self._ctx, batch)
+        if result != 0:
+            raise RuntimeError(f"llama_decode returned {result}")
+        self._decode_steps += 1
+
+        for row, seq in logit_rows.items():
+            logits = np.ctypeslib.as_array(
+                llama_cpp.llama_get_logits_ith(self._ctx, row), shape=(self.n_vocab,)
+            )
+            token = self._sample(logits, seq.temperature)
+            self._accept(seq, token)
+
+    def _sample(self, logits: np.ndarray, temperature: float) -> int:
+        """Greedy at temperature 0, otherwise top-k / top-p sampling"""
+        if temperature <= 0:
+            return int(np.argmax(logits))
+
+        top_k = min(self.top_k, logits.shape[0])
+        candidates = np.argpartition(logits, -top_k)[-top_k:]
+        scaled = logits[candidates].astype(np.float64) / temperature
+        probs = np.exp(scaled - scaled.max())
+        probs /= probs.sum()
+
+        order = np.argsort(-probs)
+        cumulative = np.cumsum(probs[order])
+        keep = order[:int(np.searchsorted(cumulative, self.top_p)) + 1]
+        probs = probs[keep] / probs[keep].sum()
+        return int(candidates[keep][self._rng.choice(len(keep), p=probs)])
+
+    def _accept(self, seq: _Sequence, token: int):
+        """Record a sampled token and retire the sequence if it is done"""
+        if seq.first_token_at is None:
+            # The prompt is fully evaluated once its first token is sampled
+            seq.first_token_at = time.time()
+        if token == self.eos_token or llama_cpp.llama_vocab_is_eog(self._vocab, token):
+            self._finish(seq, finish_reason="stop")
+            return
+
+        seq.generated.append(token)
+        self._tokens_generated += 1
+        # Decode only the new token: this loop serves every active sequence, so work per
+        # token must not grow with the length of the output
+        new_text = seq.decoder.decode(self.llama.detokenize([token]))
+        seq.text += new_text
+
+        # Earlier text held no stop string, so a match must end inside the new text
+        search_from = max(0, len(seq.text) - len(new_text) - seq.max_stop_len + 1)
+        for stop in seq.stop if new_text else ():
+            index = seq.text.find(stop, search_from)
+            if index != -1:
+                seq.text = seq.text[:index]
+                self._finish(seq, finish_reason="stop")
+                return
+
+        if len(seq.generated) >= seq.max_tokens or seq.n_past + 1 >= self.seq_ctx:
+            self._finish(seq, finish_reason="length")
+            return
+
+        seq.next_token = token
+        if seq.stream is not None:
+            # Hold back enough text that a stop string can still be cut off
+            holdback = max((len(stop) for stop in seq.stop), default=1) - 1
+            safe_end = len(seq.text) - holdback
+            if safe_end > seq.emitted:
+                seq.stream.put(seq.text[seq.emitted:safe_end])
+                seq.emitted = safe_end
+
+    def _finish(self, seq: _Sequence, finish_reason: str = "stop", error: Optional[Exception] = None):
+        """Free the sequence's slot and KV cells and resolve its future"""
+        self._active.remove(seq)
+        self._remove_sequence(seq.seq_id)
+        self._free_seq_ids.append(seq.seq_id)
+
+        if seq.stream is not None:
+            if error is None and len(seq.text) > seq.emitted:
+                seq.stream.put(seq.text[seq.emitted:])
+            seq.stream.put(_STREAM_END)
+
+        with self._lock:
+            if seq.cancelled:
+                self._cancelled += 1
+            elif error is not None:
+                self._failed += 1
+            else:
+                self._completed += 1
+
+        if error is not None:
+            seq.future.set_exception(error)
+            return
+
+        finished_at = time.time()
+        first_token_at = seq.first_token_at or finished_at
+        decode_ms = (finished_at - first_token_at) * 1000
+        seq.future.set_result({
+            "id": f"cmpl-{uuid.uuid4()}",
+            "object": "text_completion",
+            "created": int(time.time()),
+            "model": self.llama.model_path,
+            "choices": [{
+                "text": seq.text,
+                "index": 0,
+                "logprobs": None,
+                "finish_reason": finish_reason
+            }],
+            "usage": {
+                "prompt_tokens": len(seq.prompt_tokens),
+                "completion_tokens": len(seq.generated),
+                "total_tokens": len(seq.prompt_tokens) + len(seq.generated),
+                "timings": {
+                    "tokenize_ms": seq.tokenize_ms,
+                    "prompt_eval_ms": (first_token_at - (seq.admitted_at or first_token_at)) * 1000,
+                    "decode_ms": decode_ms,
+                    "decode_per_token_ms": decode_ms / len(seq.generated) if seq.generated else None
+                }
+            }
+        })
+
+    def _remove_sequence(self, seq_id: int):
+        """Drop a sequence's cells from the KV cache"""
+        if hasattr(llama_cpp, "llama_get_memory"):
+            llama_cpp.llama_memory_seq_rm(llama_cpp.llama_get_memory(self._ctx), seq_id, -1, -1)
+        else:
+            llama_cpp.llama_kv_self_seq_rm(self._ctx, seq_id, -1, -1)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get scheduler occupancy and throughput counters"""
+        with self._lock:
+            elapsed = time.time() - self._started_at
+            return {
+                "max_sequences": self.max_sequences,
+                "active_sequences": len(self._active),
+                "waiting": self._waiting.qsize(),
+                "completed": self._completed,
+                "failed": self._failed,
+                "cancelled": self._cancelled,
+                "decode_steps": self._decode_steps,
+                "tokens_generated": self._tokens_generated,
+                "avg_tokens_per_second": round(self._tokens_generated / elapsed, 2) if elapsed > 0 else 0
+            }
+
+    def stop(self):
+        """Stop scheduling, fail anything still pending and free the context"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        error = RuntimeError("Batch scheduler stopped")
+        for seq in list(self._active):
+            self._finish(seq, error=error)
+        while True:
+            try:
+                seq = self._waiting.get_nowait()
+            except queue.Empty:
+                break
+            if seq.stream is not None:
+                seq.stream.put(_STREAM_END)
+            seq.future.set_exception(error)
+
+        llama_cpp.llama_batch_free(self._batch)
+        llama_cpp.llama_free(self._ctx)
+        logger.info("Continuous batching stopped")
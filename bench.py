@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Load testing for Edge Foundry
+Replays a prompt set against a running agent's /inference/stream endpoint, either
+closed-loop (a fixed number of clients, each sending its next request once the
+previous one finishes) or open-loop (requests arrive at a fixed rate whether or not
+earlier ones have finished), and summarizes throughput, time to first token and
+latency percentiles into a JSON report that can be compared against a baseline.
+"""
+
+import hashlib
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import requests
+import yaml
+
+REPORT_VERSION = 1
+BENCH_MODES = ("closed", "open")
+ARRIVALS = ("poisson", "uniform")
+PERCENTILES = (50, 90, 95, 99)
+
+# Summary metrics `bench compare` checks, and whether higher values are better
+COMPARE_METRICS = (
+    ("requests_per_second", True),
+    ("tokens_per_second", True),
+    ("latency_ms.p50", False),
+    ("latency_ms.p95", False),
+    ("latency_ms.p99", False),
+    ("ttft_ms.p50", False),
+    ("ttft_ms.p95", False),
+    ("error_rate", False),
+)
+
+# Settings that must match for two reports to be comparable
+COMPARABLE_CONFIG = ("mode", "concurrency", "rate", "arrival", "requests", "duration_s",
+                     "max_tokens", "temperature", "prompt_set_sha256", "model_id")
+
+# A request send function: (prompt item, perf_counter time it was due) -> request record
+Sender = Callable[[Dict[str, Any], float], Dict[str, Any]]
+
+
+def load_prompts(prompts_file: Optional[Union[str, Path]] = None, model_id: Optional[str] = None,
+                 demo_models_path: Union[str, Path] = "demo_models.yaml") -> List[Dict[str, Any]]:
+    """
+    The prompt set to replay. A JSONL file holds one prompt per line, either a JSON
+    string or an object with `prompt` and optional max_tokens, temperature and
+    model_id. Otherwise every demo model's sample_prompts are used (only model_id's,
+    sent with that model_id, when one is given).
+    """
+    if prompts_file is not None:
+        items = []
+        with open(prompts_file) as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                item = {"prompt": item} if isinstance(item, str) else dict(item)
+                if not item.get("prompt"):
+                    raise ValueError(f"{prompts_file}:{line_number} has no prompt")
+                if model_id:
+                    item.setdefault("model_id", model_id)
+                items.append(item)
+    else:
+        with open(demo_models_path) as f:
+            demo_models = (yaml.safe_load(f) or {}).get("demo_models", {}) or {}
+        if model_id:
+            if model_id not in demo_models:
+                raise ValueError(f"Model {model_id} not found in {demo_models_path}")
+            items = [{"prompt": prompt, "model_id": model_id}
+                     for prompt in demo_models[model_id].get("sample_prompts", [])]
+        else:
+            items = [{"prompt": prompt}
+                     for model in demo_models.values() for prompt in model.get("sample_prompts", [])]
+
+    if not items:
+        raise ValueError("The prompt set is empty")
+    return items
+
+
+def prompt_set_hash(items: List[Dict[str, Any]]) -> str:
+    """Fingerprint of a prompt set, so reports can tell whether they replayed the same prompts"""
+    return hashlib.sha256(json.dumps(items, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """Percentile q (0-100) of already sorted values, interpolating between neighbours"""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def distribution(values: List[float]) -> Dict[str, Optional[float]]:
+    """Mean, percentiles and max of a list of measurements, rounded to microseconds"""
+    values = sorted(values)
+    stats = {"mean": sum(values) / len(values) if values else None}
+    stats.update({f"p{q}": percentile(values, q) for q in PERCENTILES})
+    stats["max"] = values[-1] if values else None
+    return {key: round(value, 3) if value is not None else None for key, value in stats.items()}
+
+
+def make_stream_sender(base_url: str, max_tokens: int = 64, temperature: float = 0.7,
+                       timeout: float = 120.0) -> Sender:
+    """
+    Sender that runs one streamed inference per call. Latency and TTFT are measured
+    from when the request was due, not when it was sent, so requests held back by a
+    saturated client still count their wait (no coordinated omission).
+    """
+    url = f"{base_url.rstrip('/')}/inference/stream"
+    local = threading.local()
+
+    def send(item: Dict[str, Any], due_at: float) -> Dict[str, Any]:
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        payload = {"max_tokens": max_tokens, "temperature": temperature, **item}
+        record = {"ok": False, "status": None, "error": None, "ttft_ms": None, "latency_ms": None,
+                  "prompt_tokens": None, "completion_tokens": None}
+        try:
+            with local.session.post(url, json=payload, stream=True, timeout=timeout) as response:
+                record["status"] = response.status_code
+                if response.status_code != 200:
+                    record["error"] = f"HTTP {response.status_code}"
+                else:
+                    event = None
+                    for line in response.iter_lines(decode_unicode=True):
+                        if line.startswith("event:"):
+                            event = line[6:].strip()
+                            if event == "token" and record["ttft_ms"] is None:
+                                record["ttft_ms"] = round((time.perf_counter() - due_at) * 1000, 3)
+                        elif line.startswith("data:") and event in ("done", "error"):
+                            data = json.loads(line[5:])
+                            if event == "error":
+                                record["error"] = data.get("detail", "error event")
+                            else:
+                                usage = data.get("usage") or {}
+                                record["prompt_tokens"] = usage.get("prompt_tokens")
+                                record["completion_tokens"] = usage.get("completion_tokens")
+                                record["ok"] = True
+                    if not record["ok"] and record["error"] is None:
+                        record["error"] = "stream ended without a done event"
+        except requests.exceptions.RequestException as e:
+            record["error"] = type(e).__name__
+        record["latency_ms"] = round((time.perf_counter() - due_at) * 1000, 3)
+        return record
+
+    return send
+
+
+def run_closed_loop(send: Sender, items: List[Dict[str, Any]], concurrency: int,
+                    total: Optional[int] = None, duration: Optional[float] = None) -> List[Dict[str, Any]]:
+    """concurrency clients send back to back until total requests or duration seconds"""
+    lock = threading.Lock()
+    next_index = [0]
+    records: List[Dict[str, Any]] = []
+    started = time.perf_counter()
+
+    def client():
+        while True:
+            with lock:
+                index = next_index[0]
+                next_index[0] += 1
+            if total is not None and index >= total:
+                return
+            if duration is not None and time.perf_counter() - started >= duration:
+                return
+            due_at = time.perf_counter()
+            record = send(items[index % len(items)], due_at)
+            record.update(index=index, sent_at_ms=round((due_at - started) * 1000, 3))
+            with lock:
+                records.append(record)
+
+    threads = [threading.Thread(target=client, name=f"bench-client-{i}") for i in range(max(1, concurrency))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(records, key=lambda record: record["index"])
+
+
+def run_open_loop(send: Sender, items: List[Dict[str, Any]], rate: float, total: Optional[int] = None,
+                  duration: Optional[float] = None, arrival: str = "poisson",
+                  rng: Optional[random.Random] = None, max_inflight: int = 64) -> List[Dict[str, Any]]:
+    """
+    Requests arrive at rate per second (exponential gaps for poisson, even gaps for
+    uniform) until total requests or duration seconds, with at most max_inflight open
+    """
+    rng = rng or random.Random()
+    started = time.perf_counter()
+    due_at = started
+    futures = []
+    with ThreadPoolExecutor(max_workers=max(1, max_inflight), thread_name_prefix="bench-client") as pool:
+        index = 0
+        while total is None or index < total:
+            if duration is not None and due_at - started >= duration:
+                break
+            delay = due_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append((index, due_at, pool.submit(send, items[index % len(items)], due_at)))
+            index += 1
+            due_at += rng.expovariate(rate) if arrival == "poisson" else 1.0 / rate
+
+    records = []
+    for index, due_at, future in futures:
+        record = future.result()
+        record.update(index=index, sent_at_ms=round((due_at - started) * 1000, 3))
+        records.append(record)
+    return records
+
+
+def summarize(records: List[Dict[str, Any]], duration_s: float) -> Dict[str, Any]:
+    """Throughput, error counts and latency/TTFT distributions of a run's request records"""
+    succeeded = [record for record in records if record["ok"]]
+    errors: Dict[str, int] = {}
+    for record in records:
+        if not record["ok"]:
+            errors[record["error"]] = errors.get(record["error"], 0) + 1
+    completion_tokens = sum(record["completion_tokens"] or 0 for record in succeeded)
+    return {
+        "requests": len(records),
+        "succeeded": len(succeeded),
+        "failed": len(records) - len(succeeded),
+        "error_rate": round((len(records) - len(succeeded)) / len(records), 4) if records else 0.0,
+        "errors": errors,
+        "duration_s": round(duration_s, 3),
+        "requests_per_second": round(len(succeeded) / duration_s, 3) if duration_s > 0 else 0.0,
+        "tokens_per_second": round(completion_tokens / duration_s, 3) if duration_s > 0 else 0.0,
+        "prompt_tokens": sum(record["prompt_tokens"] or 0 for record in succeeded),
+        "completion_tokens": completion_tokens,
+        "latency_ms": distribution([record["latency_ms"] for record in succeeded]),
+        "ttft_ms": distribution([record["ttft_ms"] for record in succeeded if record["ttft_ms"] is not None]),
+    }
+
+
+def describe_environment(base_url: str, timeout: float = 10.0) -> Dict[str, Any]:
+    """The client machine and the model the agent reports serving"""
+    try:
+        agent_model = requests.get(f"{base_url.rstrip('/')}/model-info", timeout=timeout).json()
+    except (requests.exceptions.RequestException, ValueError):
+        agent_model = None
+    return {
+        "agent_url": base_url,
+        "agent_model": agent_model,
+        "client_host": platform.node(),
+        "platform": platform.platform(),
+        "python": sys.version.split()[0],
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def run_bench(send: Sender, items: List[Dict[str, Any]], mode: str = "closed", concurrency: int = 4,
+              rate: Optional[float] = None, arrival: str = "poisson", total: Optional[int] = None,
+              duration: Optional[float] = None, warmup: int = 0, seed: int = 0, max_inflight: int = 64,
+              config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Run warmup requests (not measured), then the measured load, and return the report.
+    The seed fixes the prompt order and, in open-loop poisson mode, the arrival times.
+    """
+    if mode not in BENCH_MODES:
+        raise ValueError(f"Unknown mode '{mode}'. Use one of: {', '.join(BENCH_MODES)}")
+    if mode == "open" and not rate:
+        raise ValueError("Open-loop mode needs an arrival rate")
+    if arrival not in ARRIVALS:
+        raise ValueError(f"Unknown arrival '{arrival}'. Use one of: {', '.join(ARRIVALS)}")
+    if total is None and duration is None:
+        raise ValueError("Set a number of requests or a duration")
+
+    rng = random.Random(seed)
+    order = list(items)
+    rng.shuffle(order)
+
+    for i in range(warmup):
+        send(order[i % len(order)], time.perf_counter())
+
+    started_at = datetime.now().isoformat()
+    started = time.perf_counter()
+    if mode == "closed":
+        records = run_closed_loop(send, order, concurrency, total, duration)
+    else:
+        records = run_open_loop(send, order, rate, total, duration, arrival, rng, max_inflight)
+    duration_s = time.perf_counter() - started
+
+    return {
+        "version": REPORT_VERSION,
+        "started_at": started_at,
+        "config": {
+            "mode": mode,
+            "concurrency": concurrency if mode == "closed" else None,
+            "rate": rate if mode == "open" else None,
+            "arrival": arrival if mode == "open" else None,
+            "max_inflight": max_inflight if mode == "open" else None,
+            "requests": total,
+            "duration_s": duration,
+            "warmup": warmup,
+            "seed": seed,
+            "prompt_count": len(items),
+            "prompt_set_sha256": prompt_set_hash(items),
+            **(config or {}),
+        },
+        "summary": summarize(records, duration_s),
+        "records": records,
+    }
+
+
+def default_report_path() -> Path:
+    """bench-<timestamp>.json in the current directory"""
+    return Path(f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+
+
+def write_report(report: Dict[str, Any], output_path: Union[str, Path]):
+    with open(output_path, "w") as f:
+        json.dump(report, f, indent=2)
+        f.write("\n")
+
+
+def load_report(path: Union[str, Path]) -> Dict[str, Any]:
+    with open(path) as f:
+        report = json.load(f)
+    if report.get("version") != REPORT_VERSION:
+        raise ValueError(f"{path} is not a version {REPORT_VERSION} bench report")
+    return report
+
+
+def summary_value(summary: Dict[str, Any], metric: str) -> Optional[float]:
+    """A summary metric by dotted path, e.g. latency_ms.p95"""
+    value: Any = summary
+    for key in metric.split("."):
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+
+def config_differences(baseline: Dict[str, Any], candidate: Dict[str, Any]) -> Dict[str, tuple]:
+    """Settings that differ between two reports and make their numbers incomparable"""
+    return {
+        key: (baseline["config"].get(key), candidate["config"].get(key))
+        for key in COMPARABLE_CONFIG
+        if baseline["config"].get(key) != candidate["config"].get(key)
+    }
+
+
+def compare_reports(baseline: Dict[str, Any], candidate: Dict[str, Any],
+                    threshold_pct: float = 5.0) -> List[Dict[str, Any]]:
+    """
+    One row per compared metric with the relative change; a metric regressed when it
+    moved in the bad direction by more than threshold_pct (or, from a baseline of
+    zero, at all)
+    """
+    rows = []
+    for metric, higher_is_better in COMPARE_METRICS:
+        before = summary_value(baseline["summary"], metric)
+        after = summary_value(candidate["summary"], metric)
+        change_pct = None
+        regression = False
+        if before is not None and after is not None:
+            worse = after < before if higher_is_better else after > before
+            if before:
+                change_pct = round((after - before) / abs(before) * 100, 2)
+                regression = worse and abs(change_pct) > threshold_pct
+            else:
+                regression = worse
+        rows.append({
+            "metric": metric,
+            "baseline": before,
+            "candidate": after,
+            "change_pct": change_pct,
+            "higher_is_better": higher_is_better,
+            "regression": regression,
+        })
+    return rows
@@ -18,7 +18,8 @@ import yaml
 from rich.console import Console
 from rich.table import Table
 from rich.panel import Panel
-from telemetry import TelemetryDB
+from telemetry import TelemetryDB, DEFAULT_RETENTION
+from telemetry_export import EXPORT_FORMATS, default_export_path, export_telemetry, parse_time
 
 app = typer.Typer(help="Edge Foundry - Local AI Agent Management CLI")
 console = Console()
@@ -37,17 +38,26 @@ def ensure_working_dir():
     MODELS_DIR.mkdir(exist_ok=True)
 
 
-def get_agent_pid():
-    """Get the agent process ID if running."""
+def get_agent_pids():
+    """
+    Get the process IDs of the agent group that are still running.
+    The PID file holds one PID per line: the process serving the API port first
+    (the agent, or the dispatcher in front of worker processes), then any workers.
+    """
+    pids = []
     if PID_FILE.exists():
         try:
             with open(PID_FILE, 'r') as f:
-                pid = int(f.read().strip())
-            if psutil.pid_exists(pid):
-                return pid
+                pids = [int(line) for line in f.read().split()]
         except (ValueError, FileNotFoundError):
             pass
-    return None
+    return [pid for pid in pids if psutil.pid_exists(pid)]
+
+
+def get_agent_pid():
+    """Get the agent process ID if running."""
+    pids = get_agent_pids()
+    return pids[0] if pids else None
 
 
 def is_agent_running():
@@ -143,8 +153,22 @@ def deploy(
     console.print("🎉 Deployment completed successfully!", style="bold green")
 
 
+def spawn_agent_process(cmd, log_path, cwd, env=None):
+    """Start an agent process in the background, logging to log_path."""
+    with open(log_path, 'w') as log_file:
+        return subprocess.Popen(
+            cmd,
+            stdout=log_file,
+            stderr=subprocess.STDOUT,
+            cwd=cwd,  # Run from directory containing agent.py
+            env=env
+        )
+
+
 @app.command()
-def start():
+def start(
+        workers: int = typer.Option(1, "--workers", "-w", help="Number of agent worker processes")
+):
     """Start the Edge Foundry agent in the background."""
     if is_agent_running():
         console.print("⚠️  Agent is already running!", style="bold yellow")
@@ -154,10 +178,11 @@ def start():
         console.print("❌ No configuration found. Run 'edgefoundry init' first.", style="bold red")
         raise typer.Exit(1)
 
-    console.print("🚀 Starting Edge Foundry agent...", style="bold blue")
+    if workers < 1:
+        console.print("❌ --workers must be at least 1.", style="bold red")
+        raise typer.Exit(1)
 
-    # Start the agent in background
-    cmd = [sys.executable, "-m", "uvicorn", "agent:app", "--host", "0.0.0.0", "--port", "8000"]
+    console.print("🚀 Starting Edge Foundry agent...", style="bold blue")
 
     # Ensure we're running from the directory containing agent.py
     agent_dir = Path.cwd()
@@ -168,22 +193,40 @@ def start():
                 agent_dir = parent
                 break
 
-    with open(LOG_FILE, 'w') as log_file:
-        process = subprocess.Popen(
-            cmd,
-            stdout=log_file,
-            stderr=subprocess.STDOUT,
-            cwd=agent_dir  # Run from directory containing agent.py
-        )
-
-    # Save PID
+    if workers == 1:
+        # Start the agent in background
+        cmd = [sys.executable, "-m", "uvicorn", "agent:app", "--host", "0.0.0.0", "--port", "8000"]
+        pids = [spawn_agent_process(cmd, LOG_FILE, agent_dir).pid]
+    else:
+        # Worker processes listen locally and mmap the same GGUF, sharing its pages;
+        # each gets an equal share of the cores
+        env = os.environ.copy()
+        env["EDGEFOUNDRY_N_THREADS"] = str(max(1, (os.cpu_count() or 1) // workers))
+        worker_pids = []
+        worker_urls = []
+        for i in range(workers):
+            port = 8001 + i
+            cmd = [sys.executable, "-m", "uvicorn", "agent:app", "--host", "127.0.0.1", "--port", str(port)]
+            log_path = WORKING_DIR / f"agent-worker-{i}.log"
+            worker_env = {**env, "EDGEFOUNDRY_WORKER_ID": str(i)}
+            worker_pids.append(spawn_agent_process(cmd, log_path, agent_dir, worker_env).pid)
+            worker_urls.append(f"http://127.0.0.1:{port}")
+
+        # The dispatcher serves the API port and routes to the least busy worker
+        env["EDGEFOUNDRY_WORKERS"] = ",".join(worker_urls)
+        cmd = [sys.executable, "-m", "uvicorn", "dispatcher:app", "--host", "0.0.0.0", "--port", "8000"]
+        pids = [spawn_agent_process(cmd, LOG_FILE, agent_dir, env).pid] + worker_pids
+
+    # Save PIDs
     with open(PID_FILE, 'w') as f:
-        f.write(str(process.pid))
+        f.write("\n".join(str(pid) for pid in pids))
 
     # Wait a moment and check if it started successfully
     time.sleep(2)
-    if is_agent_running():
+    if is_agent_running() and len(get_agent_pids()) == len(pids):
         console.print("✅ Agent started successfully!", style="bold green")
+        if workers > 1:
+            console.print(f"👷 Workers: {workers} (logs in {WORKING_DIR}/agent-worker-*.log)")
         console.print(f"📊 Logs: {LOG_FILE}")
         console.print("🌐 API: http://localhost:8000")
     else:
@@ -194,19 +237,29 @@ def start():
 @app.command()
 def stop():
     """Stop the Edge Foundry agent."""
-    if not is_agent_running():
+    # Workers can outlive a crashed dispatcher, so stop whatever is left of the group
+    pids = get_agent_pids()
+    if not is_agent_running() and not pids:
         console.print("⚠️  Agent is not running.", style="bold yellow")
         return
 
-    pid = get_agent_pid()
-    if pid:
+    if pids:
         try:
-            process = psutil.Process(pid)
-            process.terminate()
-            process.wait(timeout=10)
-            console.print("✅ Agent stopped successfully!", style="bold green")
-        except (psutil.NoSuchProcess, psutil.TimeoutExpired):
-            console.print("⚠️  Agent process not found or didn't stop gracefully.", style="bold yellow")
+            processes = []
+            for pid in pids:
+                try:
+                    process = psutil.Process(pid)
+                    process.terminate()
+                    processes.append(process)
+                except psutil.NoSuchProcess:
+                    pass
+            _, alive = psutil.wait_procs(processes, timeout=10)
+            if alive:
+                for process in alive:
+                    process.kill()
+                console.print("⚠️  Agent process didn't stop gracefully and was killed.", style="bold yellow")
+            else:
+                console.print("✅ Agent stopped successfully!", style="bold green")
         finally:
             if PID_FILE.exists():
                 PID_FILE.unlink()
@@ -239,6 +292,14 @@ def status():
         table.add_row("CPU", f"{cpu_percent:.1f}%")
         table.add_row("API URL", "http://localhost:8000")
 
+        # Worker group started with --workers
+        for i, worker_pid in enumerate(get_agent_pids()[1:]):
+            try:
+                worker = psutil.Process(worker_pid)
+                table.add_row(f"Worker {i}", f"PID {worker_pid}, {worker.memory_info().rss / 1024 / 1024:.1f} MB")
+            except psutil.NoSuchProcess:
+                table.add_row(f"Worker {i}", f"PID {worker_pid}, 🔴 stopped")
+
         console.print(table)
 
         # Show recent logs
@@ -376,7 +437,7 @@ def clean(
             if item.is_file():
                 if item.name == "agent.pid":
                     files_to_clean.append(item)
-                elif item.name == "agent.log":
+                elif item.name == "agent.log" or (item.name.startswith("agent-worker-") and item.suffix == ".log"):
                     files_to_clean.append(item)
                 elif item.name == "edgefoundry.yaml" and not keep_config:
                     files_to_clean.append(item)
@@ -425,7 +486,10 @@ def clean(
         telemetry_db_path = Path("telemetry.db")
         if telemetry_db_path.exists():
             if force or typer.confirm(f"\nRemove telemetry database ({telemetry_db_path})?"):
-                telemetry_db_path.unlink()
+                # Include the WAL journal files SQLite keeps next to the database
+                for path in (telemetry_db_path, Path("telemetry.db-wal"), Path("telemetry.db-shm")):
+                    if path.exists():
+                        path.unlink()
                 console.print(f"✅ Removed {telemetry_db_path}")
                 cleaned_count += 1
 
@@ -446,15 +510,23 @@ def clean(
         raise typer.Exit(1)
 
 
-@app.command()
+metrics_app = typer.Typer(help="Show and maintain telemetry metrics.")
+app.add_typer(metrics_app, name="metrics")
+
+
+@metrics_app.callback(invoke_without_command=True)
 def metrics(
+        ctx: typer.Context,
         limit: int = typer.Option(20, "--limit", "-l", help="Number of recent records to show"),
         summary_only: bool = typer.Option(False, "--summary", "-s", help="Show only summary statistics")
 ):
     """Show telemetry metrics from the SQLite database."""
+    if ctx.invoked_subcommand is not None:
+        return
+
     try:
-        # Initialize telemetry database
-        db = TelemetryDB()
+        # Read-only, so a running agent keeps writing while we query
+        db = TelemetryDB(read_only=True)
 
         # Get metrics data
         metrics_data = db.get_metrics_summary(limit)
@@ -480,6 +552,22 @@ def metrics(
 
         console.print(summary_table)
 
+        # Tail latency from the quantile sketches
+        percentiles = metrics_data.get("percentiles", {})
+        if any(stats["count"] for stats in percentiles.values()):
+            percentile_table = Table(title="Percentiles")
+            percentile_table.add_column("Metric", style="cyan")
+            for label in ("p50", "p90", "p95", "p99"):
+                percentile_table.add_column(label, style="green", justify="right")
+            labels = {"latency_ms": "Latency (ms)", "tokens_per_second": "Tokens/sec", "queue_wait_ms": "Queue Wait (ms)"}
+            for metric, stats in percentiles.items():
+                if stats["count"]:
+                    percentile_table.add_row(
+                        labels.get(metric, metric),
+                        *(f"{stats[label]:.1f}" for label in ("p50", "p90", "p95", "p99"))
+                    )
+            console.print(percentile_table)
+
         if not summary_only and recent_records:
             # Show recent records
             console.print(f"\n📋 [bold blue]Recent Records (Last {len(recent_records)})[/bold blue]")
@@ -511,6 +599,262 @@ def metrics(
         console.print("Make sure the agent has been running and generating telemetry data.", style="yellow")
 
 
+@metrics_app.command("export")
+def metrics_export(
+        fmt: str = typer.Option("csv", "--format", "-f", help="Output format: csv, jsonl or parquet"),
+        output: Optional[Path] = typer.Option(None, "--output", "-o", help="File to write (default: telemetry-<time>.<format>)"),
+        since: Optional[str] = typer.Option(None, "--since", help="Start time: ISO timestamp or age like 30m, 12h, 7d"),
+        until: Optional[str] = typer.Option(None, "--until", help="End time: ISO timestamp or age"),
+        model: Optional[str] = typer.Option(None, "--model", "-m", help="Only records for this model path"),
+        compression: Optional[str] = typer.Option(None, "--compression", "-c",
+                                                  help="gzip for csv/jsonl; snappy (default), zstd, gzip or none for parquet")
+):
+    """Export telemetry records to CSV, JSON Lines or Parquet."""
+    if fmt not in EXPORT_FORMATS:
+        console.print(f"❌ Unknown format '{fmt}'. Use one of: {', '.join(EXPORT_FORMATS)}", style="bold red")
+        raise typer.Exit(1)
+    if not Path("telemetry.db").exists():
+        console.print("📊 No telemetry database found.", style="bold yellow")
+        return
+
+    output = output or default_export_path(fmt, compression)
+    try:
+        db = TelemetryDB(read_only=True)
+        with console.status(f"Exporting telemetry to {output}...") as status:
+            written = export_telemetry(
+                db, output, fmt,
+                since=parse_time(since),
+                until=parse_time(until),
+                model_path=model,
+                compression=compression,
+                progress=lambda count: status.update(f"Exporting telemetry to {output}... {count} records")
+            )
+        db.close()
+    except ImportError as e:
+        console.print(f"❌ {e}", style="bold red")
+        raise typer.Exit(1)
+    except ValueError as e:
+        console.print(f"❌ {e}", style="bold red")
+        raise typer.Exit(1)
+    except Exception as e:
+        console.print(f"❌ Export failed: {e}", style="bold red")
+        raise typer.Exit(1)
+
+    console.print(f"✅ Exported {written} records to {output}", style="bold green")
+
+
+@metrics_app.command("compact")
+def metrics_compact(
+        raw_days: Optional[float] = typer.Option(None, "--raw-days", help="Days to keep raw records (0 keeps forever)"),
+        minute_days: Optional[float] = typer.Option(None, "--minute-days", help="Days to keep per-minute aggregates"),
+        hour_days: Optional[float] = typer.Option(None, "--hour-days", help="Days to keep per-hour aggregates"),
+        vacuum: bool = typer.Option(False, "--vacuum", help="Convert an older database to incremental auto-vacuum (one-off full VACUUM; stop the agent first)")
+):
+    """Prune telemetry past its retention and reclaim disk space."""
+    # Retention comes from telemetry.retention in the config, then the options
+    retention = dict(DEFAULT_RETENTION)
+    if CONFIG_FILE.exists():
+        with open(CONFIG_FILE, 'r') as f:
+            config = yaml.safe_load(f) or {}
+        configured = (config.get("telemetry", {}) or {}).get("retention", {}) or {}
+        retention.update({key: configured[key] for key in DEFAULT_RETENTION if key in configured})
+    overrides = {"raw_days": raw_days, "minute_days": minute_days, "hour_days": hour_days}
+    retention.update({key: value for key, value in overrides.items() if value is not None})
+
+    db_path = Path("telemetry.db")
+    if not db_path.exists():
+        console.print("📊 No telemetry database found.", style="bold yellow")
+        return
+
+    def database_size() -> int:
+        # Recent writes may still sit in the WAL file
+        return sum(path.stat().st_size for path in (db_path, Path("telemetry.db-wal")) if path.exists())
+
+    try:
+        size_before = database_size()
+        db = TelemetryDB(str(db_path))
+        with console.status("Compacting telemetry..."):
+            result = db.compact(vacuum=vacuum, **retention)
+        db.close()
+        size_after = database_size()
+    except Exception as e:
+        console.print(f"❌ Compaction failed: {e}", style="bold red")
+        raise typer.Exit(1)
+
+    table = Table(title="Telemetry Compaction")
+    table.add_column("Item", style="cyan")
+    table.add_column("Value", style="green", justify="right")
+    for key in ("raw_days", "minute_days", "hour_days"):
+        table.add_row(f"Retention {key.replace('_', ' ')}", str(retention[key] or "forever"))
+    table.add_row("Raw records deleted", str(result["raw_deleted"]))
+    table.add_row("Resource samples deleted", str(result["samples_deleted"]))
+    table.add_row("Minute aggregates deleted", str(result["minute_deleted"]))
+    table.add_row("Hour aggregates deleted", str(result["hour_deleted"]))
+    table.add_row("Pages freed", str(result["pages_freed"]))
+    if result["converted_to_incremental_vacuum"]:
+        table.add_row("Converted to incremental auto-vacuum", "yes")
+    table.add_row("Database size", f"{size_before / 1024 / 1024:.2f} MB → {size_after / 1024 / 1024:.2f} MB")
+    console.print(table)
+
+
+bench_app = typer.Typer(help="Load-test the agent and compare benchmark reports.")
+app.add_typer(bench_app, name="bench")
+
+
+@bench_app.callback(invoke_without_command=True)
+def bench(
+        ctx: typer.Context,
+        prompts_file: Optional[Path] = typer.Option(None, "--prompts", "-f",
+                                                    help="JSONL prompt set (default: sample_prompts from demo_models.yaml)"),
+        model_id: Optional[str] = typer.Option(None, "--model", "-m", help="Model ID to benchmark"),
+        mode: str = typer.Option("closed", "--mode", help="closed (fixed concurrency) or open (fixed arrival rate)"),
+        concurrency: int = typer.Option(4, "--concurrency", "-c", help="Concurrent clients in closed-loop mode"),
+        rate: Optional[float] = typer.Option(None, "--rate", "-r", help="Requests per second in open-loop mode"),
+        arrival: str = typer.Option("poisson", "--arrival", help="Open-loop arrivals: poisson or uniform"),
+        max_inflight: int = typer.Option(64, "--max-inflight", help="Open-loop limit on requests in flight"),
+        requests_count: Optional[int] = typer.Option(None, "--requests", "-n", help="Measured requests (default 50)"),
+        duration: Optional[float] = typer.Option(None, "--duration", "-d", help="Measure for this many seconds instead"),
+        warmup: int = typer.Option(2, "--warmup", help="Unmeasured requests sent first"),
+        max_tokens: int = typer.Option(64, "--max-tokens", "-t", help="Maximum tokens per request"),
+        temperature: float = typer.Option(0.0, "--temperature", "-temp", help="Sampling temperature"),
+        seed: int = typer.Option(0, "--seed", help="Seed for prompt order and arrival times"),
+        timeout: float = typer.Option(120.0, "--timeout", help="Per-request timeout in seconds"),
+        output: Optional[Path] = typer.Option(None, "--output", "-o", help="Report file (default: bench-<time>.json)"),
+        host: str = typer.Option("localhost", "--host", "-h", help="Agent host address"),
+        port: int = typer.Option(8000, "--port", "-p", help="Agent port number")
+):
+    """Replay a prompt set against the agent and report throughput, TTFT and latency percentiles."""
+    if ctx.invoked_subcommand is not None:
+        return
+    # Imported here so other commands do not load requests
+    from bench import (
+        ARRIVALS, BENCH_MODES, default_report_path, describe_environment, load_prompts, make_stream_sender,
+        run_bench, write_report
+    )
+    if mode not in BENCH_MODES:
+        console.print(f"❌ Unknown mode '{mode}'. Use one of: {', '.join(BENCH_MODES)}", style="bold red")
+        raise typer.Exit(1)
+    if arrival not in ARRIVALS:
+        console.print(f"❌ Unknown arrival '{arrival}'. Use one of: {', '.join(ARRIVALS)}", style="bold red")
+        raise typer.Exit(1)
+    if mode == "open" and not rate:
+        console.print("❌ Open-loop mode needs --rate", style="bold red")
+        raise typer.Exit(1)
+    if requests_count is None and duration is None:
+        requests_count = 50
+
+    try:
+        items = load_prompts(prompts_file, model_id)
+    except (OSError, ValueError) as e:
+        console.print(f"❌ Could not load prompts: {e}", style="bold red")
+        raise typer.Exit(1)
+
+    base_url = f"http://{host}:{port}"
+    environment = describe_environment(base_url)
+    if environment["agent_model"] is None:
+        console.print(f"❌ Could not connect to agent at {host}:{port}", style="bold red")
+        console.print("Make sure the agent is running and accessible.", style="yellow")
+        raise typer.Exit(1)
+
+    load = f"{concurrency} clients" if mode == "closed" else f"{rate} req/s ({arrival})"
+    amount = f"{requests_count} requests" if requests_count is not None else f"{duration}s"
+    console.print(f"🏋️  Benchmarking {base_url}: {mode} loop, {load}, {amount}, "
+                  f"{len(items)} prompts", style="bold blue")
+
+    send = make_stream_sender(base_url, max_tokens=max_tokens, temperature=temperature, timeout=timeout)
+    try:
+        with console.status("Running benchmark..."):
+            report = run_bench(
+                send, items,
+                mode=mode,
+                concurrency=concurrency,
+                rate=rate,
+                arrival=arrival,
+                total=requests_count,
+                duration=duration,
+                warmup=warmup,
+                seed=seed,
+                max_inflight=max_inflight,
+                config={"max_tokens": max_tokens, "temperature": temperature, "model_id": model_id,
+                        "prompts_file": str(prompts_file) if prompts_file else None}
+            )
+    except Exception as e:
+        console.print(f"❌ Benchmark failed: {e}", style="bold red")
+        raise typer.Exit(1)
+    report["environment"] = environment
+
+    summary = report["summary"]
+    table = Table(title="Benchmark Results")
+    table.add_column("Metric", style="cyan")
+    table.add_column("Value", style="green", justify="right")
+    table.add_row("Requests", f"{summary['succeeded']} ok / {summary['failed']} failed")
+    table.add_row("Duration", f"{summary['duration_s']:.2f} s")
+    table.add_row("Requests/sec", f"{summary['requests_per_second']:.2f}")
+    table.add_row("Tokens/sec", f"{summary['tokens_per_second']:.2f}")
+    console.print(table)
+
+    if summary["succeeded"]:
+        percentile_table = Table(title="Percentiles (ms)")
+        percentile_table.add_column("Metric", style="cyan")
+        for label in ("mean", "p50", "p90", "p95", "p99", "max"):
+            percentile_table.add_column(label, style="green", justify="right")
+        for metric, name in (("ttft_ms", "TTFT"), ("latency_ms", "Latency")):
+            stats = summary[metric]
+            percentile_table.add_row(name, *(f"{stats[label]:.1f}" if stats[label] is not None else "N/A"
+                                              for label in ("mean", "p50", "p90", "p95", "p99", "max")))
+        console.print(percentile_table)
+    for error, count in summary["errors"].items():
+        console.print(f"⚠️  {count} × {error}", style="yellow")
+
+    output = output or default_report_path()
+    write_report(report, output)
+    console.print(f"✅ Report written to {output}", style="bold green")
+
+
+@bench_app.command("compare")
+def bench_compare(
+        baseline: Path = typer.Argument(..., help="Baseline report"),
+        candidate: Path = typer.Argument(..., help="Report to compare against the baseline"),
+        threshold: float = typer.Option(5.0, "--threshold", help="Percent change that counts as a regression"),
+        fail_on_regression: bool = typer.Option(False, "--fail-on-regression", help="Exit with status 1 on a regression")
+):
+    """Diff a benchmark report against a baseline."""
+    from bench import compare_reports, config_differences, load_report
+
+    try:
+        baseline_report = load_report(baseline)
+        candidate_report = load_report(candidate)
+    except (OSError, ValueError) as e:
+        console.print(f"❌ {e}", style="bold red")
+        raise typer.Exit(1)
+
+    for key, (before, after) in config_differences(baseline_report, candidate_report).items():
+        console.print(f"⚠️  {key} differs: {before} → {after}; the results may not be comparable", style="yellow")
+
+    rows = compare_reports(baseline_report, candidate_report, threshold)
+    table = Table(title=f"{baseline.name} → {candidate.name}")
+    table.add_column("Metric", style="cyan")
+    table.add_column("Baseline", justify="right")
+    table.add_column("Candidate", justify="right")
+    table.add_column("Change", justify="right")
+    def fmt(value):
+        return f"{value:.2f}" if value is not None else "N/A"
+
+    for row in rows:
+        change = f"{row['change_pct']:+.1f}%" if row["change_pct"] is not None else "N/A"
+        style = "bold red" if row["regression"] else None
+        table.add_row(row["metric"], fmt(row["baseline"]), fmt(row["candidate"]), change, style=style)
+    console.print(table)
+
+    regressions = [row["metric"] for row in rows if row["regression"]]
+    if regressions:
+        console.print(f"❌ Regressed beyond {threshold}%: {', '.join(regressions)}", style="bold red")
+        if fail_on_regression:
+            raise typer.Exit(1)
+    else:
+        console.print(f"✅ No regressions beyond {threshold}%", style="bold green")
+
+
 @app.command()
 def demo_models():
     """List available demo models and their status."""
@@ -601,19 +945,36 @@ def switch_model(
         
         response = requests.post(url, json=data, timeout=30)
         
-        if response.status_code == 200:
+        # Hot swap: the model loads in the background, poll the switch job
+        if response.status_code == 202:
+            job = response.json()["job"]
+            console.print("⏳ Loading in the background; the current model keeps serving...", style="yellow")
+            while job["status"] == "loading":
+                time.sleep(1)
+                response = requests.get(f"http://{host}:{port}/demo-models/switch/{job['job_id']}", timeout=30)
+                response.raise_for_status()
+                job = response.json()["job"]
+            if job["status"] != "completed":
+                console.print(f"❌ {job['error']}", style="bold red")
+                raise typer.Exit(1)
+            result = {
+                "message": f"Successfully switched to model: {model_id}",
+                "current_model": response.json().get("current_model", {})
+            }
+        elif response.status_code == 200:
             result = response.json()
-            console.print(f"✅ {result['message']}", style="bold green")
-            
-            # Show model info
-            current = result.get("current_model", {})
-            if current:
-                console.print(f"📊 Model: {current.get('name', 'Unknown')}")
-                console.print(f"🔧 Runtime: {current.get('runtime', 'Unknown')}")
-                console.print(f"💾 Parameters: {current.get('parameters', 'Unknown')}")
         else:
             console.print(f"❌ Error: {response.status_code} - {response.text}", style="bold red")
             raise typer.Exit(1)
+        
+        console.print(f"✅ {result['message']}", style="bold green")
+        
+        # Show model info
+        current = result.get("current_model", {})
+        if current:
+            console.print(f"📊 Model: {current.get('name', 'Unknown')}")
+            console.print(f"🔧 Runtime: {current.get('runtime', 'Unknown')}")
+            console.print(f"💾 Parameters: {current.get('parameters', 'Unknown')}")
             
     except requests.exceptions.ConnectionError:
         console.print(f"❌ Could not connect to agent at {host}:{port}", style="bold red")
@@ -37,6 +37,7 @@ const MetricsOverview = () => {
 
   const summary = metricsData?.summary || {};
   const recentRecords = metricsData?.recent_records || [];
+  const latencyPercentiles = metricsData?.percentiles?.latency_ms || {};
   
   console.log('MetricsOverview processed data:', { summary, recentRecords });
 
@@ -108,9 +109,14 @@ const MetricsOverview = () => {
           <Typography variant="body2" color="textSecondary" gutterBottom>
             Last Inference: {summary.last_inference || 'N/A'}
           </Typography>
-          <Typography variant="body2" color="textSecondary">
+          <Typography variant="body2" color="textSecondary" gutterBottom>
             Recent Records: {recentRecords.length}
           </Typography>
+          <Typography variant="body2" color="textSecondary">
+            Latency p50 / p95 / p99: {['p50', 'p95', 'p99']
+              .map((key) => latencyPercentiles[key] != null ? `${latencyPercentiles[key].toFixed(1)} ms` : 'N/A')
+              .join(' / ')}
+          </Typography>
         </CardContent>
       </Card>
     </Box>
@@ -16,7 +16,7 @@ import {
 import { TrendingUp, Clock, Zap, MemoryStick } from 'lucide-react';
 
 function PerformanceCharts() {
-  const { recentInferences, isLoading } = useApp();
+  const { recentInferences, metrics, isLoading } = useApp();
 
   if (isLoading && !recentInferences) {
     return (
@@ -62,6 +62,12 @@ function PerformanceCharts() {
     temperature: parseFloat(inference[8]) || 0,
   })).reverse(); // Reverse to show chronological order
 
+  // Per-minute rollups for the last hour, served with /metrics
+  const timeseriesData = (metrics?.timeseries || []).map((bucket) => ({
+    time: new Date(bucket.bucket).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' }),
+    inferences: bucket.inferences || 0,
+  }));
+
   // Calculate averages for summary
   const avgLatency = chartData.reduce((sum, item) => sum + item.latency, 0) / chartData.length;
   const avgTokensPerSecond = chartData.reduce((sum, item) => sum + item.tokensPerSecond, 0) / chartData.length;
@@ -114,6 +120,38 @@ function PerformanceCharts() {
 
       {/* Charts */}
       <div className="space-y-6">
+        {/* Throughput over the last hour */}
+        {timeseriesData.length > 0 && (
+          <div>
+            <h3 className="text-md font-medium text-gray-900 dark:text-white mb-3">
+              Inferences per Minute (last hour)
+            </h3>
+            <div className="h-64">
+              <ResponsiveContainer width="100%" height="100%">
+                <BarChart data={timeseriesData}>
+                  <CartesianGrid strokeDasharray="3 3" className="opacity-30" />
+                  <XAxis 
+                    dataKey="time" 
+                    tick={{ fontSize: 12 }}
+                  />
+                  <YAxis 
+                    tick={{ fontSize: 12 }}
+                    allowDecimals={false}
+                  />
+                  <Tooltip 
+                    formatter={(value) => [value, 'Inferences']}
+                  />
+                  <Bar 
+                    dataKey="inferences" 
+                    fill="#f59e0b"
+                    radius={[2, 2, 0, 0]}
+                  />
+                </BarChart>
+              </ResponsiveContainer>
+            </div>
+          </div>
+        )}
+
         {/* Latency Trend */}
         <div>
           <h3 className="text-md font-medium text-gray-900 dark:text-white mb-3">
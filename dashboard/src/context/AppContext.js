@@ -16,6 +16,7 @@ const initialState = {
   // Metrics data
   metrics: null,
   recentInferences: [],
+  isStreaming: false, // Metrics arrive over /metrics/stream instead of polling
   
   // UI state
   darkMode: false,
@@ -36,6 +37,9 @@ const ActionTypes = {
   SET_MODEL_INFO: 'SET_MODEL_INFO',
   SET_METRICS: 'SET_METRICS',
   SET_RECENT_INFERENCES: 'SET_RECENT_INFERENCES',
+  SET_STREAMING: 'SET_STREAMING',
+  MERGE_METRICS: 'MERGE_METRICS',
+  ADD_INFERENCE: 'ADD_INFERENCE',
   SET_DARK_MODE: 'SET_DARK_MODE',
   SET_AUTO_REFRESH: 'SET_AUTO_REFRESH',
   SET_RUNNING_INFERENCE: 'SET_RUNNING_INFERENCE',
@@ -43,6 +47,9 @@ const ActionTypes = {
   CLEAR_ERROR: 'CLEAR_ERROR',
 };
 
+// Recent inferences kept in the dashboard, as served by /metrics
+const MAX_RECENT_INFERENCES = 20;
+
 // Reducer
 function appReducer(state, action) {
   switch (action.type) {
@@ -71,6 +78,28 @@ function appReducer(state, action) {
     case ActionTypes.SET_RECENT_INFERENCES:
       return { ...state, recentInferences: action.payload };
     
+    case ActionTypes.SET_STREAMING:
+      return { ...state, isStreaming: action.payload };
+    
+    // Streamed snapshots and summaries replace the summary fields but keep the rest
+    case ActionTypes.MERGE_METRICS:
+      return { ...state, metrics: { ...state.metrics, ...action.payload } };
+    
+    // A streamed inference joins the recent list and the current per-minute bucket
+    case ActionTypes.ADD_INFERENCE: {
+      const { record, row } = action.payload;
+      const recentInferences = [row, ...state.recentInferences].slice(0, MAX_RECENT_INFERENCES);
+      const timeseries = [...(state.metrics?.timeseries || [])];
+      const bucket = `${record.timestamp.slice(0, 16)}:00`;
+      const last = timeseries[timeseries.length - 1];
+      if (last && last.bucket === bucket) {
+        timeseries[timeseries.length - 1] = { ...last, inferences: (last.inferences || 0) + 1 };
+      } else {
+        timeseries.push({ bucket, inferences: 1 });
+      }
+      return { ...state, recentInferences, metrics: { ...state.metrics, timeseries } };
+    }
+    
     case ActionTypes.SET_DARK_MODE:
       return { ...state, darkMode: action.payload };
     
@@ -155,13 +184,13 @@ export function AppProvider({ children }) {
     }
   };
 
-  const fetchAllData = useCallback(async () => {
+  const fetchAllData = useCallback(async (includeMetrics = true) => {
     dispatch({ type: ActionTypes.SET_LOADING, payload: true });
     try {
       await Promise.all([
         fetchHealth(),
         fetchModelInfo(),
-        fetchMetrics(),
+        ...(includeMetrics ? [fetchMetrics()] : []),
       ]);
     } catch (error) {
       console.error('Failed to fetch all data:', error);
@@ -177,8 +206,10 @@ export function AppProvider({ children }) {
       dispatch({ type: ActionTypes.SET_LAST_INFERENCE, payload: result });
       toast.success('Inference completed successfully!');
       
-      // Refresh metrics after successful inference
-      await fetchMetrics();
+      // The stream delivers the new inference; otherwise refresh metrics
+      if (!state.isStreaming) {
+        await fetchMetrics();
+      }
     } catch (error) {
       toast.error(`Inference failed: ${error.message}`);
       throw error;
@@ -187,16 +218,40 @@ export function AppProvider({ children }) {
     }
   };
 
-  // Auto-refresh effect
+  // Live metrics: one stream per dashboard, served from the agent's memory. While it is
+  // connected, polling skips /metrics; EventSource reconnects on its own after errors.
+  useEffect(() => {
+    if (!state.autoRefresh || typeof EventSource === 'undefined') return;
+
+    const unsubscribe = apiService.subscribeMetrics({
+      onOpen: () => dispatch({ type: ActionTypes.SET_STREAMING, payload: true }),
+      onError: () => dispatch({ type: ActionTypes.SET_STREAMING, payload: false }),
+      onSnapshot: (snapshot) => {
+        dispatch({ type: ActionTypes.MERGE_METRICS, payload: snapshot });
+        dispatch({ type: ActionTypes.SET_RECENT_INFERENCES, payload: snapshot.recent_records });
+      },
+      onInference: (event) => dispatch({ type: ActionTypes.ADD_INFERENCE, payload: event }),
+      onSummary: ({ summary, percentiles }) => {
+        dispatch({ type: ActionTypes.MERGE_METRICS, payload: { summary, percentiles } });
+      },
+    });
+
+    return () => {
+      unsubscribe();
+      dispatch({ type: ActionTypes.SET_STREAMING, payload: false });
+    };
+  }, [state.autoRefresh]);
+
+  // Auto-refresh effect; falls back to polling /metrics when the stream is down
   useEffect(() => {
     if (!state.autoRefresh) return;
 
     const interval = setInterval(() => {
-      fetchAllData();
+      fetchAllData(!state.isStreaming);
     }, state.refreshInterval);
 
     return () => clearInterval(interval);
-  }, [state.autoRefresh, state.refreshInterval, fetchAllData]);
+  }, [state.autoRefresh, state.refreshInterval, state.isStreaming, fetchAllData]);
 
   // Initial data fetch
   useEffect(() => {
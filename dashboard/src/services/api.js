@@ -59,6 +59,30 @@ class ApiService {
     return result;
   }
 
+  // Telemetry records, newest first; pass since_id to fetch only new ones
+  async getRecords(params = {}) {
+    const query = new URLSearchParams(
+      Object.entries(params).filter(([, value]) => value !== null && value !== undefined)
+    ).toString();
+    return this.request(`/metrics/records${query ? `?${query}` : ''}`);
+  }
+
+  // Live metrics over Server-Sent Events; returns a function that closes the stream
+  subscribeMetrics({ onSnapshot, onInference, onSummary, onOpen, onError }) {
+    const source = new EventSource(`${this.baseURL}/metrics/stream`);
+    const listen = (event, handler) => {
+      if (handler) {
+        source.addEventListener(event, (message) => handler(JSON.parse(message.data)));
+      }
+    };
+    listen('snapshot', onSnapshot);
+    listen('inference', onInference);
+    listen('summary', onSummary);
+    if (onOpen) source.onopen = onOpen;
+    if (onError) source.onerror = onError;
+    return () => source.close();
+  }
+
   // Inference
   async runInference(prompt, maxTokens = 64, temperature = 0.7, modelId = null) {
     return this.request('/inference', {
@@ -82,12 +106,26 @@ class ApiService {
   }
 
   async switchModel(modelId) {
-    return this.request('/demo-models/switch', {
+    const result = await this.request('/demo-models/switch', {
       method: 'POST',
       body: JSON.stringify({
         model_id: modelId,
       }),
     });
+
+    // Hot swap: the model loads in the background, poll the switch job
+    if (!result.job) {
+      return result;
+    }
+    let status = result;
+    while (status.job.status === 'loading') {
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+      status = await this.request(`/demo-models/switch/${status.job.job_id}`);
+    }
+    if (status.job.status !== 'completed') {
+      throw new Error(status.job.error);
+    }
+    return status;
   }
 
   async getCurrentModel() {
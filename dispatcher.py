@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Request dispatcher for Edge Foundry
+Fronts a group of agent worker processes (`edgefoundry start --workers N`) and
+routes each request to the worker with the fewest requests in flight. Workers
+mmap the same GGUF files, so the model weights are shared through the page cache.
+
+Endpoints that describe a single process are not load balanced: GET /metrics,
+/metrics/prometheus, /debug/profile and /debug/traces are fanned out to every
+worker and combined, and /metrics/stream always relays the first worker's live stream.
+"""
+
+import asyncio
+import logging
+import os
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+from prometheus import CONTENT_TYPE as PROMETHEUS_CONTENT_TYPE, label_expositions
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Comma separated base URLs of the agent workers, set by `edgefoundry start`
+WORKERS_ENV = "EDGEFOUNDRY_WORKERS"
+
+# Headers that describe a single connection and must not be forwarded
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailers", "transfer-encoding", "upgrade", "host", "content-length"
+}
+
+
+class WorkerPool:
+    """Agent workers and the number of requests each one has in flight"""
+
+    def __init__(self, urls: Iterable[str]):
+        self.urls = [url.rstrip("/") for url in urls]
+        self.in_flight = {url: 0 for url in self.urls}
+        self.completed = {url: 0 for url in self.urls}
+        self.failures = {url: 0 for url in self.urls}
+        self._next = 0
+
+    def pick(self, exclude: Iterable[str] = (), only: Optional[Iterable[str]] = None) -> Optional[str]:
+        """Worker with the fewest requests in flight (among only, if given), rotating between ties"""
+        candidates = [url for url in (self.urls if only is None else only) if url not in exclude]
+        if not candidates:
+            return None
+        start = self._next % len(candidates)
+        self._next += 1
+        rotated = candidates[start:] + candidates[:start]
+        return min(rotated, key=lambda url: self.in_flight[url])
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """Get per-worker routing counters"""
+        return [
+            {
+                "url": url,
+                "in_flight": self.in_flight[url],
+                "completed": self.completed[url],
+                "failures": self.failures[url]
+            }
+            for url in self.urls
+        ]
+
+
+def load_worker_urls() -> List[str]:
+    """Read worker URLs from the environment"""
+    return [url.strip() for url in os.environ.get(WORKERS_ENV, "").split(",") if url.strip()]
+
+
+app = FastAPI(
+    title="Edge Foundry Dispatcher",
+    description="Routes requests across Edge Foundry agent worker processes",
+    version="1.0.0"
+)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+worker_urls = load_worker_urls()
+pool = WorkerPool(worker_urls) if worker_urls else None
+# Generations can run for minutes; workers enforce their own limits
+client = httpx.AsyncClient(timeout=httpx.Timeout(None, connect=5.0))
+
+# Dispatcher switch job id -> {"workers": [(worker URL, worker job id)], "result": final
+# combined status once every worker finished}, oldest first
+switch_jobs: Dict[str, Dict[str, Any]] = {}
+# Workers keep the same number of switch jobs, so older ids would 404 there anyway
+MAX_SWITCH_JOBS = 100
+
+# Sections of GET /metrics that describe one worker process rather than the shared telemetry database
+PROCESS_METRICS = (
+    "response_cache", "admission", "telemetry_writer", "metrics_stream", "resources", "tracing",
+    "telemetry_compaction"
+)
+
+# Long-lived per-process streams: relayed from a fixed worker instead of the least
+# busy one, and left out of in_flight so open dashboards do not skew routing
+PINNED_PATHS = {"metrics/stream"}
+
+
+def get_pool() -> WorkerPool:
+    if pool is None:
+        raise HTTPException(status_code=503, detail=f"No agent workers configured; set {WORKERS_ENV}")
+    return pool
+
+
+def forwarded_headers(headers) -> Dict[str, str]:
+    return {key: value for key, value in headers.items() if key.lower() not in HOP_BY_HOP_HEADERS}
+
+
+async def fan_out(request: Request) -> List[Tuple[str, Optional[httpx.Response]]]:
+    """Send a GET to every worker; unreachable workers answer None"""
+    workers = get_pool()
+    headers = forwarded_headers(request.headers)
+
+    async def send(url: str) -> Optional[httpx.Response]:
+        try:
+            return await client.get(f"{url}{request.url.path}", params=request.query_params, headers=headers)
+        except httpx.HTTPError as e:
+            workers.failures[url] += 1
+            logger.warning(f"Worker {url} unreachable: {e}")
+            return None
+
+    responses = await asyncio.gather(*(send(url) for url in workers.urls))
+    return list(zip(workers.urls, responses))
+
+
+def fan_out_bodies(replies: List[Tuple[str, Optional[httpx.Response]]],
+                   ignore_status: Iterable[int] = (),
+                   decode: Callable[[httpx.Response], Any] = httpx.Response.json) -> List[Tuple[str, Any]]:
+    """
+    Bodies (JSON unless decode says otherwise) of the workers that answered. A worker
+    error is passed on to the client unless its status is in ignore_status; no answers
+    at all is a 502.
+    """
+    bodies = []
+    for url, response in replies:
+        if response is None or response.status_code in ignore_status:
+            continue
+        if response.status_code >= 400:
+            raise HTTPException(status_code=response.status_code, detail=response.json().get("detail"),
+                                headers={key: value for key, value in response.headers.items()
+                                         if key.lower() == "www-authenticate"})
+        bodies.append((url, decode(response)))
+    if not bodies and all(response is None for _, response in replies):
+        raise HTTPException(status_code=502, detail="No agent workers reachable")
+    return bodies
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await client.aclose()
+
+
+@app.get("/health")
+async def health_check():
+    """Health of every worker plus the dispatcher's routing counters"""
+    workers = get_pool()
+
+    async def worker_health(url: str) -> Optional[Dict[str, Any]]:
+        try:
+            response = await client.get(f"{url}/health", timeout=5.0)
+            response.raise_for_status()
+            return response.json()
+        except (httpx.HTTPError, ValueError):
+            return None
+
+    healths = await asyncio.gather(*(worker_health(url) for url in workers.urls))
+    worker_stats = workers.get_stats()
+    for stats, health in zip(worker_stats, healths):
+        stats["healthy"] = health is not None
+        if health is not None:
+            stats["inference_queue"] = health.get("inference_queue")
+
+    healthy = [health for health in healths if health is not None]
+    return {
+        "status": "healthy" if len(healthy) == len(healths) else ("degraded" if healthy else "unhealthy"),
+        "model_loaded": bool(healthy) and all(health.get("model_loaded") for health in healthy),
+        "workers": worker_stats,
+        "config": healthy[0].get("config") if healthy else None
+    }
+
+
+def remember_switch_job(job_id: str, worker_jobs: List[Tuple[str, str]]):
+    """Track a hot-swap job, dropping the oldest beyond MAX_SWITCH_JOBS (finished ones first)"""
+    switch_jobs[job_id] = {"workers": worker_jobs, "result": None}
+    while len(switch_jobs) > MAX_SWITCH_JOBS:
+        finished = next((old_id for old_id, entry in switch_jobs.items() if entry["result"] is not None), None)
+        del switch_jobs[finished if finished is not None else next(iter(switch_jobs))]
+
+
+@app.post("/demo-models/switch")
+async def switch_model(request: Request):
+    """
+    Switch every worker to the requested model. If only some workers switch, the
+    response is a 207 listing each worker's outcome: the others keep their previous
+    model, so requests without a model_id may be served by either until the switch
+    is retried.
+    """
+    workers = get_pool()
+    body = await request.body()
+
+    async def send(url: str) -> Optional[httpx.Response]:
+        try:
+            return await client.post(f"{url}/demo-models/switch", content=body,
+                                     headers={"Content-Type": "application/json"})
+        except httpx.HTTPError as e:
+            workers.failures[url] += 1
+            logger.warning(f"Worker {url} unreachable during switch: {e}")
+            return None
+
+    responses = await asyncio.gather(*(send(url) for url in workers.urls))
+    failed = [response for response in responses if response is None or response.status_code >= 400]
+
+    if len(failed) == len(responses):
+        # No worker switched, so they all still agree on the model
+        answered = [response for response in failed if response is not None]
+        if not answered:
+            raise HTTPException(status_code=502, detail="No agent workers reachable")
+        return JSONResponse(status_code=answered[0].status_code, content=answered[0].json())
+
+    if failed:
+        outcomes = []
+        for url, response in zip(workers.urls, responses):
+            if response is None:
+                outcomes.append({"url": url, "status_code": None, "error": "Worker unreachable"})
+            else:
+                outcomes.append({"url": url, "status_code": response.status_code, "response": response.json()})
+        logger.warning(f"Model switch failed on {len(failed)} of {len(responses)} workers")
+        return JSONResponse(status_code=207, content={
+            "detail": f"Switch failed on {len(failed)} of {len(responses)} workers; "
+                      f"they keep their previous model",
+            "workers": outcomes
+        })
+
+    first = responses[0].json()
+    # Hot swap: one dispatcher job tracks the background switch on every worker
+    if responses[0].status_code == 202:
+        remember_switch_job(first["job"]["job_id"], [
+            (url, response.json()["job"]["job_id"]) for url, response in zip(workers.urls, responses)
+        ])
+    return JSONResponse(status_code=responses[0].status_code, content=first)
+
+
+@app.get("/demo-models/switch/{job_id}")
+async def get_switch_job(job_id: str):
+    """Combined status of a switch running on every worker"""
+    entry = switch_jobs.get(job_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Unknown switch job: {job_id}")
+    if entry["result"] is not None:
+        return entry["result"]
+
+    try:
+        responses = await asyncio.gather(*(
+            client.get(f"{url}/demo-models/switch/{worker_job_id}") for url, worker_job_id in entry["workers"]
+        ))
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Worker unreachable: {e}")
+
+    bodies = []
+    for response in responses:
+        if response.status_code >= 400:
+            return JSONResponse(status_code=response.status_code, content=response.json())
+        body = response.json()
+        body["job"]["job_id"] = job_id
+        bodies.append(body)
+
+    # Failed if any worker failed, loading while any worker is still loading
+    combined = bodies[0]
+    for status in ("loading", "failed"):
+        combined = next((body for body in bodies if body["job"]["status"] == status), combined)
+    if all(body["job"]["status"] != "loading" for body in bodies):
+        # Every worker finished: answer from here on without the worker job ids,
+        # which the workers' own bounded histories will drop
+        entry["workers"], entry["result"] = [], combined
+    return combined
+
+
+@app.get("/metrics")
+async def get_metrics(request: Request):
+    """
+    Summary of the shared telemetry database, answered once, with each worker's
+    in-process stats (admission queues, telemetry writer, resources...) under workers
+    """
+    bodies = fan_out_bodies(await fan_out(request))
+    merged = {key: value for key, value in bodies[0][1].items() if key not in PROCESS_METRICS}
+    merged["workers"] = [
+        {"url": url, **{key: body[key] for key in PROCESS_METRICS if key in body}}
+        for url, body in bodies
+    ]
+    return merged
+
+
+@app.get("/metrics/prometheus")
+async def get_prometheus_metrics(request: Request):
+    """Every worker's exposition, each series labelled with the worker it came from"""
+    bodies = fan_out_bodies(await fan_out(request), decode=lambda response: response.text)
+    return PlainTextResponse(label_expositions(bodies, label="worker"), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@app.get("/debug/profile")
+async def debug_profile(request: Request):
+    """Sample every worker for the same window; each writes its own profile"""
+    bodies = fan_out_bodies(await fan_out(request))
+    return {"workers": [{"url": url, **body} for url, body in bodies]}
+
+
+@app.get("/debug/traces")
+async def list_traces(request: Request, limit: int = 50):
+    """Newest traces across the workers' in-memory trace buffers"""
+    bodies = fan_out_bodies(await fan_out(request))
+    traces = [trace for _, body in bodies for trace in body["traces"]]
+    traces.sort(key=lambda trace: trace.get("start_time_unix_nano", 0), reverse=True)
+    return {
+        "traces": traces[:limit],
+        "workers": [{"url": url, "tracer": body.get("tracer")} for url, body in bodies]
+    }
+
+
+@app.get("/debug/traces/{trace_id}")
+async def get_trace(trace_id: str, request: Request):
+    """A trace from whichever worker served its request"""
+    bodies = fan_out_bodies(await fan_out(request), ignore_status={404})
+    if not bodies:
+        raise HTTPException(status_code=404, detail=f"Trace {trace_id} not found")
+    return bodies[0][1]
+
+
+@app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"])
+async def forward(path: str, request: Request):
+    """Proxy a request to the least busy worker, streaming the response back"""
+    workers = get_pool()
+    body = await request.body()
+    headers = forwarded_headers(request.headers)
+
+    # Per-process streams stay on the first worker so reconnects see the same source
+    pinned = workers.urls[:1] if path in PINNED_PATHS else None
+    counted = pinned is None
+
+    tried = set()
+    while True:
+        url = workers.pick(exclude=tried, only=pinned)
+        if url is None:
+            raise HTTPException(status_code=503, detail="No agent workers available")
+
+        if counted:
+            workers.in_flight[url] += 1
+        upstream_request = client.build_request(
+            request.method, f"{url}/{path}", params=request.query_params,
+            content=body, headers=headers
+        )
+        try:
+            upstream = await client.send(upstream_request, stream=True)
+            break
+        except httpx.ConnectError as e:
+            # Nothing was sent, so another worker can take the request
+            if counted:
+                workers.in_flight[url] -= 1
+            workers.failures[url] += 1
+            tried.add(url)
+            logger.warning(f"Worker {url} unreachable: {e}")
+        except httpx.HTTPError as e:
+            if counted:
+                workers.in_flight[url] -= 1
+            workers.failures[url] += 1
+            raise HTTPException(status_code=502, detail=f"Worker {url} failed: {e}")
+
+    async def relay():
+        try:
+            async for chunk in upstream.aiter_raw():
+                yield chunk
+        finally:
+            await upstream.aclose()
+            if counted:
+                workers.in_flight[url] -= 1
+            workers.completed[url] += 1
+
+    return StreamingResponse(
+        relay(),
+        status_code=upstream.status_code,
+        headers=forwarded_headers(upstream.headers)
+    )
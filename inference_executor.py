@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Inference executor for Edge Foundry
+Runs blocking model calls on dedicated worker threads behind a bounded queue,
+so the FastAPI event loop stays free for health, metrics and control requests.
+"""
+
+import asyncio
+import contextvars
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when the inference queue cannot accept more work"""
+    pass
+
+
+class InferenceStream:
+    """
+    Async iterator over the items a streaming job yields on a worker thread.
+    After iteration ends, timings holds the job's queue_wait_ms and execution_ms.
+    """
+
+    _END = object()
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+        self._items: asyncio.Queue = asyncio.Queue()
+        self._cancelled = threading.Event()
+        self._future: Optional[Future] = None
+
+    def __aiter__(self) -> "InferenceStream":
+        return self
+
+    async def __anext__(self) -> Any:
+        item, error = await self._items.get()
+        if item is InferenceStream._END:
+            if error is not None:
+                raise error
+            raise StopAsyncIteration
+        return item
+
+    def cancel(self):
+        """Stop producing items, e.g. because the client disconnected"""
+        self._cancelled.set()
+        if self._future is not None:
+            self._future.cancel()
+
+
+class InferenceExecutor:
+    """Bounded pool of worker threads that runs inference jobs off the event loop"""
+
+    def __init__(self, max_workers: int = 1, max_queue_size: int = 32):
+        self.max_workers = max(1, max_workers)
+        self.max_queue_size = max(1, max_queue_size)
+        self._queue = queue.Queue(maxsize=self.max_queue_size)
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._shutdown = False
+
+        # Counters exposed through get_stats()
+        self._active = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._total_queue_wait_ms = 0.0
+        self._total_execution_ms = 0.0
+
+    def start(self):
+        """Start the worker threads (idempotent)"""
+        with self._lock:
+            if self._threads or self._shutdown:
+                return
+            for i in range(self.max_workers):
+                thread = threading.Thread(
+                    target=self._worker,
+                    name=f"inference-worker-{i}",
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+        logger.info(f"Inference executor started with {self.max_workers} worker(s), "
+                    f"queue size {self.max_queue_size}")
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """
+        Queue a blocking job. The returned future resolves to (result, timings),
+        where timings holds queue_wait_ms and execution_ms for the job. The job runs in
+        a copy of the caller's context, so context variables such as the current trace
+        span carry over to the worker thread.
+        Raises QueueFullError if the queue is at capacity.
+        """
+        if self._shutdown:
+            raise RuntimeError("Inference executor is shut down")
+        if not self._threads:
+            self.start()
+
+        future: Future = Future()
+        try:
+            self._queue.put_nowait((future, time.time(), contextvars.copy_context(), fn, args, kwargs))
+        except queue.Full:
+            with self._lock:
+                self._rejected += 1
+            raise QueueFullError(
+                f"Inference queue is full ({self.max_queue_size} pending requests)"
+            )
+        return future
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Tuple[Any, Dict[str, float]]:
+        """Queue a blocking job and await its (result, timings) without blocking the loop"""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stream(self, fn: Callable[..., Iterable[Any]], *args, **kwargs) -> InferenceStream:
+        """
+        Queue a job that returns an iterable (e.g. a token generator) and relay each
+        item back to the calling event loop as it is produced.
+        Must be called from a coroutine. Raises QueueFullError if the queue is at capacity.
+        """
+        loop = asyncio.get_running_loop()
+        stream = InferenceStream()
+
+        def produce():
+            items = fn(*args, **kwargs)
+            try:
+                for item in items:
+                    if stream._cancelled.is_set():
+                        break
+                    loop.call_soon_threadsafe(stream._items.put_nowait, (item, None))
+            finally:
+                # Close generators now so their cleanup (e.g. cancelling a batched
+                # sequence) runs on cancellation rather than at garbage collection
+                close = getattr(items, "close", None)
+                if close is not None:
+                    close()
+
+        def finish(future: Future):
+            error = None
+            if future.cancelled():
+                error = asyncio.CancelledError()
+            elif future.exception() is not None:
+                error = future.exception()
+            else:
+                stream.timings = future.result()[1]
+            loop.call_soon_threadsafe(stream._items.put_nowait, (InferenceStream._END, error))
+
+        stream._future = self.submit(produce)
+        stream._future.add_done_callback(finish)
+        return stream
+
+    def _worker(self):
+        """Worker loop: pull jobs off the queue until a shutdown sentinel arrives"""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                break
+
+            future, enqueued_at, context, fn, args, kwargs = item
+            try:
+                # Skip jobs whose caller went away while they were queued
+                if not future.set_running_or_notify_cancel():
+                    continue
+
+                started_at = time.time()
+                queue_wait_ms = (started_at - enqueued_at) * 1000
+                with self._lock:
+                    self._active += 1
+
+                try:
+                    result = context.run(fn, *args, **kwargs)
+                except BaseException as e:
+                    execution_ms = (time.time() - started_at) * 1000
+                    future.set_exception(e)
+                    failed = True
+                else:
+                    execution_ms = (time.time() - started_at) * 1000
+                    future.set_result((result, {
+                        "queue_wait_ms": queue_wait_ms,
+                        "execution_ms": execution_ms
+                    }))
+                    failed = False
+
+                with self._lock:
+                    self._active -= 1
+                    self._total_queue_wait_ms += queue_wait_ms
+                    self._total_execution_ms += execution_ms
+                    if failed:
+                        self._failed += 1
+                    else:
+                        self._completed += 1
+            finally:
+                self._queue.task_done()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue depth and timing counters"""
+        with self._lock:
+            finished = self._completed + self._failed
+            return {
+                "workers": self.max_workers,
+                "max_queue_size": self.max_queue_size,
+                "queue_depth": self._queue.qsize(),
+                "active": self._active,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "avg_queue_wait_ms": round(self._total_queue_wait_ms / finished, 2) if finished else 0,
+                "avg_execution_ms": round(self._total_execution_ms / finished, 2) if finished else 0
+            }
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting work; queued jobs are drained before the workers exit"""
+        with self._lock:
+            if self._shutdown:
+                return
+            self._shutdown = True
+            threads = list(self._threads)
+
+        for _ in threads:
+            self._queue.put(None)
+        if wait:
+            for thread in threads:
+                thread.join()
+        logger.info("Inference executor stopped")
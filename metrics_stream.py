@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Live metrics for Edge Foundry dashboards
+Keeps the telemetry summary, percentiles and recent inferences up to date in memory
+and fans changes out to every /metrics/stream subscriber, so any number of open
+dashboards costs one database read at startup instead of a full summary per poll.
+"""
+
+import asyncio
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from quantiles import QuantileSketch
+from telemetry import (
+    TelemetryDB, RECENT_RECORD_COLUMNS, SKETCH_METRICS,
+    fold_rollup_totals, rollup_values, summarize_rollup_totals, summarize_sketches
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """One viewer's bounded event queue; events are dropped rather than buffered without limit"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_queue_size: int):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self.dropped = 0
+
+    def put(self, event: Tuple[str, Dict[str, Any]]):
+        """Queue an event; runs on the subscriber's event loop"""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Next event, or None if nothing arrives within timeout seconds"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class MetricsBroadcaster:
+    """
+    In-memory view of the telemetry summary. start() seeds it from the database once;
+    publish() then folds every finished inference in and pushes an `inference` event to
+    subscribers, and a `summary` event with the updated totals follows every
+    summary_interval seconds while anything has changed.
+    Only this process's inferences are folded in after the seed: under a worker group,
+    worker names the process, and snapshots and summaries carry it so dashboards know
+    the live totals are that worker's view.
+    """
+
+    def __init__(self, db: TelemetryDB, recent_limit: int = 20, summary_interval: float = 5.0,
+                 max_queue_size: int = 256, worker: Optional[str] = None):
+        self.db = db
+        self.worker = worker
+        self.recent_limit = recent_limit
+        self.summary_interval = summary_interval
+        self.max_queue_size = max_queue_size
+        self._lock = threading.Lock()
+        self._subscribers: List[Subscription] = []
+        self._totals: Dict[str, Any] = {}
+        self._sketches = {metric: QuantileSketch() for metric in SKETCH_METRICS}
+        self._recent: deque = deque(maxlen=recent_limit)
+        self._pending = 0
+        self._published = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def seed(self):
+        """Load the persisted totals, sketches and recent records; the only database read"""
+        totals = self.db.get_rollup_totals()
+        sketches = self.db.get_sketches()
+        records = self.db.get_records(limit=self.recent_limit)["records"]
+        with self._lock:
+            self._totals = totals
+            self._sketches = sketches
+            self._recent = deque(
+                ([record.get(column) for column in RECENT_RECORD_COLUMNS] for record in reversed(records)),
+                maxlen=self.recent_limit
+            )
+
+    def start(self):
+        """Seed from the database and start the summary task on the running event loop"""
+        try:
+            self.seed()
+        except Exception as e:
+            logger.error(f"Could not seed live metrics from the telemetry database: {e}")
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def publish(self, record: Dict[str, Any], model: Optional[str] = None):
+        """
+        Fold a finished inference into the live summary and push it to subscribers.
+        Takes the telemetry record as submitted to the writer; safe to call from any thread.
+        """
+        event = dict(record)
+        latency_ms = event["latency_ms"]
+        event.setdefault("timestamp", datetime.now().isoformat())
+        event.setdefault("tokens_per_second",
+                         event["tokens_generated"] / (latency_ms / 1000.0) if latency_ms > 0 else 0)
+        if model is not None:
+            event["model"] = model
+        row = [event.get(column) for column in RECENT_RECORD_COLUMNS]
+
+        with self._lock:
+            fold_rollup_totals(self._totals, rollup_values(event))
+            for metric, skip_cache_hits in SKETCH_METRICS.items():
+                if event.get(metric) is not None and not (skip_cache_hits and event.get("cache_hit")):
+                    self._sketches[metric].add(event[metric])
+            self._recent.append(row)
+            self._pending += 1
+            self._published += 1
+        self._broadcast("inference", {"record": event, "row": row})
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current summary, percentiles and recent records, shaped like GET /metrics"""
+        with self._lock:
+            return {
+                "summary": summarize_rollup_totals(self._totals),
+                "percentiles": summarize_sketches(self._sketches),
+                "recent_records": list(reversed(self._recent)),
+                "worker": self.worker,
+            }
+
+    def subscribe(self) -> Subscription:
+        """Register a viewer on the current event loop"""
+        subscription = Subscription(asyncio.get_running_loop(), self.max_queue_size)
+        with self._lock:
+            self._subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+    def _broadcast(self, event: str, data: Dict[str, Any]):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, (event, data))
+            except RuntimeError:
+                # The subscriber's loop has closed
+                self.unsubscribe(subscription)
+
+    def flush_summary(self) -> bool:
+        """Broadcast a summary event if any inference arrived since the last one"""
+        with self._lock:
+            new_inferences, self._pending = self._pending, 0
+        if not new_inferences:
+            return False
+        self._broadcast("summary", {**self.snapshot(), "new_inferences": new_inferences})
+        return True
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.summary_interval)
+            try:
+                self.flush_summary()
+            except Exception as e:
+                logger.error(f"Live metrics summary failed: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "published": self._published,
+                "dropped": sum(subscription.dropped for subscription in self._subscribers),
+                "summary_interval_s": self.summary_interval,
+                "worker": self.worker,
+            }
@@ -7,14 +7,97 @@ Handles loading and switching between different demo models.
 import os
 import time
 import logging
+import threading
+import uuid
 import yaml
-from typing import Dict, Any, Optional, List
-from llama_cpp import Llama
+import psutil
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, List, Iterator, Tuple
+import llama_cpp
+from llama_cpp import Llama, LlamaRAMCache, LlamaDiskCache
 from abc import ABC, abstractmethod
+from batch_scheduler import ContinuousBatchScheduler
+from tracing import tracer
 
 logger = logging.getLogger(__name__)
 
 
+class ModelNotResidentError(RuntimeError):
+    """Raised by acquire() in hot-swap mode for a model that is not loaded"""
+
+    def __init__(self, model_id: str):
+        super().__init__(f"Model {model_id} is not loaded")
+        self.model_id = model_id
+
+# Threads per model, set by `edgefoundry start --workers N` so workers don't oversubscribe cores
+N_THREADS_ENV = "EDGEFOUNDRY_N_THREADS"
+
+
+def format_prompt(prompt: str) -> str:
+    """Format prompt for better responses"""
+    return f"Human: {prompt}\nAssistant:"
+
+
+def stream_completion(llama: Llama, prompt_tokens: List[int], usage: Optional[Dict[str, Any]] = None,
+                      **params) -> Iterator[str]:
+    """
+    Stream a completion of an already tokenized prompt. llama.cpp reports no usage
+    when streaming, but sends one chunk per returned token, so counting chunks gives
+    the exact completion tokens; usage is kept current as the stream goes.
+    """
+    if usage is not None:
+        usage["prompt_tokens"] = len(prompt_tokens)
+        usage["completion_tokens"] = 0
+    for chunk in llama(prompt_tokens, stream=True, **params):
+        choice = chunk["choices"][0]
+        if choice["finish_reason"] is None and usage is not None:
+            usage["completion_tokens"] += 1
+        if choice["text"]:
+            yield choice["text"]
+
+
+def phase_timings(tokenize_ms: float, prompt_eval_ms: float, decode_ms: float,
+                  decode_tokens: int) -> Dict[str, Any]:
+    """Per-phase timings of one generation, as reported in usage["timings"]"""
+    return {
+        "tokenize_ms": tokenize_ms,
+        "prompt_eval_ms": prompt_eval_ms,
+        "decode_ms": decode_ms,
+        "decode_per_token_ms": decode_ms / decode_tokens if decode_tokens else None
+    }
+
+
+def perf_timings(llama: Llama, tokenize_ms: float) -> Dict[str, Any]:
+    """Phase timings from llama.cpp's own counters, reset just before the generation"""
+    perf = llama_cpp.llama_perf_context(llama.ctx)
+    return phase_timings(tokenize_ms, perf.t_p_eval_ms, perf.t_eval_ms, perf.n_eval)
+
+
+def trace_phases(timings: Optional[Dict[str, Any]], end_ns: int, parent=None):
+    """
+    Record llama.cpp's prompt evaluation and decode as spans laid end to end and
+    finishing at end_ns, under parent (the current span by default)
+    """
+    if not timings:
+        return
+    decode_start_ns = end_ns - int((timings.get("decode_ms") or 0) * 1e6)
+    prompt_eval_start_ns = decode_start_ns - int((timings.get("prompt_eval_ms") or 0) * 1e6)
+    tracer.record_span("llama_cpp.prompt_eval", prompt_eval_start_ns, decode_start_ns, parent)
+    tracer.record_span("llama_cpp.decode", decode_start_ns, end_ns, parent,
+                       decode_per_token_ms=timings.get("decode_per_token_ms"))
+
+
+def resolve_model_path(model_path: str) -> str:
+    """Prefer the copy under ./.edgefoundry for relative model paths"""
+    if not os.path.isabs(model_path):
+        working_model_path = f"./.edgefoundry/{model_path}"
+        if os.path.exists(working_model_path):
+            return working_model_path
+    return model_path
+
+
 class ModelWrapper(ABC):
     """Abstract base class for model wrappers"""
     
@@ -28,10 +111,20 @@ class ModelWrapper(ABC):
         """Run inference on the model"""
         pass
     
+    @abstractmethod
+    def stream_inference(self, prompt: str, usage: Optional[Dict[str, Any]] = None, **kwargs) -> Iterator[str]:
+        """Run inference on the model, yielding text as it is generated"""
+        pass
+    
     @abstractmethod
     def get_model_info(self) -> Dict[str, Any]:
         """Get model information"""
         pass
+    
+    @abstractmethod
+    def unload(self):
+        """Free the model and any resources attached to it"""
+        pass
 
 
 class LlamaCPPWrapper(ModelWrapper):
@@ -40,63 +133,178 @@ class LlamaCPPWrapper(ModelWrapper):
     def __init__(self):
         self.model = None
         self.model_config = None
+        self.scheduler = None
+        # A single Llama context must not run two generations at once
+        self._lock = threading.Lock()
     
     def load_model(self, config: Dict[str, Any]) -> Any:
         """Load a GGUF model using LlamaCPP"""
         logger.info(f"Loading LlamaCPP model: {config['model_path']}")
         start_time = time.time()
         
-        # Get model path
-        model_path = config['model_path']
+        # Get model path, trying the working directory first for relative paths
+        model_path = resolve_model_path(config['model_path'])
         
-        # If it's a relative path, try working directory first
-        if not os.path.isabs(model_path):
-            working_model_path = f"./.edgefoundry/{model_path}"
-            if os.path.exists(working_model_path):
-                model_path = working_model_path
-        
-        # Load model with configuration
-        model_config = config.get('config', {})
+        # Load model with configuration; worker groups split the cores between processes
+        model_config = dict(config.get('config', {}))
+        if 'n_threads' not in model_config and os.environ.get(N_THREADS_ENV):
+            model_config['n_threads'] = int(os.environ[N_THREADS_ENV])
         self.model = Llama(
             model_path=model_path,
             **model_config
         )
         
         self.model_config = config
+        
+        # Optionally keep KV state of evaluated prompts so shared prefixes are reused
+        prompt_cache = config.get('prompt_cache', {}) or {}
+        if prompt_cache.get('enabled', False):
+            capacity_bytes = int(prompt_cache.get('capacity_mb', 512) * 1024 * 1024)
+            if prompt_cache.get('type', 'ram') == 'disk':
+                cache_dir = prompt_cache.get(
+                    'path', f"./.edgefoundry/prompt_cache/{os.path.basename(model_path)}"
+                )
+                self.model.set_cache(LlamaDiskCache(cache_dir=cache_dir, capacity_bytes=capacity_bytes))
+            else:
+                self.model.set_cache(LlamaRAMCache(capacity_bytes=capacity_bytes))
+            logger.info(f"Prompt cache enabled ({prompt_cache.get('type', 'ram')}, "
+                        f"{capacity_bytes / 1024 / 1024:.0f} MB)")
+        
+        # Optionally share decode steps between concurrent requests
+        batching = config.get('batching', {}) or {}
+        if batching.get('enabled', False):
+            self.scheduler = ContinuousBatchScheduler(
+                self.model,
+                max_sequences=batching.get('max_sequences', 4),
+                n_ctx=batching.get('n_ctx', model_config.get('n_ctx')),
+                n_batch=batching.get('n_batch'),
+                seed=model_config.get('seed')
+            )
+            self.scheduler.start()
+        
         load_time = time.time() - start_time
         logger.info(f"Model loaded in {load_time:.2f} seconds")
         
         return self.model
     
+    def format_prompt(self, prompt: str) -> str:
+        """Format prompt for better responses"""
+        return format_prompt(prompt)
+    
+    def _generation_params(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """Resolve llama.cpp generation parameters from request kwargs and model config"""
+        defaults = self.model_config.get('config', {})
+        return {
+            "max_tokens": kwargs.get('max_tokens', defaults.get('max_tokens', 64)),
+            "temperature": kwargs.get('temperature', defaults.get('temperature', 0.7)),
+            "stop": ["Human:", "User:", "Student:", "\n\n", "Assistant:"],
+            "echo": False
+        }
+    
+    def _tokenize(self, prompt: str) -> Tuple[List[int], float]:
+        """
+        Tokenize the formatted prompt once; llama.cpp accepts the token list directly.
+        Returns the tokens and the time taken in milliseconds.
+        """
+        started = time.perf_counter()
+        tokens = self.model.tokenize(self.format_prompt(prompt).encode("utf-8"), add_bos=True, special=True)
+        return tokens, (time.perf_counter() - started) * 1000
+    
+    def _cached_prompt_tokens(self, n_prompt_tokens: int) -> int:
+        """
+        Prompt tokens served from the KV cache since the last perf reset rather than evaluated.
+        llama.cpp counts single-token batches as decode (n_eval), not prompt evaluation
+        (n_p_eval), so a prompt whose suffix after the cached prefix is one token (including
+        a fully cached prompt, whose last token is re-decoded for its logits) reports no
+        prompt evaluation; at least one prompt token is always evaluated. A longer suffix
+        whose final n_batch chunk is a single token is still counted one token short.
+        """
+        evaluated = max(1, llama_cpp.llama_perf_context(self.model.ctx).n_p_eval)
+        return max(0, n_prompt_tokens - evaluated)
+    
     def run_inference(self, prompt: str, **kwargs) -> Dict[str, Any]:
         """Run inference on the loaded model"""
         if self.model is None:
             raise RuntimeError("Model not loaded")
         
-        # Format prompt for better responses
-        formatted_prompt = f"Human: {prompt}\nAssistant:"
-        
-        # Get inference parameters
-        max_tokens = kwargs.get('max_tokens', self.model_config.get('config', {}).get('max_tokens', 64))
-        temperature = kwargs.get('temperature', self.model_config.get('config', {}).get('temperature', 0.7))
+        params = self._generation_params(kwargs)
+        if self.scheduler is not None:
+            # Time in the scheduler includes waiting for a free sequence slot
+            with tracer.span("llama_cpp.scheduler"):
+                result = self.scheduler.submit(
+                    self.format_prompt(prompt),
+                    max_tokens=params["max_tokens"],
+                    temperature=params["temperature"],
+                    stop=params["stop"]
+                ).result()
+                trace_phases(result["usage"]["timings"], time.time_ns())
+            result["usage"]["cached_prompt_tokens"] = 0
+            return result
         
         # Run inference
-        result = self.model(
-            formatted_prompt,
-            max_tokens=max_tokens,
-            stop=["Human:", "User:", "Student:", "\n\n", "Assistant:"],
-            echo=False,
-            temperature=temperature
-        )
+        with self._lock:
+            with tracer.span("llama_cpp.tokenize"):
+                prompt_tokens, tokenize_ms = self._tokenize(prompt)
+            with tracer.span("llama_cpp.generate", prompt_tokens=len(prompt_tokens)) as span:
+                llama_cpp.llama_perf_context_reset(self.model.ctx)
+                result = self.model(
+                    prompt_tokens,
+                    **params
+                )
+                result["usage"]["cached_prompt_tokens"] = self._cached_prompt_tokens(len(prompt_tokens))
+                result["usage"]["timings"] = perf_timings(self.model, tokenize_ms)
+                span.set_attributes(completion_tokens=result["usage"]["completion_tokens"],
+                                    cached_prompt_tokens=result["usage"]["cached_prompt_tokens"])
+                trace_phases(result["usage"]["timings"], time.time_ns())
         
         return result
     
+    def stream_inference(self, prompt: str, usage: Optional[Dict[str, Any]] = None, **kwargs) -> Iterator[str]:
+        """
+        Run inference on the loaded model, yielding text pieces as tokens are produced.
+        If usage is given, it is filled with prompt and completion token counts and phase timings.
+        """
+        if self.model is None:
+            raise RuntimeError("Model not loaded")
+        
+        params = self._generation_params(kwargs)
+        # Spans can't stay open across yields, so the stream is recorded once it ends
+        if self.scheduler is not None:
+            started_ns = time.time_ns()
+            yield from self.scheduler.stream(
+                self.format_prompt(prompt),
+                max_tokens=params["max_tokens"],
+                temperature=params["temperature"],
+                stop=params["stop"],
+                usage=usage
+            )
+            ended_ns = time.time_ns()
+            span = tracer.record_span("llama_cpp.scheduler", started_ns, ended_ns)
+            if usage is not None:
+                usage["cached_prompt_tokens"] = 0
+                trace_phases(usage.get("timings"), ended_ns, span)
+            return
+        
+        with self._lock:
+            started_ns = time.time_ns()
+            prompt_tokens, tokenize_ms = self._tokenize(prompt)
+            llama_cpp.llama_perf_context_reset(self.model.ctx)
+            yield from stream_completion(self.model, prompt_tokens, usage, **params)
+            
+            timings = perf_timings(self.model, tokenize_ms)
+            if usage is not None:
+                usage["cached_prompt_tokens"] = self._cached_prompt_tokens(len(prompt_tokens))
+                usage["timings"] = timings
+            ended_ns = time.time_ns()
+            span = tracer.record_span("llama_cpp.stream", started_ns, ended_ns, prompt_tokens=len(prompt_tokens))
+            trace_phases(timings, ended_ns, span)
+    
     def get_model_info(self) -> Dict[str, Any]:
         """Get model information"""
         if self.model_config is None:
             return {}
         
-        return {
+        info = {
             "name": self.model_config.get('name', 'Unknown'),
             "description": self.model_config.get('description', ''),
             "parameters": self.model_config.get('parameters', 'Unknown'),
@@ -105,6 +313,20 @@ class LlamaCPPWrapper(ModelWrapper):
             "model_type": self.model_config.get('model_type', 'Unknown'),
             "runtime": self.model_config.get('runtime', 'Unknown')
         }
+        if self.scheduler is not None:
+            info["batching"] = self.scheduler.get_stats()
+        return info
+    
+    def unload(self):
+        """Stop the batch scheduler and free the llama.cpp model"""
+        # Wait for a generation running on the shared context to finish
+        with self._lock:
+            if self.scheduler is not None:
+                self.scheduler.stop()
+                self.scheduler = None
+            if self.model is not None:
+                self.model.close()
+                self.model = None
 
 
 class ModelManager:
@@ -115,6 +337,27 @@ class ModelManager:
         self.demo_models = {}
         self.current_model = None
         self.current_wrapper = None
+        
+        # Resident pool of loaded wrappers, least recently used first
+        self.resident: "OrderedDict[str, ModelWrapper]" = OrderedDict()
+        self.resident_memory_mb: Dict[str, float] = {}
+        self._pool_lock = threading.RLock()
+        # Serializes model loads; held without the pool lock so resident models keep serving
+        self._load_lock = threading.Lock()
+        # Requests holding each wrapper, and evicted wrappers waiting for them to finish
+        self._refcounts: Dict[ModelWrapper, int] = {}
+        self._draining: List[ModelWrapper] = []
+        self._pool_hits = 0
+        self._pool_loads = 0
+        self._pool_evictions = 0
+        # Seconds the most recent load of each model took
+        self.load_seconds: Dict[str, float] = {}
+        
+        # Background switch jobs, oldest first
+        self.switch_jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._switch_futures: Dict[str, Future] = {}
+        self._pending_switches: Dict[str, str] = {}
+        
         self.load_demo_models_config()
     
     def load_demo_models_config(self):
@@ -124,11 +367,13 @@ class ModelManager:
                 config = yaml.safe_load(f)
                 self.demo_models = config.get('demo_models', {})
                 self.default_model = config.get('default_model', 'tinyllama-1b-3bit')
+                self.switching_config = config.get('model_switching', {}) or {}
                 logger.info(f"Loaded {len(self.demo_models)} demo models")
         except Exception as e:
             logger.error(f"Failed to load demo models config: {e}")
             self.demo_models = {}
             self.default_model = None
+            self.switching_config = {}
     
     def get_available_models(self) -> List[Dict[str, Any]]:
         """Get list of available demo models"""
@@ -146,56 +391,328 @@ class ModelManager:
             })
         return models
     
+    def get_max_concurrency(self) -> int:
+        """Largest number of requests any configured model can serve at once"""
+        concurrency = 1
+        for config in self.demo_models.values():
+            batching = config.get('batching', {}) or {}
+            if batching.get('enabled', False):
+                concurrency = max(concurrency, batching.get('max_sequences', 4))
+        return concurrency
+    
     def get_model_config(self, model_id: str) -> Optional[Dict[str, Any]]:
         """Get configuration for a specific model"""
         return self.demo_models.get(model_id)
     
+    def get_memory_budget_mb(self) -> float:
+        """RAM the resident pool may use (model_switching.memory_budget_mb, else 75% of system RAM)"""
+        budget = self.switching_config.get('memory_budget_mb')
+        if budget is None:
+            return psutil.virtual_memory().total / 1024 / 1024 * 0.75
+        return float(budget)
+    
+    def estimate_model_memory_mb(self, model_id: str) -> float:
+        """Estimate the RAM a model needs: its memory_mb setting, else the GGUF file size"""
+        config = self.demo_models.get(model_id, {})
+        if config.get('memory_mb') is not None:
+            return float(config['memory_mb'])
+        model_path = resolve_model_path(config.get('model_path', ''))
+        if os.path.exists(model_path):
+            return os.path.getsize(model_path) / 1024 / 1024
+        return 0.0
+    
+    def is_pinned(self, model_id: str) -> bool:
+        """Pinned models are never evicted from the resident pool"""
+        if self.demo_models.get(model_id, {}).get('pinned', False):
+            return True
+        return model_id == self.default_model and self.switching_config.get('pin_default', True)
+    
+    def _evict(self, model_id: str):
+        """Drop a model from the resident pool and free it"""
+        wrapper = self.resident.pop(model_id)
+        self.resident_memory_mb.pop(model_id, None)
+        if model_id == self.current_model:
+            self.current_model = None
+            self.current_wrapper = None
+        self._pool_evictions += 1
+        
+        # Requests still running on the model finish before it is freed
+        if self._refcounts.get(wrapper, 0) > 0:
+            self._draining.append(wrapper)
+            logger.info(f"Evicted model from resident pool: {model_id} "
+                        f"(freed after {self._refcounts[wrapper]} in-flight request(s))")
+        else:
+            wrapper.unload()
+            logger.info(f"Evicted model from resident pool: {model_id}")
+    
+    def _evict_to_fit(self, needed_mb: float, keep: Optional[str] = None):
+        """Evict least recently used, unpinned models until needed_mb more fits in the budget"""
+        budget = self.get_memory_budget_mb()
+        for model_id in list(self.resident):
+            if sum(self.resident_memory_mb.values()) + needed_mb <= budget:
+                return
+            if model_id != keep and not self.is_pinned(model_id):
+                self._evict(model_id)
+        
+        used = sum(self.resident_memory_mb.values())
+        if used + needed_mb > budget:
+            logger.warning(f"Resident models use {used + needed_mb:.0f} MB, "
+                           f"over the {budget:.0f} MB budget")
+    
     def load_model(self, model_id: str) -> bool:
-        """Load a specific demo model"""
+        """Load a specific demo model, or make it current if it is already resident"""
         if model_id not in self.demo_models:
             logger.error(f"Model {model_id} not found in demo models")
             return False
         
-        try:
-            model_config = self.demo_models[model_id]
-            runtime = model_config.get('runtime', 'llama_cpp')
+        with self._load_lock:
+            with self._pool_lock:
+                # Resident models switch without reloading
+                if model_id in self.resident:
+                    self.resident.move_to_end(model_id)
+                    self.current_model = model_id
+                    self.current_wrapper = self.resident[model_id]
+                    self._pool_hits += 1
+                    logger.info(f"Switched to resident model: {model_id}")
+                    return True
+                
+                # Make room before loading; the current model is kept in case the load fails
+                cache_models = self.switching_config.get('cache_models', False)
+                memory_mb = self.estimate_model_memory_mb(model_id)
+                if cache_models:
+                    self._evict_to_fit(memory_mb, keep=self.current_model)
             
-            # Create appropriate wrapper based on runtime
-            if runtime == 'llama_cpp':
-                wrapper = LlamaCPPWrapper()
-            else:
-                logger.error(f"Unsupported runtime: {runtime}")
+            # Load outside the pool lock so requests on resident models keep being served
+            try:
+                model_config = self.demo_models[model_id]
+                runtime = model_config.get('runtime', 'llama_cpp')
+                
+                # Create appropriate wrapper based on runtime
+                if runtime == 'llama_cpp':
+                    wrapper = LlamaCPPWrapper()
+                else:
+                    logger.error(f"Unsupported runtime: {runtime}")
+                    return False
+                
+                # Load the model
+                load_started = time.time()
+                with tracer.span("model_manager.load_model", model_id=model_id):
+                    wrapper.load_model(model_config)
+                load_seconds = time.time() - load_started
+                
+            except Exception as e:
+                logger.error(f"Failed to load model {model_id}: {e}")
                 return False
             
-            # Load the model
-            wrapper.load_model(model_config)
-            
-            # Update current model
-            self.current_model = model_id
-            self.current_wrapper = wrapper
+            # Swap the current model atomically
+            with self._pool_lock:
+                self._pool_loads += 1
+                self.load_seconds[model_id] = load_seconds
+                self.resident[model_id] = wrapper
+                self.resident_memory_mb[model_id] = memory_mb
+                self.current_model = model_id
+                self.current_wrapper = wrapper
+                
+                # Without caching only the current model stays loaded
+                if cache_models:
+                    self._evict_to_fit(0, keep=model_id)
+                else:
+                    for resident_id in list(self.resident):
+                        if resident_id != model_id:
+                            self._evict(resident_id)
             
-            logger.info(f"Successfully loaded model: {model_id}")
+            logger.info(f"Successfully loaded model: {model_id} in {load_seconds:.2f}s")
             return True
-            
-        except Exception as e:
-            logger.error(f"Failed to load model {model_id}: {e}")
-            return False
     
-    def run_inference(self, prompt: str, **kwargs) -> Dict[str, Any]:
-        """Run inference on the current model"""
-        if self.current_wrapper is None:
+    def is_resident(self, model_id: str) -> bool:
+        """Whether a model is loaded and can be switched to without a reload"""
+        with self._pool_lock:
+            return model_id in self.resident
+    
+    def hot_swap_enabled(self) -> bool:
+        """Whether model switches load in the background (model_switching.hot_swap)"""
+        return self.switching_config.get('hot_swap', False)
+    
+    @contextmanager
+    def acquire(self, model_id: Optional[str] = None) -> Iterator[ModelWrapper]:
+        """
+        Hold a model (the current one by default) for the duration of a request.
+        A model evicted while held is freed once its last request releases it.
+        A model that is not loaded is loaded inline, except in hot-swap mode, where
+        loads only run in the background and ModelNotResidentError is raised instead.
+        """
+        wrapper = self._hold(model_id)
+        if wrapper is None and model_id is not None:
+            if self.hot_swap_enabled():
+                raise ModelNotResidentError(model_id)
+            if self.load_model(model_id):
+                wrapper = self._hold(model_id)
+        if wrapper is None:
             raise RuntimeError("No model loaded")
         
-        return self.current_wrapper.run_inference(prompt, **kwargs)
+        try:
+            yield wrapper
+        finally:
+            self._release(wrapper)
+    
+    def _hold(self, model_id: Optional[str]) -> Optional[ModelWrapper]:
+        """Take a reference on a loaded model, if it is loaded"""
+        with self._pool_lock:
+            if model_id is None or model_id == self.current_model:
+                wrapper = self.current_wrapper
+            else:
+                wrapper = self.resident.get(model_id)
+            if wrapper is not None:
+                self._refcounts[wrapper] = self._refcounts.get(wrapper, 0) + 1
+            return wrapper
+    
+    def _release(self, wrapper: ModelWrapper):
+        """Drop a reference, freeing an evicted model once nothing holds it"""
+        with self._pool_lock:
+            self._refcounts[wrapper] -= 1
+            if self._refcounts[wrapper] > 0:
+                return
+            del self._refcounts[wrapper]
+            if wrapper not in self._draining:
+                return
+            self._draining.remove(wrapper)
+        wrapper.unload()
+        logger.info("Freed drained model")
+    
+    def start_switch(self, model_id: str) -> Dict[str, Any]:
+        """
+        Load a model on a background thread and switch to it once it is ready, while the
+        current model keeps serving. Returns the switch job; poll it with get_switch_job().
+        A switch already pending for the same model is returned instead of starting another.
+        """
+        with self._pool_lock:
+            pending_id = self._pending_switches.get(model_id)
+            if pending_id is not None:
+                return dict(self.switch_jobs[pending_id])
+            
+            job_id = uuid.uuid4().hex
+            job = {
+                "job_id": job_id,
+                "model_id": model_id,
+                "status": "loading",
+                "error": None,
+                "created_at": time.time(),
+                "finished_at": None
+            }
+            self.switch_jobs[job_id] = job
+            self._switch_futures[job_id] = Future()
+            self._pending_switches[model_id] = job_id
+            snapshot = dict(job)
+            
+            # Keep a bounded history of finished jobs
+            while len(self.switch_jobs) > 100:
+                old_id, old_job = next(iter(self.switch_jobs.items()))
+                if old_job["status"] == "loading":
+                    break
+                del self.switch_jobs[old_id]
+                self._switch_futures.pop(old_id, None)
+        
+        thread = threading.Thread(
+            target=self._run_switch,
+            args=(job_id, model_id),
+            name=f"model-switch-{model_id}",
+            daemon=True
+        )
+        thread.start()
+        return snapshot
+    
+    def _run_switch(self, job_id: str, model_id: str):
+        """Background body of a switch job"""
+        try:
+            success = self.load_model(model_id)
+            error = None if success else f"Failed to switch to model: {model_id}"
+        except Exception as e:
+            success = False
+            error = f"Failed to switch to model: {model_id}: {e}"
+        
+        with self._pool_lock:
+            job = self.switch_jobs.get(job_id)
+            if job is not None:
+                job["status"] = "completed" if success else "failed"
+                job["error"] = error
+                job["finished_at"] = time.time()
+            self._pending_switches.pop(model_id, None)
+            future = self._switch_futures.get(job_id)
+        if future is not None:
+            future.set_result(success)
+    
+    def get_switch_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get the state of a switch job, or None if it is unknown"""
+        with self._pool_lock:
+            job = self.switch_jobs.get(job_id)
+            return dict(job) if job is not None else None
+    
+    def switch_future(self, job_id: str) -> Optional[Future]:
+        """
+        Future resolving to whether a switch job succeeded, or None if the job is
+        unknown (finished jobs are pruned from the bounded history)
+        """
+        with self._pool_lock:
+            return self._switch_futures.get(job_id)
+    
+    def unload_all(self):
+        """Free every resident model"""
+        with self._pool_lock:
+            for model_id in list(self.resident):
+                self._evict(model_id)
+    
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Get resident models, memory use and pool counters"""
+        with self._pool_lock:
+            return {
+                "cache_models": self.switching_config.get('cache_models', False),
+                "memory_budget_mb": round(self.get_memory_budget_mb(), 2),
+                "memory_used_mb": round(sum(self.resident_memory_mb.values()), 2),
+                "hits": self._pool_hits,
+                "loads": self._pool_loads,
+                "evictions": self._pool_evictions,
+                "draining": len(self._draining),
+                "resident": [
+                    {
+                        "model_id": model_id,
+                        "memory_mb": round(self.resident_memory_mb.get(model_id, 0.0), 2),
+                        "pinned": self.is_pinned(model_id),
+                        "load_seconds": round(self.load_seconds.get(model_id, 0.0), 3),
+                        "current": model_id == self.current_model
+                    }
+                    for model_id in self.resident
+                ]
+            }
+    
+    def run_inference(self, prompt: str, model_id: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        """Run inference on the given model, or the current one"""
+        with tracer.span("model_manager.run_inference", model_id=model_id or self.current_model):
+            with self.acquire(model_id) as wrapper:
+                return wrapper.run_inference(prompt, **kwargs)
+    
+    def stream_inference(self, prompt: str, usage: Optional[Dict[str, Any]] = None,
+                         model_id: Optional[str] = None, **kwargs) -> Iterator[str]:
+        """Stream inference output from the given model, or the current one"""
+        with self.acquire(model_id) as wrapper:
+            yield from wrapper.stream_inference(prompt, usage=usage, **kwargs)
     
     def get_current_model_info(self) -> Dict[str, Any]:
         """Get information about the currently loaded model"""
-        if self.current_wrapper is None:
+        return self.get_resident_model_info(self.current_model)
+    
+    def get_resident_model_info(self, model_id: Optional[str]) -> Dict[str, Any]:
+        """Get information about a model in the resident pool"""
+        with self._pool_lock:
+            if model_id == self.current_model:
+                wrapper = self.current_wrapper
+            else:
+                wrapper = self.resident.get(model_id)
+        if wrapper is None:
             return {"loaded": False}
         
-        info = self.current_wrapper.get_model_info()
+        info = wrapper.get_model_info()
         info["loaded"] = True
-        info["model_id"] = self.current_model
+        info["model_id"] = model_id
         return info
     
     def get_sample_prompts(self, model_id: Optional[str] = None) -> List[str]:
@@ -211,7 +728,8 @@ class ModelManager:
             return True  # Already loaded
         
         # Load the new model
-        return self.load_model(model_id)
+        with tracer.span("model_manager.switch_model", model_id=model_id, from_model_id=self.current_model):
+            return self.load_model(model_id)
 
 
 # Global model manager instance
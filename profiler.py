@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+On-demand profiling for Edge Foundry
+A sampling profiler that periodically captures the stack of every live thread in
+the agent, written out both as collapsed stacks (for flamegraph.pl, speedscope and
+similar tools) and as a pstats file that `python -m pstats` or snakeviz can open.
+Single requests can instead be profiled exactly with cProfile.
+"""
+
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Tuple, Union
+
+DEFAULT_PROFILE_DIR = "./.edgefoundry/profiles"
+
+# (filename, first line, function name), the key pstats uses for a function
+FunctionKey = Tuple[str, int, str]
+
+
+def profile_name(kind: str) -> str:
+    """Unique file stem such as sampled-20240101-120000-1a2b3c"""
+    return f"{kind}-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+def frame_label(key: FunctionKey) -> str:
+    filename, line, name = key
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+class StackSampler:
+    """Samples the stacks of all other threads every interval seconds until stopped"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        # (thread name, frames root first) -> times seen
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.duration = time.perf_counter() - self.started_at
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    frames.append((code.co_filename, code.co_firstlineno, code.co_name))
+                    frame = frame.f_back
+                frames.reverse()
+                self.stacks[(names.get(ident, str(ident)), tuple(frames))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """One `thread;root;...;leaf count` line per distinct stack"""
+        lines = []
+        for (thread_name, frames), count in self.stacks.most_common():
+            lines.append(";".join([thread_name] + [frame_label(key) for key in frames]) + f" {count}")
+        return "\n".join(lines) + "\n"
+
+    def pstats_data(self) -> Dict[FunctionKey, tuple]:
+        """
+        Samples in the marshalled format of cProfile's stats: call counts are sample
+        counts and times are samples multiplied by the interval.
+        """
+        own: Counter = Counter()
+        inclusive: Counter = Counter()
+        edges: Counter = Counter()
+        for (_, frames), count in self.stacks.items():
+            if not frames:
+                continue
+            own[frames[-1]] += count
+            for key in set(frames):
+                inclusive[key] += count
+            for caller, callee in set(zip(frames, frames[1:])):
+                edges[(caller, callee)] += count
+
+        callers: Dict[FunctionKey, Dict[FunctionKey, tuple]] = {key: {} for key in inclusive}
+        for (caller, callee), count in edges.items():
+            callers[callee][caller] = (count, count, 0.0, count * self.interval)
+        return {
+            key: (count, count, own[key] * self.interval, count * self.interval, callers[key])
+            for key, count in inclusive.items()
+        }
+
+
+def write_sampled_profile(sampler: StackSampler, profile_dir: Union[str, Path],
+                          name: str) -> Dict[str, str]:
+    """Write a finished sampler's .collapsed and .prof files; returns their file names"""
+    profile_dir = Path(profile_dir)
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    files = {"collapsed": f"{name}.collapsed", "pstats": f"{name}.prof"}
+    (profile_dir / files["collapsed"]).write_text(sampler.collapsed())
+    with open(profile_dir / files["pstats"], "wb") as f:
+        marshal.dump(sampler.pstats_data(), f)
+    return files
+
+
+def profile_call(fn: Callable, *args, **kwargs) -> Tuple[Any, cProfile.Profile]:
+    """Run fn under cProfile on the calling thread; returns its result and the profile"""
+    profile = cProfile.Profile()
+    result = profile.runcall(fn, *args, **kwargs)
+    return result, profile
+
+
+def write_call_profile(profile: cProfile.Profile, profile_dir: Union[str, Path], name: str,
+                       top: int = 40) -> Dict[str, str]:
+    """Write a cProfile run as .prof plus a text report of its slowest functions"""
+    profile_dir = Path(profile_dir)
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    files = {"pstats": f"{name}.prof", "report": f"{name}.txt"}
+    profile.dump_stats(str(profile_dir / files["pstats"]))
+    report = io.StringIO()
+    pstats.Stats(profile, stream=report).sort_stats("cumulative").print_stats(top)
+    (profile_dir / files["report"]).write_text(report.getvalue())
+    return files
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Prometheus exposition for Edge Foundry
+Minimal in-process counters, gauges and histograms rendered in the Prometheus text
+format, so a scrape of /metrics/prometheus only reads memory and never touches the
+telemetry database.
+"""
+
+import math
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# FastAPI appends "; charset=utf-8"
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TTFT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def escape_label_value(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{escape_label_value(value)}"' for key, value in labels.items()) + "}"
+
+
+class Metric:
+    """A metric family: one value (or histogram) per combination of label values"""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def clear(self):
+        """Drop every labelled value, e.g. before a collector re-reads current state"""
+        with self._lock:
+            self._values.clear()
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            return [
+                (self.name, dict(zip(self.labelnames, key)), value)
+                for key, value in self._values.items()
+            ]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.type_name}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+
+    type_name = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, value: float, **labels):
+        """Mirror a cumulative count kept elsewhere, e.g. from a collector at scrape time"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Gauge(Metric):
+    """Value that can go up and down"""
+
+    type_name = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    """Cumulative bucket counts plus sum and count of observed values"""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["buckets"][index] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        samples = []
+        with self._lock:
+            for key, state in self._values.items():
+                labels = dict(zip(self.labelnames, key))
+                cumulative = 0
+                for bound, count in zip(self.buckets, state["buckets"]):
+                    cumulative += count
+                    samples.append((f"{self.name}_bucket", {**labels, "le": format_value(bound)}, cumulative))
+                samples.append((f"{self.name}_sum", labels, state["sum"]))
+                samples.append((f"{self.name}_count", labels, state["count"]))
+        return samples
+
+
+class Registry:
+    """Metric families plus collectors that refresh gauges from live state at scrape time"""
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], None]):
+        """Run collector before every scrape; it should only read in-memory state"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format"""
+        for collector in self._collectors:
+            collector()
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def label_expositions(expositions: Sequence[Tuple[str, str]], label: str = "worker") -> str:
+    """
+    Combine (label value, exposition text) pairs into one exposition, adding the label
+    to every sample. Each family keeps a single HELP/TYPE header and lists its samples
+    from every source, so series from different processes never collide.
+    """
+    families: Dict[str, List[str]] = {}
+    for value, text in expositions:
+        samples = None
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            if line.startswith("#"):
+                parts = line.split(" ", 3)
+                if len(parts) >= 3 and parts[1] in ("HELP", "TYPE"):
+                    samples = families.setdefault(parts[2], [])
+                    if not any(header.startswith(f"# {parts[1]} ") for header in samples):
+                        samples.insert(sum(header.startswith("#") for header in samples), line)
+                continue
+            added = f'{label}="{escape_label_value(value)}"'
+            name, brace, rest = line.partition("{")
+            if brace and " " not in name:
+                sample = f"{name}{{{added},{rest}"
+            else:
+                name, _, rest = line.partition(" ")
+                sample = f"{name}{{{added}}} {rest}"
+            (samples if samples is not None else families.setdefault(name, [])).append(sample)
+    return "\n".join(line for lines in families.values() for line in lines) + "\n"
+
+
+class InferenceMetrics:
+    """The agent's request metrics, labelled by model id"""
+
+    def __init__(self, registry: Optional[Registry] = None):
+        self.registry = registry or Registry()
+        r = self.registry
+        self.requests = r.counter(
+            "edgefoundry_requests_total", "Completed inference requests", ["model", "endpoint"])
+        self.errors = r.counter(
+            "edgefoundry_request_errors_total", "Inference requests that failed", ["model", "endpoint"])
+        self.latency = r.histogram(
+            "edgefoundry_request_latency_seconds", "Generation time, excluding queue wait", ["model"])
+        self.queue_wait = r.histogram(
+            "edgefoundry_queue_wait_seconds", "Time spent queued before generation", ["model"], TTFT_BUCKETS)
+        self.ttft = r.histogram(
+            "edgefoundry_time_to_first_token_seconds", "Time to first streamed token, from arrival",
+            ["model"], TTFT_BUCKETS)
+        self.tokens_generated = r.counter(
+            "edgefoundry_tokens_generated_total", "Generated tokens", ["model"])
+        self.prompt_tokens = r.counter(
+            "edgefoundry_prompt_tokens_total", "Prompt tokens", ["model"])
+        self.cached_prompt_tokens = r.counter(
+            "edgefoundry_cached_prompt_tokens_total", "Prompt tokens reused from the KV prefix cache", ["model"])
+        self.cache_hits = r.counter(
+            "edgefoundry_response_cache_hits_total", "Requests answered from the response cache", ["model"])
+
+    def observe(self, endpoint: str, model: str, record: Dict[str, Any]):
+        """Count a finished inference from its telemetry record"""
+        self.requests.inc(model=model, endpoint=endpoint)
+        self.tokens_generated.inc(record.get("tokens_generated") or 0, model=model)
+        self.prompt_tokens.inc(record.get("prompt_length") or 0, model=model)
+        if record.get("cached_prompt_tokens"):
+            self.cached_prompt_tokens.inc(record["cached_prompt_tokens"], model=model)
+        if record.get("cache_hit"):
+            self.cache_hits.inc(model=model)
+            return
+        self.latency.observe(record["latency_ms"] / 1000, model=model)
+        if record.get("queue_wait_ms") is not None:
+            self.queue_wait.observe(record["queue_wait_ms"] / 1000, model=model)
+        if record.get("ttft_ms") is not None:
+            self.ttft.observe(record["ttft_ms"] / 1000, model=model)
+
+    def observe_error(self, endpoint: str, model: str):
+        self.errors.inc(model=model, endpoint=endpoint)
+
+    def render(self) -> str:
+        return self.registry.render()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Streaming quantile sketches for Edge Foundry telemetry
+A log-bucketed histogram (DDSketch style): every value lands in a bucket whose
+width grows with its magnitude, so any quantile is reported within a fixed
+relative error, and sketches for different models or time windows merge exactly
+by adding bucket counts.
+"""
+
+import json
+import math
+from typing import Dict, Iterable, Optional
+
+# Quantiles reported by the telemetry summary
+DEFAULT_QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+
+class QuantileSketch:
+    """Mergeable quantile sketch with relative_accuracy error on every quantile"""
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = {}
+        # Values <= 0 (e.g. no queue wait) are counted without a bucket
+        self.zero_count = 0
+        self.count = 0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def add(self, value: float, count: int = 1):
+        """Record a value count times"""
+        if value is None or count <= 0:
+            return
+        value = float(value)
+        if value <= 0:
+            self.zero_count += count
+        else:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.count += count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def update(self, values: Iterable[float]):
+        """Record every value in an iterable"""
+        for value in values:
+            self.add(value)
+
+    def merge(self, other: "QuantileSketch"):
+        """Fold another sketch with the same accuracy into this one"""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimated value at quantile q (0-1), or None for an empty sketch"""
+        if self.count == 0:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0 if self.min <= 0 else self.min
+
+        seen = self.zero_count
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                # Midpoint of the bucket (gamma^(i-1), gamma^i] in relative terms
+                value = 2 * self.gamma ** index / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def quantiles(self, qs: Iterable[float] = DEFAULT_QUANTILES) -> Dict[str, Optional[float]]:
+        """Quantiles keyed p50, p90, ... rounded for display"""
+        result = {}
+        for q in qs:
+            value = self.quantile(q)
+            result[f"p{q * 100:g}"] = round(value, 2) if value is not None else None
+        return result
+
+    def to_json(self) -> str:
+        """Compact serialization for the telemetry database"""
+        return json.dumps({
+            "relative_accuracy": self.relative_accuracy,
+            "count": self.count,
+            "zero_count": self.zero_count,
+            "min": self.min,
+            "max": self.max,
+            "bins": {str(index): count for index, count in self.bins.items()}
+        }, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, data: str) -> "QuantileSketch":
+        """Rebuild a sketch written by to_json()"""
+        state = json.loads(data)
+        sketch = cls(state["relative_accuracy"])
+        sketch.count = state["count"]
+        sketch.zero_count = state["zero_count"]
+        sketch.min = state["min"]
+        sketch.max = state["max"]
+        sketch.bins = {int(index): count for index, count in state["bins"].items()}
+        return sketch
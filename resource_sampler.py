@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Resource sampling for Edge Foundry
+A background thread samples process RSS, resident pages of memory-mapped files (the
+model weights), CPU time, thread count and system available memory at a fixed
+interval and stores them as a time series. While requests run it also polls RSS
+more often, so every request gets the peak RSS over its lifetime alongside the
+before/after delta, which concurrent requests and mmapped models turn into noise.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+import psutil
+
+from telemetry import TelemetryDB
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+class RequestPeak:
+    """Process RSS when one request started and ended, and the peak seen while it ran"""
+
+    def __init__(self, rss_mb: float):
+        self.start_rss_mb = rss_mb
+        self.end_rss_mb = rss_mb
+        self.peak_rss_mb = rss_mb
+
+    @property
+    def delta_mb(self) -> float:
+        return self.end_rss_mb - self.start_rss_mb
+
+    def observe(self, rss_mb: float):
+        if rss_mb > self.peak_rss_mb:
+            self.peak_rss_mb = rss_mb
+
+
+class ResourceSampler:
+    """
+    Samples resources every interval seconds, writing them to the database in batches
+    of batch_size. Active requests are polled for peak RSS every peak_interval seconds.
+    Reading mapped-file residency walks the process's memory maps, so it can be turned
+    off with include_mapped_files=False.
+    """
+
+    def __init__(self, db: TelemetryDB, interval: float = 5.0, peak_interval: float = 0.05,
+                 include_mapped_files: bool = True, batch_size: int = 12):
+        self.db = db
+        self.interval = interval
+        self.peak_interval = peak_interval
+        self.include_mapped_files = include_mapped_files
+        self.batch_size = max(1, batch_size)
+        self.process = psutil.Process()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._requests: List[RequestPeak] = []
+        self._pending: List[Dict[str, Any]] = []
+        self._latest: Optional[Dict[str, Any]] = None
+        self._last_cpu: Optional[tuple] = None
+
+        # Counters exposed through get_stats()
+        self._samples = 0
+        self._failed = 0
+
+    def start(self):
+        """Start the sampling thread (idempotent)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        """Stop the sampling thread and write any buffered samples"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            self._stop.set()
+            self._wake.set()
+            thread.join(timeout)
+        self.flush()
+
+    def rss_mb(self) -> float:
+        return self.process.memory_info().rss / MB
+
+    def sample(self) -> Dict[str, Any]:
+        """Take one full sample; cpu_percent covers the time since the previous sample"""
+        now = time.monotonic()
+        cpu = self.process.cpu_times()
+        cpu_percent = None
+        if self._last_cpu is not None:
+            last_at, last_cpu = self._last_cpu
+            elapsed = now - last_at
+            if elapsed > 0:
+                used = (cpu.user - last_cpu.user) + (cpu.system - last_cpu.system)
+                cpu_percent = round(100.0 * used / elapsed, 2)
+        self._last_cpu = (now, cpu)
+
+        return {
+            "timestamp": datetime.now().isoformat(),
+            # Worker processes share the database
+            "pid": self.process.pid,
+            "rss_mb": round(self.rss_mb(), 2),
+            "mapped_file_mb": self._mapped_file_mb(),
+            "cpu_user_s": round(cpu.user, 3),
+            "cpu_system_s": round(cpu.system, 3),
+            "cpu_percent": cpu_percent,
+            "num_threads": self.process.num_threads(),
+            "system_available_mb": round(psutil.virtual_memory().available / MB, 2),
+        }
+
+    def _mapped_file_mb(self) -> Optional[float]:
+        """Resident memory of file-backed mappings, such as an mmapped GGUF model"""
+        if not self.include_mapped_files:
+            return None
+        try:
+            maps = self.process.memory_maps(grouped=True)
+        except (psutil.AccessDenied, NotImplementedError, AttributeError):
+            return None
+        return round(sum(m.rss for m in maps if m.path.startswith("/")) / MB, 2)
+
+    @contextmanager
+    def track(self) -> Iterator[RequestPeak]:
+        """Track peak RSS while the block runs; read peak_rss_mb and delta_mb afterwards"""
+        peak = RequestPeak(self.rss_mb())
+        with self._lock:
+            self._requests.append(peak)
+        # Switch the sampling thread to peak polling right away
+        self._wake.set()
+        try:
+            yield peak
+        finally:
+            with self._lock:
+                self._requests.remove(peak)
+            peak.end_rss_mb = self.rss_mb()
+            peak.observe(peak.end_rss_mb)
+
+    def _run(self):
+        next_sample = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                with self._lock:
+                    requests = list(self._requests)
+                if requests:
+                    rss_mb = self.rss_mb()
+                    for peak in requests:
+                        peak.observe(rss_mb)
+                if time.monotonic() >= next_sample:
+                    next_sample = time.monotonic() + self.interval
+                    self._record(self.sample())
+            except Exception as e:
+                logger.error(f"Resource sampling failed: {e}")
+                with self._lock:
+                    self._failed += 1
+
+            with self._lock:
+                busy = bool(self._requests)
+            timeout = max(0.0, next_sample - time.monotonic())
+            if busy:
+                timeout = min(timeout, self.peak_interval)
+            self._wake.wait(timeout)
+            self._wake.clear()
+
+    def _record(self, sample: Dict[str, Any]):
+        with self._lock:
+            self._latest = sample
+            self._samples += 1
+            self._pending.append(sample)
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write buffered samples to the database"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        try:
+            self.db.record_resource_samples(pending)
+        except Exception as e:
+            logger.error(f"Could not store {len(pending)} resource samples: {e}")
+            with self._lock:
+                self._failed += 1
+
+    def get_latest(self) -> Optional[Dict[str, Any]]:
+        """The most recent sample, from memory"""
+        with self._lock:
+            return dict(self._latest) if self._latest is not None else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "interval_s": self.interval,
+                "samples": self._samples,
+                "failed": self._failed,
+                "pending": len(self._pending),
+                "active_requests": len(self._requests),
+            }
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Response cache for Edge Foundry
+Keeps completed responses for repeated deterministic requests in an LRU cache
+bounded by a byte budget, optionally persisted to disk between agent runs.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """LRU cache of inference results bounded by the size of their JSON encoding"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, persist_path: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.persist_path = persist_path
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+
+        # Counters exposed through get_stats()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @staticmethod
+    def make_key(model_id: Optional[str], formatted_prompt: str, max_tokens: int,
+                 temperature: float, seed: Optional[int]) -> str:
+        """Build a cache key from everything that determines a generation"""
+        payload = json.dumps([model_id, formatted_prompt, max_tokens, temperature, seed])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Look up a cached response, marking it most recently used"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def put(self, key: str, value: Dict[str, Any]):
+        """Store a response, evicting least recently used entries to stay under budget"""
+        size = len(key) + len(json.dumps(value))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            while self._entries and self._bytes + size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._evictions += 1
+            self._entries[key] = (value, size)
+            self._bytes += size
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and memory use"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0
+            }
+
+    def load(self):
+        """Load persisted entries, if a persist path is configured and exists"""
+        if not self.persist_path or not os.path.exists(self.persist_path):
+            return
+        try:
+            with open(self.persist_path, "r") as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load response cache from {self.persist_path}: {e}")
+            return
+
+        # Entries are stored least recently used first
+        for key, value in entries:
+            self.put(key, value)
+        logger.info(f"Loaded {len(self._entries)} cached responses from {self.persist_path}")
+
+    def save(self):
+        """Write entries to the persist path, if one is configured"""
+        if not self.persist_path:
+            return
+        with self._lock:
+            entries = [[key, value] for key, (value, _) in self._entries.items()]
+
+        directory = os.path.dirname(self.persist_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.persist_path}.tmp"
+        try:
+            with open(temp_path, "w") as f:
+                json.dump(entries, f)
+            os.replace(temp_path, self.persist_path)
+            logger.info(f"Saved {len(entries)} cached responses to {self.persist_path}")
+        except OSError as e:
+            logger.error(f"Failed to save response cache to {self.persist_path}: {e}")
@@ -41,6 +41,19 @@ setup(
         "cli", 
         "model_manager",
         "telemetry",
+        "inference_executor",
+        "batch_scheduler",
+        "response_cache",
+        "admission",
+        "dispatcher",
+        "quantiles",
+        "prometheus",
+        "metrics_stream",
+        "resource_sampler",
+        "profiler",
+        "tracing",
+        "bench",
+        "telemetry_export",
         "load_model",
         "run_model",
     ],
@@ -67,6 +80,9 @@ setup(
             "pytest-mock>=3.10.0",
             "httpx>=0.24.0",
         ],
+        "parquet": [
+            "pyarrow>=14.0.0",
+        ],
     },
     classifiers=[
         "Development Status :: 5 - Production/Stable",
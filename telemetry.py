@@ -5,23 +5,441 @@ Telemetry module for Edge Foundry - tracks inference metrics and stores them in
 
 import sqlite3
 import time
+import queue
+import logging
+import threading
 import psutil
 import os
-from datetime import datetime
-from typing import Optional, Dict, Any
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, Iterable, Iterator, List, Tuple
 from pathlib import Path
+from quantiles import QuantileSketch
+
+logger = logging.getLogger(__name__)
+
+# Columns added after the original schema. init_database() adds any that are
+# missing so existing telemetry.db files upgrade in place.
+TELEMETRY_EXTRA_COLUMNS = {
+    "queue_wait_ms": "REAL",
+    "ttft_ms": "REAL",
+    "inter_token_ms": "REAL",
+    "cache_hit": "INTEGER",
+    "cached_prompt_tokens": "INTEGER",
+    # 1 when token counts come from the model's usage, 0 for whitespace estimates
+    "tokens_exact": "INTEGER",
+    # Phases of latency_ms; prompt eval and decode come from llama.cpp's own timings
+    "tokenize_ms": "REAL",
+    "prompt_eval_ms": "REAL",
+    "decode_ms": "REAL",
+    "decode_per_token_ms": "REAL",
+    "postprocess_ms": "REAL",
+    # Highest process RSS while the request ran; memory_mb stays the before/after delta
+    "peak_rss_mb": "REAL",
+}
+
+# Columns written by record_inferences(), in insert order
+TELEMETRY_INSERT_COLUMNS = (
+    "timestamp", "prompt_length", "latency_ms", "tokens_generated", "tokens_per_second",
+    "memory_mb", "model_path", "temperature", "max_tokens",
+) + tuple(TELEMETRY_EXTRA_COLUMNS)
+
+# Every telemetry column in table order with its SQLite type, as exported
+TELEMETRY_COLUMN_TYPES = {
+    "id": "INTEGER",
+    "timestamp": "TEXT",
+    "prompt_length": "INTEGER",
+    "latency_ms": "REAL",
+    "tokens_generated": "INTEGER",
+    "tokens_per_second": "REAL",
+    "memory_mb": "REAL",
+    "model_path": "TEXT",
+    "temperature": "REAL",
+    "max_tokens": "INTEGER",
+    **TELEMETRY_EXTRA_COLUMNS,
+}
+
+# Default retention for compact(), in days; 0 or None keeps data forever
+DEFAULT_RETENTION = {
+    "raw_days": 7,
+    "minute_days": 30,
+    "hour_days": 365,
+}
+
+# Per-model rollups by minute and by hour, maintained as rows are inserted so summaries
+# and charts cost scales with the time window rather than the size of the telemetry table.
+# Resolution -> (table, length of the timestamp prefix that identifies a bucket)
+ROLLUP_TABLES = {
+    "minute": ("telemetry_rollup_minute", 16),
+    "hour": ("telemetry_rollup_hour", 13),
+}
+
+# Rollup column -> aggregate over the raw rows of one bucket. Averages are kept as
+# sums and counts so buckets merge exactly; cache hits are left out of latency averages.
+ROLLUP_AGGREGATES = {
+    "inferences": "COUNT(*)",
+    "cache_hits": "SUM(CASE WHEN cache_hit THEN 1 ELSE 0 END)",
+    "generated": "SUM(CASE WHEN cache_hit THEN 0 ELSE 1 END)",
+    "latency_sum": "TOTAL(CASE WHEN cache_hit THEN NULL ELSE latency_ms END)",
+    "tokens_per_second_sum": "TOTAL(CASE WHEN cache_hit THEN NULL ELSE tokens_per_second END)",
+    "tokens_generated": "SUM(tokens_generated)",
+    "memory_sum": "TOTAL(memory_mb)",
+    "queue_wait_sum": "TOTAL(queue_wait_ms)",
+    "queue_wait_count": "COUNT(queue_wait_ms)",
+    "ttft_sum": "TOTAL(ttft_ms)",
+    "ttft_count": "COUNT(ttft_ms)",
+    "inter_token_sum": "TOTAL(inter_token_ms)",
+    "inter_token_count": "COUNT(inter_token_ms)",
+    "cached_prompt_tokens": "COALESCE(SUM(cached_prompt_tokens), 0)",
+    "approximate_tokens": "SUM(CASE WHEN tokens_exact THEN 0 ELSE 1 END)",
+    "first_timestamp": "MIN(timestamp)",
+    "last_timestamp": "MAX(timestamp)",
+}
+
+# How two partial aggregates of the same bucket combine
+ROLLUP_MERGE = {
+    "first_timestamp": "MIN(first_timestamp, excluded.first_timestamp)",
+    "last_timestamp": "MAX(last_timestamp, excluded.last_timestamp)",
+}
+
+# Columns of the resource_samples time series written by the resource sampler
+RESOURCE_SAMPLE_COLUMNS = (
+    "timestamp", "pid", "rss_mb", "mapped_file_mb", "cpu_user_s", "cpu_system_s", "cpu_percent",
+    "num_threads", "system_available_mb",
+)
+
+# Fields of the recent_records rows served with the metrics summary
+RECENT_RECORD_COLUMNS = (
+    "timestamp", "prompt_length", "latency_ms", "tokens_generated", "tokens_per_second",
+    "memory_mb", "model_path", "temperature", "max_tokens",
+)
+
+# Summary statistics over any set of rollup rows
+ROLLUP_SUMMARY_SELECT = """
+    SUM(inferences),
+    SUM(latency_sum) / NULLIF(SUM(generated), 0),
+    SUM(tokens_per_second_sum) / NULLIF(SUM(generated), 0),
+    SUM(memory_sum) / NULLIF(SUM(inferences), 0),
+    MAX(last_timestamp),
+    MIN(first_timestamp),
+    SUM(queue_wait_sum) / NULLIF(SUM(queue_wait_count), 0),
+    SUM(ttft_sum) / NULLIF(SUM(ttft_count), 0),
+    SUM(inter_token_sum) / NULLIF(SUM(inter_token_count), 0),
+    SUM(cache_hits),
+    SUM(cached_prompt_tokens),
+    SUM(tokens_generated)
+"""
+
+def rollup_values(record: Dict[str, Any]) -> Dict[str, Any]:
+    """One record's contribution to each rollup column, mirroring ROLLUP_AGGREGATES"""
+    cache_hit = bool(record.get("cache_hit"))
+    def present(field: str) -> int:
+        return 0 if record.get(field) is None else 1
+    return {
+        "inferences": 1,
+        "cache_hits": 1 if cache_hit else 0,
+        "generated": 0 if cache_hit else 1,
+        "latency_sum": 0.0 if cache_hit else record["latency_ms"],
+        "tokens_per_second_sum": 0.0 if cache_hit else record.get("tokens_per_second") or 0.0,
+        "tokens_generated": record.get("tokens_generated") or 0,
+        "memory_sum": record.get("memory_mb") or 0.0,
+        "queue_wait_sum": record.get("queue_wait_ms") or 0.0,
+        "queue_wait_count": present("queue_wait_ms"),
+        "ttft_sum": record.get("ttft_ms") or 0.0,
+        "ttft_count": present("ttft_ms"),
+        "inter_token_sum": record.get("inter_token_ms") or 0.0,
+        "inter_token_count": present("inter_token_ms"),
+        "cached_prompt_tokens": record.get("cached_prompt_tokens") or 0,
+        "approximate_tokens": 0 if record.get("tokens_exact") else 1,
+        "first_timestamp": record.get("timestamp"),
+        "last_timestamp": record.get("timestamp"),
+    }
+
+def fold_rollup_totals(totals: Dict[str, Any], values: Dict[str, Any]):
+    """Add one rollup_values() result (or another set of totals) into totals in place"""
+    for column, value in values.items():
+        if column == "first_timestamp":
+            if value is not None and (totals.get(column) is None or value < totals[column]):
+                totals[column] = value
+        elif column == "last_timestamp":
+            if value is not None and (totals.get(column) is None or value > totals[column]):
+                totals[column] = value
+        else:
+            totals[column] = (totals.get(column) or 0) + (value or 0)
+
+def summarize_rollup_totals(totals: Dict[str, Any]) -> Dict[str, Any]:
+    """The /metrics summary block from rollup column totals"""
+    def average(column: str, count_column: str) -> float:
+        count = totals.get(count_column) or 0
+        return round((totals.get(column) or 0) / count, 2) if count else 0
+    return {
+        "total_inferences": totals.get("inferences") or 0,
+        "avg_latency_ms": average("latency_sum", "generated"),
+        "avg_tokens_per_second": average("tokens_per_second_sum", "generated"),
+        "avg_memory_mb": average("memory_sum", "inferences"),
+        "last_inference": totals.get("last_timestamp"),
+        "first_inference": totals.get("first_timestamp"),
+        "avg_queue_wait_ms": average("queue_wait_sum", "queue_wait_count"),
+        "avg_ttft_ms": average("ttft_sum", "ttft_count"),
+        "avg_inter_token_ms": average("inter_token_sum", "inter_token_count"),
+        "cache_hits": totals.get("cache_hits") or 0,
+        "cached_prompt_tokens": totals.get("cached_prompt_tokens") or 0,
+        # Inferences whose token counts (and so tokens per second) are estimates
+        "approximate_token_inferences": totals.get("approximate_tokens") or 0
+    }
+
+def rollup_table_sql(table: str) -> str:
+    """CREATE TABLE statement for a rollup table"""
+    def column_type(column: str) -> str:
+        if column.endswith("timestamp"):
+            return "TEXT"
+        return "REAL" if column.endswith("_sum") else "INTEGER"
+    
+    columns = "".join(f"{column} {column_type(column)} NOT NULL, " for column in ROLLUP_AGGREGATES)
+    return f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            bucket TEXT NOT NULL,
+            model_path TEXT NOT NULL,
+            {columns}
+            PRIMARY KEY (bucket, model_path)
+        )
+    """
+
+def rollup_upsert_sql(resolution: str, where: str) -> str:
+    """Fold the telemetry rows matching where into the rollup table for a resolution"""
+    table, prefix_length = ROLLUP_TABLES[resolution]
+    bucket_suffix = ":00:00"[:19 - prefix_length]
+    columns = ", ".join(ROLLUP_AGGREGATES)
+    aggregates = ", ".join(ROLLUP_AGGREGATES.values())
+    updates = ", ".join(
+        f"{column} = {ROLLUP_MERGE.get(column, f'{column} + excluded.{column}')}"
+        for column in ROLLUP_AGGREGATES
+    )
+    return f"""
+        INSERT INTO {table} (bucket, model_path, {columns})
+        SELECT substr(timestamp, 1, {prefix_length}) || '{bucket_suffix}', COALESCE(model_path, ''), {aggregates}
+        FROM telemetry
+        WHERE {where}
+        GROUP BY 1, 2
+        ON CONFLICT (bucket, model_path) DO UPDATE SET {updates}
+    """
+
+def bucket_start(timestamp: str, resolution: str) -> str:
+    """Start of the rollup bucket an ISO timestamp falls in, e.g. 2024-01-01T10:05:00 for a minute"""
+    prefix_length = ROLLUP_TABLES[resolution][1]
+    return timestamp[:prefix_length] + ":00:00"[:19 - prefix_length]
+
+# Fields tracked with quantile sketches -> whether cache hits are left out (as in the averages)
+SKETCH_METRICS = {
+    "latency_ms": True,
+    "tokens_per_second": True,
+    "queue_wait_ms": False,
+}
+
+def summarize_sketches(sketches: Dict[str, QuantileSketch]) -> Dict[str, Dict[str, Any]]:
+    """Count and p50/p90/p95/p99 per metric"""
+    return {
+        metric: {"count": sketch.count, **sketch.quantiles()}
+        for metric, sketch in sketches.items()
+    }
+
+def merge_sketch_sets(*sketch_sets: Dict[str, QuantileSketch]) -> Dict[str, QuantileSketch]:
+    """New per-metric sketches combining the given ones; the inputs are left unchanged"""
+    merged = {metric: QuantileSketch() for metric in SKETCH_METRICS}
+    for sketches in sketch_sets:
+        for metric, sketch in sketches.items():
+            if metric in merged:
+                merged[metric].merge(sketch)
+    return merged
+
+def collect_sketches(records: Iterable[Dict[str, Any]]) -> Dict[tuple, QuantileSketch]:
+    """Sketch records per (resolution, bucket, model_path, metric)"""
+    sketches: Dict[tuple, QuantileSketch] = {}
+    for record in records:
+        model_path = record.get("model_path") or ""
+        for resolution in ROLLUP_TABLES:
+            bucket = bucket_start(record["timestamp"], resolution)
+            for metric, skip_cache_hits in SKETCH_METRICS.items():
+                value = record.get(metric)
+                if value is None or (skip_cache_hits and record.get("cache_hit")):
+                    continue
+                key = (resolution, bucket, model_path, metric)
+                sketch = sketches.get(key)
+                if sketch is None:
+                    sketch = sketches[key] = QuantileSketch()
+                sketch.add(value)
+    return sketches
+
+def merge_sketches(cursor: sqlite3.Cursor, sketches: Dict[tuple, QuantileSketch]):
+    """Merge sketches into the persisted ones; run inside a write transaction"""
+    for key, sketch in sketches.items():
+        cursor.execute("""
+            SELECT sketch FROM telemetry_sketches
+            WHERE resolution = ? AND bucket = ? AND model_path = ? AND metric = ?
+        """, key)
+        row = cursor.fetchone()
+        if row is not None:
+            stored = QuantileSketch.from_json(row[0])
+            stored.merge(sketch)
+            sketch = stored
+        cursor.execute("""
+            INSERT OR REPLACE INTO telemetry_sketches (resolution, bucket, model_path, metric, sketch)
+            VALUES (?, ?, ?, ?, ?)
+        """, key + (sketch.to_json(),))
+
+def flag_approximate_tokens(cursor: sqlite3.Cursor):
+    """Mark rows counted before exact token accounting, and their rollups, as approximate"""
+    cursor.execute("UPDATE telemetry SET tokens_exact = 0 WHERE tokens_exact IS NULL")
+    for table, _ in ROLLUP_TABLES.values():
+        cursor.execute(f"PRAGMA table_info({table})")
+        if "approximate_tokens" not in {row[1] for row in cursor.fetchall()}:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN approximate_tokens INTEGER NOT NULL DEFAULT 0")
+        cursor.execute(f"UPDATE {table} SET approximate_tokens = inferences")
+
+def backfill_sketches(cursor: sqlite3.Cursor):
+    """Sketch every existing telemetry row"""
+    columns = ["timestamp", "model_path", "cache_hit"] + list(SKETCH_METRICS)
+    cursor.execute(f"SELECT {', '.join(columns)} FROM telemetry")
+    while True:
+        rows = cursor.fetchmany(10000)
+        if not rows:
+            break
+        merge_sketches(cursor.connection.cursor(), collect_sketches(dict(zip(columns, row)) for row in rows))
+
+# Versioned schema changes, applied in order by init_database(). PRAGMA user_version
+# records how many have been applied, so existing telemetry.db files upgrade in place.
+# A step is a SQL statement or a function taking the migration cursor.
+TELEMETRY_MIGRATIONS = [
+    # 1: indexes for time-ordered and per-model queries
+    [
+        "CREATE INDEX IF NOT EXISTS idx_telemetry_timestamp ON telemetry(timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_telemetry_model_timestamp ON telemetry(model_path, timestamp)",
+    ],
+    # 2: minute and hour rollups, backfilled from existing rows
+    [
+        rollup_table_sql(ROLLUP_TABLES["minute"][0]),
+        rollup_table_sql(ROLLUP_TABLES["hour"][0]),
+        rollup_upsert_sql("minute", "1"),
+        rollup_upsert_sql("hour", "1"),
+    ],
+    # 3: quantile sketches per rollup bucket, model and metric, backfilled from existing rows
+    [
+        """
+        CREATE TABLE IF NOT EXISTS telemetry_sketches (
+            resolution TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            model_path TEXT NOT NULL,
+            metric TEXT NOT NULL,
+            sketch TEXT NOT NULL,
+            PRIMARY KEY (resolution, bucket, model_path, metric)
+        )
+        """,
+        backfill_sketches,
+    ],
+    # 4: newest-first paging of one model's records
+    [
+        "CREATE INDEX IF NOT EXISTS idx_telemetry_model_id ON telemetry(model_path, id)",
+    ],
+    # 5: existing token counts are whitespace estimates
+    [
+        flag_approximate_tokens,
+    ],
+    # 6: process and system resource samples
+    [
+        """
+        CREATE TABLE IF NOT EXISTS resource_samples (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            rss_mb REAL NOT NULL,
+            mapped_file_mb REAL,
+            cpu_user_s REAL,
+            cpu_system_s REAL,
+            cpu_percent REAL,
+            num_threads INTEGER,
+            system_available_mb REAL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_resource_samples_timestamp ON resource_samples(timestamp)",
+    ],
+    # 7: the process each resource sample came from, as worker processes share the database
+    [
+        "ALTER TABLE resource_samples ADD COLUMN pid INTEGER",
+    ],
+]
+SCHEMA_VERSION = len(TELEMETRY_MIGRATIONS)
 
 class TelemetryDB:
     """SQLite database for storing inference telemetry data."""
     
-    def __init__(self, db_path: str = "telemetry.db"):
-        """Initialize the telemetry database."""
+    def __init__(self, db_path: str = "telemetry.db", read_only: bool = False):
+        """
+        Initialize the telemetry database.
+        Connections are opened once and reused. With read_only, queries go through a
+        query-only connection that never blocks the agent's writes (WAL journaling).
+        """
         self.db_path = db_path
+        self.read_only = read_only
+        self._write_conn: Optional[sqlite3.Connection] = None
+        self._read_conn: Optional[sqlite3.Connection] = None
+        self._write_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        # model_path -> (bucket, hourly sketches merged for every bucket before it)
+        self._settled_sketches: Dict[Optional[str], Tuple[str, Dict[str, QuantileSketch]]] = {}
+        self._settled_lock = threading.Lock()
         self.init_database()
     
+    def _connect(self, read_only: bool) -> sqlite3.Connection:
+        """Open a connection with the pragmas used for every telemetry connection"""
+        if read_only:
+            uri = f"{Path(self.db_path).resolve().as_uri()}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            conn.execute("PRAGMA query_only = ON")
+        else:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            # Takes effect for new files only; compact(vacuum=True) converts existing ones
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("PRAGMA journal_mode = WAL")
+            # Durable at checkpoints rather than at every commit
+            conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA busy_timeout = 5000")
+        conn.execute("PRAGMA cache_size = -16000")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+    
+    def _writer(self) -> sqlite3.Connection:
+        """The long-lived write connection; use while holding _write_lock"""
+        if self.read_only:
+            raise RuntimeError(f"Telemetry database {self.db_path} is open read-only")
+        if self._write_conn is None:
+            self._write_conn = self._connect(read_only=False)
+        return self._write_conn
+    
+    def _reader(self) -> sqlite3.Connection:
+        """The long-lived read connection; use while holding _read_lock"""
+        if self._read_conn is None:
+            self._read_conn = self._connect(read_only=self.read_only)
+        return self._read_conn
+    
     def init_database(self):
-        """Create the telemetry table if it doesn't exist."""
-        with sqlite3.connect(self.db_path) as conn:
+        """Create the telemetry table if it doesn't exist and apply pending migrations."""
+        if self.read_only:
+            # Only a database that is missing or behind needs a (one-off) writable connection
+            if os.path.exists(self.db_path):
+                with self._read_lock:
+                    version = self._reader().execute("PRAGMA user_version").fetchone()[0]
+                if version >= SCHEMA_VERSION:
+                    return
+            conn = self._connect(read_only=False)
+            try:
+                self._migrate(conn)
+            finally:
+                conn.close()
+            return
+        
+        with self._write_lock:
+            self._migrate(self._writer())
+    
+    def _migrate(self, conn: sqlite3.Connection):
+        with conn:
             cursor = conn.cursor()
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS telemetry (
@@ -37,7 +455,34 @@ class TelemetryDB:
                     max_tokens INTEGER
                 )
             """)
-            conn.commit()
+
+            # Upgrade older databases with any columns they are missing
+            cursor.execute("PRAGMA table_info(telemetry)")
+            existing_columns = {row[1] for row in cursor.fetchall()}
+            for column, column_type in TELEMETRY_EXTRA_COLUMNS.items():
+                if column not in existing_columns:
+                    cursor.execute(f"ALTER TABLE telemetry ADD COLUMN {column} {column_type}")
+
+            version = cursor.execute("PRAGMA user_version").fetchone()[0]
+            for number, statements in enumerate(TELEMETRY_MIGRATIONS[version:], start=version + 1):
+                for statement in statements:
+                    if callable(statement):
+                        statement(cursor)
+                    else:
+                        cursor.execute(statement)
+                cursor.execute(f"PRAGMA user_version = {number}")
+                logger.info(f"Applied telemetry schema migration {number}")
+    
+    def close(self):
+        """Close the database connections"""
+        with self._write_lock:
+            if self._write_conn is not None:
+                self._write_conn.close()
+                self._write_conn = None
+        with self._read_lock:
+            if self._read_conn is not None:
+                self._read_conn.close()
+                self._read_conn = None
     
     def record_inference(
         self,
@@ -47,61 +492,101 @@ class TelemetryDB:
         memory_mb: float,
         model_path: Optional[str] = None,
         temperature: Optional[float] = None,
-        max_tokens: Optional[int] = None
+        max_tokens: Optional[int] = None,
+        queue_wait_ms: Optional[float] = None,
+        ttft_ms: Optional[float] = None,
+        inter_token_ms: Optional[float] = None,
+        cache_hit: Optional[bool] = None,
+        cached_prompt_tokens: Optional[int] = None,
+        tokens_exact: Optional[bool] = None,
+        tokenize_ms: Optional[float] = None,
+        prompt_eval_ms: Optional[float] = None,
+        decode_ms: Optional[float] = None,
+        decode_per_token_ms: Optional[float] = None,
+        postprocess_ms: Optional[float] = None,
+        peak_rss_mb: Optional[float] = None
     ):
-        """Record a single inference in the database."""
-        tokens_per_second = tokens_generated / (latency_ms / 1000.0) if latency_ms > 0 else 0
+        """
+        Record a single inference in the database.
+        ttft_ms and inter_token_ms are only set for streamed inferences;
+        cache_hit marks responses served from the agent's response cache;
+        cached_prompt_tokens counts prompt tokens reused from the model's KV prefix cache;
+        tokens_exact marks token counts reported by the model rather than estimated;
+        tokenize_ms through postprocess_ms break latency_ms down by phase;
+        memory_mb is the change in process RSS over the request, peak_rss_mb its highest RSS.
+        """
+        self.record_inferences([{
+            "prompt_length": prompt_length,
+            "latency_ms": latency_ms,
+            "tokens_generated": tokens_generated,
+            "memory_mb": memory_mb,
+            "model_path": model_path,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "queue_wait_ms": queue_wait_ms,
+            "ttft_ms": ttft_ms,
+            "inter_token_ms": inter_token_ms,
+            "cache_hit": cache_hit,
+            "cached_prompt_tokens": cached_prompt_tokens,
+            "tokens_exact": tokens_exact,
+            "tokenize_ms": tokenize_ms,
+            "prompt_eval_ms": prompt_eval_ms,
+            "decode_ms": decode_ms,
+            "decode_per_token_ms": decode_per_token_ms,
+            "postprocess_ms": postprocess_ms,
+            "peak_rss_mb": peak_rss_mb
+        }])
+    
+    def record_inferences(self, records: List[Dict[str, Any]]):
+        """
+        Record many inferences in one transaction.
+        Each record takes the same fields as record_inference(), plus an optional timestamp.
+        """
+        if not records:
+            return
         
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO telemetry 
-                (timestamp, prompt_length, latency_ms, tokens_generated, tokens_per_second, 
-                 memory_mb, model_path, temperature, max_tokens)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                datetime.now().isoformat(),
-                prompt_length,
-                latency_ms,
-                tokens_generated,
-                tokens_per_second,
-                memory_mb,
-                model_path,
-                temperature,
-                max_tokens
-            ))
-            conn.commit()
+        now = datetime.now().isoformat()
+        records = [dict(record) for record in records]
+        rows = []
+        for values in records:
+            latency_ms = values["latency_ms"]
+            values["tokens_per_second"] = (
+                values["tokens_generated"] / (latency_ms / 1000.0) if latency_ms > 0 else 0
+            )
+            values.setdefault("timestamp", now)
+            rows.append(tuple(values.get(column) for column in TELEMETRY_INSERT_COLUMNS))
+        # Sketch the batch before taking the write lock; merging is a few rows per bucket
+        sketches = collect_sketches(records)
+        self._unsettle_sketches(sketches)
+        
+        with self._write_lock:
+            conn = self._writer()
+            with conn:
+                # sqlite3 only opens its implicit transaction at the INSERT, so take the
+                # write lock first: another worker process committing between the MAX(id)
+                # read and our inserts would otherwise be folded into the rollups twice
+                conn.execute("BEGIN IMMEDIATE")
+                last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM telemetry").fetchone()[0]
+                conn.executemany(f"""
+                    INSERT INTO telemetry ({", ".join(TELEMETRY_INSERT_COLUMNS)})
+                    VALUES ({", ".join("?" for _ in TELEMETRY_INSERT_COLUMNS)})
+                """, rows)
+                # Fold the new rows into the rollups in the same transaction
+                for resolution in ROLLUP_TABLES:
+                    conn.execute(rollup_upsert_sql(resolution, "id > ?"), (last_id,))
+                merge_sketches(conn.cursor(), sketches)
     
     def get_metrics_summary(self, limit: int = 100) -> Dict[str, Any]:
         """Get a summary of recent telemetry data."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Get recent records
-            cursor.execute("""
-                SELECT 
-                    COUNT(*) as total_inferences,
-                    AVG(latency_ms) as avg_latency_ms,
-                    AVG(tokens_per_second) as avg_tokens_per_second,
-                    AVG(memory_mb) as avg_memory_mb,
-                    MAX(timestamp) as last_inference,
-                    MIN(timestamp) as first_inference
-                FROM telemetry
-            """)
-            summary = cursor.fetchone()
+        percentiles = self.get_percentiles()
+        # Totals come from the hourly rollups rather than a scan of every row
+        totals = self.get_rollup_totals()
+        with self._read_lock:
+            cursor = self._reader().cursor()
             
             # Get recent records for detailed view
-            cursor.execute("""
-                SELECT 
-                    timestamp,
-                    prompt_length,
-                    latency_ms,
-                    tokens_generated,
-                    tokens_per_second,
-                    memory_mb,
-                    model_path,
-                    temperature,
-                    max_tokens
+            cursor.execute(f"""
+                SELECT {", ".join(RECENT_RECORD_COLUMNS)}
                 FROM telemetry 
                 ORDER BY timestamp DESC 
                 LIMIT ?
@@ -109,21 +594,306 @@ class TelemetryDB:
             recent_records = cursor.fetchall()
             
             return {
-                "summary": {
-                    "total_inferences": summary[0] or 0,
-                    "avg_latency_ms": round(summary[1] or 0, 2),
-                    "avg_tokens_per_second": round(summary[2] or 0, 2),
-                    "avg_memory_mb": round(summary[3] or 0, 2),
-                    "last_inference": summary[4],
-                    "first_inference": summary[5]
-                },
-                "recent_records": recent_records
+                "summary": summarize_rollup_totals(totals),
+                "recent_records": recent_records,
+                "percentiles": percentiles
+            }
+    
+    def record_resource_samples(self, samples: List[Dict[str, Any]]):
+        """Store resource samples (RESOURCE_SAMPLE_COLUMNS fields) in one transaction"""
+        if not samples:
+            return
+        rows = [tuple(sample.get(column) for column in RESOURCE_SAMPLE_COLUMNS) for sample in samples]
+        with self._write_lock:
+            conn = self._writer()
+            with conn:
+                conn.executemany(f"""
+                    INSERT INTO resource_samples ({", ".join(RESOURCE_SAMPLE_COLUMNS)})
+                    VALUES ({", ".join("?" for _ in RESOURCE_SAMPLE_COLUMNS)})
+                """, rows)
+    
+    def get_resource_samples(
+        self,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        limit: int = 1000
+    ) -> List[Dict[str, Any]]:
+        """The latest limit resource samples in the time range, oldest first"""
+        conditions, params = [], []
+        if since:
+            conditions.append("timestamp >= ?")
+            params.append(since)
+        if until:
+            conditions.append("timestamp < ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._read_lock:
+            cursor = self._reader().cursor()
+            cursor.execute(f"""
+                SELECT {", ".join(RESOURCE_SAMPLE_COLUMNS)} FROM resource_samples
+                {where}
+                ORDER BY id DESC
+                LIMIT ?
+            """, params + [limit])
+            rows = cursor.fetchall()
+        return [dict(zip(RESOURCE_SAMPLE_COLUMNS, row)) for row in reversed(rows)]
+    
+    def get_rollup_totals(self) -> Dict[str, Any]:
+        """Every rollup column summed over all hourly buckets"""
+        aggregates = [
+            f"{'MIN' if column == 'first_timestamp' else 'MAX' if column == 'last_timestamp' else 'SUM'}({column})"
+            for column in ROLLUP_AGGREGATES
+        ]
+        with self._read_lock:
+            cursor = self._reader().cursor()
+            cursor.execute(f"SELECT {', '.join(aggregates)} FROM {ROLLUP_TABLES['hour'][0]}")
+            row = cursor.fetchone()
+        return dict(zip(ROLLUP_AGGREGATES, row))
+    
+    def get_percentiles(
+        self,
+        since: Optional[str] = None,
+        model_path: Optional[str] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Get p50/p90/p95/p99 per metric by merging the persisted sketches.
+        All time uses the hourly sketches; a since window uses the minute sketches.
+        """
+        return summarize_sketches(self.get_sketches(since, model_path))
+    
+    def get_sketches(
+        self,
+        since: Optional[str] = None,
+        model_path: Optional[str] = None
+    ) -> Dict[str, QuantileSketch]:
+        """
+        The persisted sketches merged into one per metric. A since window merges the
+        minute sketches it covers; all time adds the newest hourly sketches to the
+        older ones, which are merged once and kept in memory.
+        """
+        if since:
+            return self._load_sketches("minute", bucket_start(since, "minute"), None, model_path)
+        
+        # Hourly buckets over an hour old no longer receive records
+        settled_until = bucket_start((datetime.now() - timedelta(hours=1)).isoformat(), "hour")
+        with self._settled_lock:
+            cached_until, settled = self._settled_sketches.get(model_path, (None, None))
+            if settled is None or cached_until < settled_until:
+                older = self._load_sketches("hour", cached_until, settled_until, model_path)
+                settled = merge_sketch_sets(settled or {}, older)
+                self._settled_sketches[model_path] = (settled_until, settled)
+            else:
+                settled_until = cached_until
+        return merge_sketch_sets(settled, self._load_sketches("hour", settled_until, None, model_path))
+    
+    def _load_sketches(self, resolution: str, since_bucket: Optional[str], until_bucket: Optional[str],
+                       model_path: Optional[str]) -> Dict[str, QuantileSketch]:
+        """Merge the persisted sketches of buckets in [since_bucket, until_bucket)"""
+        conditions, params = ["resolution = ?"], [resolution]
+        if since_bucket:
+            conditions.append("bucket >= ?")
+            params.append(since_bucket)
+        if until_bucket:
+            conditions.append("bucket < ?")
+            params.append(until_bucket)
+        if model_path is not None:
+            conditions.append("model_path = ?")
+            params.append(model_path)
+        
+        with self._read_lock:
+            cursor = self._reader().cursor()
+            cursor.execute(f"""
+                SELECT metric, sketch FROM telemetry_sketches
+                WHERE {' AND '.join(conditions)}
+            """, params)
+            rows = cursor.fetchall()
+        
+        merged = {metric: QuantileSketch() for metric in SKETCH_METRICS}
+        for metric, data in rows:
+            if metric in merged:
+                merged[metric].merge(QuantileSketch.from_json(data))
+        return merged
+    
+    def _unsettle_sketches(self, sketches: Dict[tuple, QuantileSketch]):
+        """Drop cached hourly sketches that records with old timestamps are about to change"""
+        hours = [bucket for resolution, bucket, _, _ in sketches if resolution == "hour"]
+        if not hours:
+            return
+        oldest = min(hours)
+        with self._settled_lock:
+            for model_path, (cached_until, _) in list(self._settled_sketches.items()):
+                if oldest < cached_until:
+                    del self._settled_sketches[model_path]
+    
+    @staticmethod
+    def _record_filters(
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        model_path: Optional[str] = None,
+        min_latency_ms: Optional[float] = None,
+        max_latency_ms: Optional[float] = None,
+        conditions: Optional[List[str]] = None,
+        params: Optional[List[Any]] = None
+    ) -> Tuple[str, List[Any]]:
+        """WHERE clause and parameters for filtering raw telemetry rows, added to any given conditions"""
+        conditions, params = list(conditions or []), list(params or [])
+        if since:
+            conditions.append("timestamp >= ?")
+            params.append(since)
+        if until:
+            conditions.append("timestamp < ?")
+            params.append(until)
+        if model_path is not None:
+            conditions.append("model_path = ?")
+            params.append(model_path)
+        if min_latency_ms is not None:
+            conditions.append("latency_ms >= ?")
+            params.append(min_latency_ms)
+        if max_latency_ms is not None:
+            conditions.append("latency_ms <= ?")
+            params.append(max_latency_ms)
+        return (f"WHERE {' AND '.join(conditions)}" if conditions else ""), params
+    
+    def iter_records(
+        self,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        model_path: Optional[str] = None,
+        chunk_size: int = 1000
+    ) -> Iterator[List[tuple]]:
+        """
+        Yield telemetry rows (columns as in TELEMETRY_COLUMN_TYPES) in id order,
+        chunk_size rows at a time, so memory stays bounded by one chunk. Uses its
+        own read-only connection so a long export does not hold up other queries.
+        """
+        where, params = self._record_filters(since, until, model_path)
+        conn = self._connect(read_only=True)
+        try:
+            cursor = conn.execute(f"""
+                SELECT {", ".join(TELEMETRY_COLUMN_TYPES)}
+                FROM telemetry
+                {where}
+                ORDER BY id
+            """, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield rows
+        finally:
+            conn.close()
+    
+    def get_records(
+        self,
+        limit: int = 100,
+        before_id: Optional[int] = None,
+        since_id: Optional[int] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        model_path: Optional[str] = None,
+        min_latency_ms: Optional[float] = None,
+        max_latency_ms: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Get a page of telemetry records as dicts, using keyset pagination on id.
+        By default pages run newest first, continuing from before_id. With since_id
+        only records newer than it are returned, oldest first, so a client can fetch
+        just what it has not seen. next_cursor is the before_id (or since_id) for the
+        next page, or None on the last page.
+        """
+        if before_id is not None and since_id is not None:
+            raise ValueError("Use either before_id or since_id, not both")
+        
+        conditions, params = [], []
+        if before_id is not None:
+            conditions.append("id < ?")
+            params.append(before_id)
+        if since_id is not None:
+            conditions.append("id > ?")
+            params.append(since_id)
+        where, params = self._record_filters(
+            since, until, model_path, min_latency_ms, max_latency_ms, conditions, params
+        )
+        order = "ASC" if since_id is not None else "DESC"
+        
+        columns = list(TELEMETRY_COLUMN_TYPES)
+        with self._read_lock:
+            cursor = self._reader().cursor()
+            # One extra row tells whether another page follows
+            cursor.execute(f"""
+                SELECT {", ".join(columns)}
+                FROM telemetry
+                {where}
+                ORDER BY id {order}
+                LIMIT ?
+            """, params + [limit + 1])
+            rows = cursor.fetchall()
+        
+        has_more = len(rows) > limit
+        records = [dict(zip(columns, row)) for row in rows[:limit]]
+        return {
+            "records": records,
+            "has_more": has_more,
+            "next_cursor": records[-1]["id"] if has_more else None
+        }
+    
+    def get_timeseries(
+        self,
+        resolution: str = "minute",
+        since: Optional[str] = None,
+        model_path: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Get per-bucket statistics from the minute or hour rollups, oldest first.
+        since is an ISO timestamp; model_path limits the series to one model,
+        otherwise all models are combined.
+        """
+        if resolution not in ROLLUP_TABLES:
+            raise ValueError(f"Unknown resolution {resolution!r}; use one of {', '.join(ROLLUP_TABLES)}")
+        table, prefix_length = ROLLUP_TABLES[resolution]
+        
+        conditions, params = [], []
+        if since:
+            # Include the bucket that since falls in
+            conditions.append("bucket >= ?")
+            params.append(since[:prefix_length])
+        if model_path is not None:
+            conditions.append("model_path = ?")
+            params.append(model_path)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        
+        with self._read_lock:
+            cursor = self._reader().cursor()
+            cursor.execute(f"""
+                SELECT bucket, {ROLLUP_SUMMARY_SELECT}
+                FROM {table}
+                {where}
+                GROUP BY bucket
+                ORDER BY bucket
+            """, params)
+            rows = cursor.fetchall()
+        
+        return [
+            {
+                "bucket": row[0],
+                "inferences": row[1],
+                "avg_latency_ms": round(row[2] or 0, 2),
+                "avg_tokens_per_second": round(row[3] or 0, 2),
+                "avg_memory_mb": round(row[4] or 0, 2),
+                "avg_queue_wait_ms": round(row[7] or 0, 2),
+                "avg_ttft_ms": round(row[8] or 0, 2),
+                "avg_inter_token_ms": round(row[9] or 0, 2),
+                "cache_hits": row[10],
+                "cached_prompt_tokens": row[11],
+                "tokens_generated": row[12]
             }
+            for row in rows
+        ]
     
     def get_all_records(self) -> list:
         """Get all telemetry records."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        with self._read_lock:
+            cursor = self._reader().cursor()
             cursor.execute("""
                 SELECT 
                     id,
@@ -140,6 +910,328 @@ class TelemetryDB:
                 ORDER BY timestamp DESC
             """)
             return cursor.fetchall()
+    
+    def compact(
+        self,
+        raw_days: Optional[float] = DEFAULT_RETENTION["raw_days"],
+        minute_days: Optional[float] = DEFAULT_RETENTION["minute_days"],
+        hour_days: Optional[float] = DEFAULT_RETENTION["hour_days"],
+        batch_size: int = 5000,
+        vacuum_pages: int = 1000,
+        vacuum: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Apply the retention policy and give the freed space back to the file system.
+        Raw rows and resource samples older than raw_days are deleted (the minute and hour
+        rollups keep their aggregates), then minute and hour aggregates past their own limits; a limit of
+        0 or None keeps that data forever. Deletes and the incremental vacuum run in
+        small transactions so inserts are never blocked for long.
+        Databases created without incremental auto-vacuum keep their freed pages until
+        compacted with vacuum=True, which converts them with a one-off full VACUUM that
+        holds the write lock throughout; the background compactor never does this.
+        """
+        result = {"converted_to_incremental_vacuum": self._enable_incremental_vacuum() if vacuum else False}
+        
+        def cutoff(days: Optional[float]) -> Optional[str]:
+            return (datetime.now() - timedelta(days=days)).isoformat() if days else None
+        
+        raw_cutoff = cutoff(raw_days)
+        result["raw_deleted"] = (
+            self._delete_batched("telemetry", "timestamp < ?", (raw_cutoff,), batch_size)
+            if raw_cutoff else 0
+        )
+        result["samples_deleted"] = (
+            self._delete_batched("resource_samples", "timestamp < ?", (raw_cutoff,), batch_size)
+            if raw_cutoff else 0
+        )
+        for resolution, days in (("minute", minute_days), ("hour", hour_days)):
+            resolution_cutoff = cutoff(days)
+            deleted = 0
+            if resolution_cutoff:
+                bucket = bucket_start(resolution_cutoff, resolution)
+                deleted = self._delete_batched(
+                    ROLLUP_TABLES[resolution][0], "bucket < ?", (bucket,), batch_size
+                )
+                self._delete_batched(
+                    "telemetry_sketches", "resolution = ? AND bucket < ?", (resolution, bucket), batch_size
+                )
+                if resolution == "hour":
+                    with self._settled_lock:
+                        self._settled_sketches.clear()
+            result[f"{resolution}_deleted"] = deleted
+        
+        result["pages_freed"] = self._incremental_vacuum(vacuum_pages)
+        with self._write_lock:
+            # Shrink the WAL file too; skipped if a reader holds it
+            self._writer().execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+        logger.info(f"Telemetry compaction: {result}")
+        return result
+    
+    def _enable_incremental_vacuum(self) -> bool:
+        """Switch a database created without incremental auto-vacuum; a one-off full VACUUM"""
+        with self._write_lock:
+            conn = self._writer()
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                return False
+            logger.info(f"Converting {self.db_path} to incremental auto-vacuum")
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            return True
+    
+    def _delete_batched(self, table: str, where: str, params: tuple, batch_size: int) -> int:
+        """Delete matching rows batch_size at a time, releasing the write lock in between"""
+        deleted = 0
+        while True:
+            with self._write_lock:
+                conn = self._writer()
+                with conn:
+                    cursor = conn.execute(f"""
+                        DELETE FROM {table} WHERE rowid IN (
+                            SELECT rowid FROM {table} WHERE {where} LIMIT ?
+                        )
+                    """, params + (batch_size,))
+            deleted += cursor.rowcount
+            if cursor.rowcount < batch_size:
+                return deleted
+    
+    def _incremental_vacuum(self, pages: int) -> int:
+        """Release free pages pages at a time; returns how many were released"""
+        freed = 0
+        while True:
+            with self._write_lock:
+                conn = self._writer()
+                # A no-op until the database is converted to incremental auto-vacuum
+                if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                    return freed
+                free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                if not free_pages:
+                    return freed
+                # execute() only steps the pragma once (one page); a script runs it to completion
+                conn.executescript(f"PRAGMA incremental_vacuum({pages});")
+                freed += free_pages - conn.execute("PRAGMA freelist_count").fetchone()[0]
+                if free_pages <= pages:
+                    return freed
+
+class TelemetryWriter:
+    """
+    Buffers telemetry records in memory and writes them to a TelemetryDB from a
+    background thread, one executemany batch per batch_size records or flush_interval
+    seconds, so requests never wait on SQLite. When the buffer is full, records are
+    dropped (when_full="drop") or the caller waits up to block_timeout seconds first
+    (when_full="block").
+    """
+
+    _STOP = object()
+
+    def __init__(self, db: "TelemetryDB", max_queue_size: int = 10000, batch_size: int = 256,
+                 flush_interval: float = 1.0, when_full: str = "drop", block_timeout: float = 1.0):
+        self.db = db
+        self.max_queue_size = max_queue_size
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.when_full = when_full
+        self.block_timeout = block_timeout
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        # Counters exposed through get_stats()
+        self._written = 0
+        self._dropped = 0
+        self._batches = 0
+        self._failed = 0
+        self._last_flush: Optional[str] = None
+
+    def start(self):
+        """Start the writer thread (idempotent)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="telemetry-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, record: Dict[str, Any]) -> bool:
+        """
+        Queue a record for writing; takes the same fields as TelemetryDB.record_inference().
+        Returns False if the record was dropped because the buffer is full.
+        """
+        record = dict(record)
+        record.setdefault("timestamp", datetime.now().isoformat())
+        try:
+            if self.when_full == "block":
+                self._queue.put(record, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+            return False
+
+    def submit_many(self, records: List[Dict[str, Any]]) -> int:
+        """Queue several records; returns how many were accepted"""
+        return sum(1 for record in records if self.submit(record))
+
+    def _run(self):
+        """Writer loop: collect a batch by count or time, then write it in one transaction"""
+        stopping = False
+        while not stopping:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            batch = []
+            flushed = None
+            deadline = time.time() + self.flush_interval
+            while True:
+                if item is TelemetryWriter._STOP:
+                    stopping = True
+                    break
+                if isinstance(item, threading.Event):
+                    flushed = item
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            # Drain whatever is left once asked to stop
+            if stopping:
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if isinstance(item, threading.Event):
+                        item.set()
+                    elif item is not TelemetryWriter._STOP:
+                        batch.append(item)
+
+            if batch:
+                self._write(batch)
+            if flushed is not None:
+                flushed.set()
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        try:
+            self.db.record_inferences(batch)
+        except Exception as e:
+            logger.error(f"Failed to write {len(batch)} telemetry records: {e}")
+            with self._lock:
+                self._failed += len(batch)
+            return
+        with self._lock:
+            self._written += len(batch)
+            self._batches += 1
+            self._last_flush = datetime.now().isoformat()
+
+    def flush(self, timeout: Optional[float] = 10.0) -> bool:
+        """Write everything queued so far; returns False if that took longer than timeout"""
+        if self._thread is None:
+            return self._queue.empty()
+        flushed = threading.Event()
+        self._queue.put(flushed)
+        return flushed.wait(timeout)
+
+    def stop(self, timeout: Optional[float] = 10.0):
+        """Flush buffered records and stop the writer thread"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None:
+            return
+        # The stop marker must get in even when the buffer is full
+        self._queue.put(TelemetryWriter._STOP)
+        thread.join(timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get buffer depth and write/drop counters"""
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "max_queue_size": self.max_queue_size,
+                "written": self._written,
+                "dropped": self._dropped,
+                "failed": self._failed,
+                "batches": self._batches,
+                "avg_batch_size": round(self._written / self._batches, 2) if self._batches else 0,
+                "last_flush": self._last_flush
+            }
+
+class TelemetryCompactor:
+    """Runs TelemetryDB.compact() with a retention policy on a background thread"""
+
+    def __init__(self, db: "TelemetryDB", interval: float = 3600.0, **retention):
+        self.db = db
+        self.interval = interval
+        # raw_days / minute_days / hour_days, passed to compact()
+        self.retention = {**DEFAULT_RETENTION, **retention}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._runs = 0
+        self._failed = 0
+        self._last_run: Optional[str] = None
+        self._last_result: Optional[Dict[str, Any]] = None
+
+    def start(self):
+        """Start the compaction thread (idempotent)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="telemetry-compactor", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self.run_once()
+            if self._stop.wait(self.interval):
+                return
+
+    def run_once(self) -> Optional[Dict[str, Any]]:
+        """Compact now; failures are logged and counted"""
+        try:
+            result = self.db.compact(**self.retention)
+        except Exception as e:
+            logger.error(f"Telemetry compaction failed: {e}")
+            with self._lock:
+                self._failed += 1
+            return None
+        with self._lock:
+            self._runs += 1
+            self._last_run = datetime.now().isoformat()
+            self._last_result = result
+        return result
+
+    def stop(self, timeout: Optional[float] = 10.0):
+        """Stop the compaction thread, letting a running compaction finish its batch"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None:
+            return
+        self._stop.set()
+        thread.join(timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the retention policy and the outcome of the last compaction"""
+        with self._lock:
+            return {
+                "interval_s": self.interval,
+                "retention": dict(self.retention),
+                "runs": self._runs,
+                "failed": self._failed,
+                "last_run": self._last_run,
+                "last_result": self._last_result
+            }
 
 def get_memory_usage() -> float:
     """Get current memory usage in MB."""
@@ -149,9 +1241,27 @@ def get_memory_usage() -> float:
 
 def count_tokens(text: str) -> int:
     """Simple token counter - approximates token count by splitting on whitespace."""
-    # This is a rough approximation. For more accurate counting, 
-    # you'd want to use the actual tokenizer from the model
+    # This is a rough approximation, only used when the runtime reports no usage
     return len(text.split())
 
+def token_counts(usage: Optional[Dict[str, Any]], prompt: str, completion: str) -> Dict[str, Any]:
+    """
+    Prompt and completion token counts from the llama.cpp usage of a generation.
+    Falls back to whitespace estimates, flagged with tokens_exact=False, when a runtime
+    reports no usage.
+    """
+    usage = usage or {}
+    if usage.get("prompt_tokens") is not None and usage.get("completion_tokens") is not None:
+        return {
+            "prompt_tokens": usage["prompt_tokens"],
+            "completion_tokens": usage["completion_tokens"],
+            "tokens_exact": True
+        }
+    return {
+        "prompt_tokens": count_tokens(prompt),
+        "completion_tokens": count_tokens(completion),
+        "tokens_exact": False
+    }
+
 # Global telemetry instance
 telemetry_db = TelemetryDB()
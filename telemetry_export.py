@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Telemetry export for Edge Foundry
+Streams telemetry rows out of the database chunk by chunk into CSV, JSON Lines or
+Parquet files, so exporting months of data takes constant memory.
+"""
+
+import csv
+import gzip
+import json
+import re
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+from telemetry import TelemetryDB, TELEMETRY_COLUMN_TYPES
+
+EXPORT_FORMATS = ("csv", "jsonl", "parquet")
+
+# Codecs per format; the first is the default
+EXPORT_COMPRESSION = {
+    "csv": ("none", "gzip"),
+    "jsonl": ("none", "gzip"),
+    "parquet": ("snappy", "zstd", "gzip", "none"),
+}
+
+RELATIVE_TIME = re.compile(r"^(\d+(?:\.\d+)?)([smhdw])$")
+RELATIVE_UNITS = {"s": "seconds", "m": "minutes", "h": "hours", "d": "days", "w": "weeks"}
+
+
+def parse_time(value: Optional[str]) -> Optional[str]:
+    """
+    Turn an ISO timestamp or an age such as 30m, 12h or 7d into an ISO timestamp
+    comparable with the stored ones.
+    """
+    if not value:
+        return None
+    match = RELATIVE_TIME.match(value.strip())
+    if match:
+        amount, unit = match.groups()
+        return (datetime.now() - timedelta(**{RELATIVE_UNITS[unit]: float(amount)})).isoformat()
+    try:
+        return datetime.fromisoformat(value.strip()).isoformat()
+    except ValueError:
+        raise ValueError(f"Invalid time {value!r}; use an ISO timestamp or an age like 30m, 12h, 7d")
+
+
+def default_export_path(fmt: str, compression: Optional[str] = None) -> Path:
+    """telemetry-<timestamp>.<format>, with .gz for gzipped text formats"""
+    suffix = f".{fmt}" + (".gz" if fmt != "parquet" and compression == "gzip" else "")
+    return Path(f"telemetry-{datetime.now().strftime('%Y%m%d-%H%M%S')}{suffix}")
+
+
+def export_telemetry(
+    db: TelemetryDB,
+    output_path: Union[str, Path],
+    fmt: str = "csv",
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    model_path: Optional[str] = None,
+    compression: Optional[str] = None,
+    chunk_size: int = 5000,
+    progress: Optional[Callable[[int], None]] = None
+) -> int:
+    """
+    Write the matching telemetry rows to output_path and return how many were written.
+    progress, if given, is called with the running row count after every chunk.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; use one of {', '.join(EXPORT_FORMATS)}")
+    compression = compression or EXPORT_COMPRESSION[fmt][0]
+    if compression not in EXPORT_COMPRESSION[fmt]:
+        raise ValueError(
+            f"Compression {compression!r} is not available for {fmt}; "
+            f"use one of {', '.join(EXPORT_COMPRESSION[fmt])}"
+        )
+
+    chunks = db.iter_records(since=since, until=until, model_path=model_path, chunk_size=chunk_size)
+    if fmt == "parquet":
+        return _write_parquet(chunks, output_path, compression, progress)
+
+    opener = gzip.open if compression == "gzip" else open
+    written = 0
+    columns = list(TELEMETRY_COLUMN_TYPES)
+    with opener(output_path, "wt", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f) if fmt == "csv" else None
+        if writer is not None:
+            writer.writerow(columns)
+        for rows in chunks:
+            if writer is not None:
+                writer.writerows(rows)
+            else:
+                f.writelines(json.dumps(dict(zip(columns, row))) + "\n" for row in rows)
+            written += len(rows)
+            if progress is not None:
+                progress(written)
+    return written
+
+
+def _write_parquet(chunks, output_path, compression: str, progress) -> int:
+    """One Parquet row group per chunk; needs the optional pyarrow dependency"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet export needs pyarrow. Install with: pip install pyarrow")
+
+    arrow_types = {"INTEGER": pa.int64(), "REAL": pa.float64(), "TEXT": pa.string()}
+    schema = pa.schema([(column, arrow_types[sql_type]) for column, sql_type in TELEMETRY_COLUMN_TYPES.items()])
+    written = 0
+    with pq.ParquetWriter(str(output_path), schema, compression=compression) as writer:
+        for rows in chunks:
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema
+            ))
+            written += len(rows)
+            if progress is not None:
+                progress(written)
+    return written
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test script for Edge Foundry admission control.
+"""
+
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from admission import AdmissionController, AdmissionRejected
+
+
+def test_full_queue_rejects_with_retry_after():
+    """Requests beyond max_queue_depth are refused with a retry hint"""
+    print("\n🚦 Testing queue depth limit...")
+    controller = AdmissionController(max_queue_depth=2, max_wait_ms=10000)
+    first = controller.admit("model-a")
+    controller.admit("model-a")
+    try:
+        controller.admit("model-a")
+        assert False, "third request should be rejected"
+    except AdmissionRejected as e:
+        assert e.retry_after >= 1
+
+    # Queues are per model
+    controller.admit("model-b")
+
+    first.release()
+    controller.admit("model-a")
+    stats = controller.get_stats()
+    assert stats["model-a"]["rejected"] == 1
+    assert stats["model-a"]["queue_depth"] == 2
+    assert stats["model-b"]["queue_depth"] == 1
+    print("✅ Full queue rejected the extra request")
+
+
+def test_request_shed_after_max_wait():
+    """A job that starts after max_wait_ms is shed instead of run"""
+    print("\n⏱️  Testing max wait shedding...")
+    controller = AdmissionController(max_queue_depth=4, max_wait_ms=10)
+    ticket = controller.admit("model-a")
+    time.sleep(0.05)
+    ran = []
+    try:
+        ticket.call(ran.append, True)
+        assert False, "job should have been shed"
+    except AdmissionRejected:
+        pass
+    assert not ran
+    stats = controller.get_stats()["model-a"]
+    assert stats["shed"] == 1
+    assert stats["queue_depth"] == 0
+    print("✅ Late job shed without running")
+
+
+def test_completed_jobs_update_wait_and_service_time():
+    """Running a job through a ticket records its wait and frees the slot"""
+    print("\n📈 Testing wait and service time tracking...")
+    controller = AdmissionController(max_queue_depth=1, max_wait_ms=10000)
+    ticket = controller.admit("model-a")
+    assert ticket.call(lambda: time.sleep(0.02) or "done") == "done"
+    stats = controller.get_stats()["model-a"]
+    assert stats["completed"] == 1
+    assert stats["queue_depth"] == 0 and stats["running"] == 0
+    assert stats["avg_service_ms"] >= 20
+
+    # Abandoning a finished ticket is a no-op
+    ticket.abandon()
+    assert controller.get_stats()["model-a"]["running"] == 0
+    print("✅ Slot freed and timings recorded")
+
+
+if __name__ == "__main__":
+    print("Edge Foundry Admission Control Test Suite")
+    print("=" * 40)
+    test_full_queue_rejects_with_retry_after()
+    test_request_shed_after_max_wait()
+    test_completed_jobs_update_wait_and_service_time()
+    print("\n🎉 All admission control tests passed!")
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Test script for the Edge Foundry agent endpoints.
+Drives the FastAPI app in-process with a stub model instead of a real GGUF file.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+import httpx
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import agent
+from admission import AdmissionController
+from model_manager import model_manager, ModelNotResidentError
+from fastapi import HTTPException
+from telemetry import TelemetryWriter
+
+
+class StubWrapper:
+    """Stands in for LlamaCPPWrapper: streams the given pieces, optionally failing after them"""
+
+    def __init__(self, pieces, fail_with=None, gate=None):
+        self.pieces = pieces
+        self.fail_with = fail_with
+        # When set, generation pauses after the first piece until the gate opens
+        self.gate = gate
+        self.produced = 0
+
+    def stream_inference(self, prompt, usage=None, **kwargs):
+        for index, piece in enumerate(self.pieces):
+            if index == 1 and self.gate is not None:
+                self.gate.wait(5)
+            self.produced += 1
+            yield piece
+        if self.fail_with is not None:
+            raise self.fail_with
+        if usage is not None:
+            usage.update(prompt_tokens=3, completion_tokens=len(self.pieces))
+
+    def run_inference(self, prompt, **kwargs):
+        if self.fail_with is not None and prompt == "fail":
+            raise self.fail_with
+        return {
+            "choices": [{"text": "".join(self.pieces)}],
+            "usage": {"prompt_tokens": 3, "completion_tokens": len(self.pieces)}
+        }
+
+    def get_model_info(self):
+        return {"name": "stub", "runtime": "stub"}
+
+    def unload(self):
+        pass
+
+
+def with_stub(wrapper, scenario):
+    """Run an async scenario against the app with wrapper serving as the current model"""
+    previous = model_manager.current_wrapper, model_manager.current_model
+    model_manager.current_wrapper, model_manager.current_model = wrapper, "stub"
+    try:
+        return asyncio.run(scenario())
+    finally:
+        model_manager.current_wrapper, model_manager.current_model = previous
+
+
+def client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=agent.app), base_url="http://agent")
+
+
+def parse_sse(body: str):
+    """(event, data) pairs from a Server-Sent Events body"""
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_stream_relays_tokens_then_done():
+    """Each generated piece becomes a token event, followed by a done event with usage"""
+    print("\n📡 Testing /inference/stream token relay...")
+
+    async def scenario():
+        async with client() as c:
+            response = await c.post("/inference/stream", json={"prompt": "hi", "max_tokens": 8})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        return parse_sse(response.text)
+
+    events = with_stub(StubWrapper(["Hello", ",", " world"]), scenario)
+    assert [name for name, _ in events] == ["token", "token", "token", "done"]
+    assert [data for _, data in events[:3]] == [
+        {"token": "Hello", "index": 0}, {"token": ",", "index": 1}, {"token": " world", "index": 2}
+    ]
+    done = events[-1][1]
+    assert done["response"] == "Hello, world"
+    assert done["usage"]["completion_tokens"] == 3 and done["usage"]["tokens_exact"]
+    assert done["model_info"]["model_id"] == "stub"
+    print(f"✅ {len(events) - 1} tokens relayed before done")
+
+
+def test_stream_reports_generation_errors():
+    """A generation that fails mid-stream ends with an error event instead of done"""
+    print("\n💥 Testing /inference/stream error event...")
+
+    async def scenario():
+        async with client() as c:
+            response = await c.post("/inference/stream", json={"prompt": "hi"})
+        return parse_sse(response.text)
+
+    events = with_stub(StubWrapper(["partial"], fail_with=RuntimeError("decode failed")), scenario)
+    assert [name for name, _ in events] == ["token", "error"]
+    assert events[1][1] == {"detail": "Inference failed: decode failed"}
+    assert agent.admission.get_stats()["stub"]["running"] == 0
+    print("✅ Error event sent and admission slot released")
+
+
+def test_stream_disconnect_cancels_generation():
+    """Cancelling the response task, as the server does on disconnect, stops the job"""
+    print("\n🔌 Testing /inference/stream client disconnect...")
+    gate = threading.Event()
+    wrapper = StubWrapper([f"t{i}" for i in range(100)], gate=gate)
+
+    async def scenario():
+        response = await agent.inference_stream(agent.InferenceRequest(prompt="hi"))
+        body = response.body_iterator
+        first = await body.__anext__()
+        pending = asyncio.ensure_future(body.__anext__())
+        await asyncio.sleep(0.05)
+        pending.cancel()
+        try:
+            await pending
+        except asyncio.CancelledError:
+            pass
+        gate.set()
+        # Let the worker notice the cancellation and finish
+        await agent.inference_executor.run(lambda: None)
+        return first
+
+    first = with_stub(wrapper, scenario)
+    assert first.startswith("event: token")
+    assert wrapper.produced < 100, wrapper.produced
+    assert agent.admission.get_stats()["stub"]["running"] == 0
+    print(f"✅ Generation stopped after {wrapper.produced} of 100 tokens")
+
+
+def test_metrics_with_admission_disabled():
+    """Unbounded admission queues report null limits and keep /metrics serializable"""
+    print("\n📊 Testing /metrics with admission disabled...")
+    previous = agent.admission
+    # What the agent builds for admission.enabled: false
+    agent.admission = AdmissionController(max_queue_depth=None, max_wait_ms=None)
+
+    async def scenario():
+        async with client() as c:
+            streamed = await c.post("/inference/stream", json={"prompt": "hi"})
+            metrics = await c.get("/metrics")
+            prometheus = await c.get("/metrics/prometheus")
+        return streamed, metrics, prometheus
+
+    try:
+        streamed, metrics, prometheus = with_stub(StubWrapper(["ok"]), scenario)
+    finally:
+        agent.admission = previous
+
+    assert parse_sse(streamed.text)[-1][0] == "done"
+    assert metrics.status_code == 200, metrics.text
+    limits = metrics.json()["admission"]["stub"]
+    assert limits["max_queue_depth"] is None and limits["max_wait_ms"] is None
+    assert limits["completed"] == 1
+    assert prometheus.status_code == 200
+    assert 'edgefoundry_requests_rejected_total{model="stub"} 0' in prometheus.text
+    assert "# TYPE edgefoundry_requests_rejected_total counter" in prometheus.text
+    print("✅ /metrics reports unlimited queues as null")
+
+
+def test_full_telemetry_buffer_does_not_block_the_loop():
+    """With when_full: block, waiting for buffer space delays the request, not the server"""
+    print("\n⏳ Testing blocking telemetry submission off the event loop...")
+    previous = agent.telemetry_writer
+    # Never started, so the single slot stays taken and every submit waits block_timeout
+    writer = TelemetryWriter(None, max_queue_size=1, when_full="block", block_timeout=0.5)
+    writer.submit({"latency_ms": 0.0})
+    agent.telemetry_writer = writer
+
+    async def scenario():
+        gaps = []
+
+        async def ticker():
+            last = time.perf_counter()
+            while True:
+                await asyncio.sleep(0.01)
+                now = time.perf_counter()
+                gaps.append(now - last)
+                last = now
+
+        ticking = asyncio.ensure_future(ticker())
+        started = time.perf_counter()
+        async with client() as c:
+            response = await c.post("/inference/stream", json={"prompt": "hi"})
+        elapsed = time.perf_counter() - started
+        ticking.cancel()
+        return response, elapsed, max(gaps)
+
+    try:
+        response, elapsed, longest_gap = with_stub(StubWrapper(["ok"]), scenario)
+    finally:
+        agent.telemetry_writer = previous
+
+    assert parse_sse(response.text)[-1][0] == "done"
+    assert elapsed >= 0.5, elapsed
+    assert longest_gap < 0.25, longest_gap
+    assert writer.get_stats()["dropped"] == 1
+    print(f"✅ Request waited {elapsed:.2f}s, event loop never stalled over {longest_gap * 1000:.0f}ms")
+
+
+def test_x_profile_header_values():
+    """X-Profile: 0 (or false, no, off) runs the request unprofiled, without the debug token"""
+    print("\n🔬 Testing X-Profile header parsing...")
+    assert not any(agent.profile_requested(value) for value in (None, "", "0", "false", "No", " off "))
+    assert all(agent.profile_requested(value) for value in ("1", "true", "yes", "on"))
+
+    async def scenario():
+        async with client() as c:
+            return (
+                await c.post("/inference", json={"prompt": "hi"}, headers={"X-Profile": "0"}),
+                await c.post("/inference", json={"prompt": "hi"}, headers={"X-Profile": "1"})
+            )
+
+    previous = agent.DEBUG_TOKEN
+    agent.DEBUG_TOKEN = None
+    try:
+        unprofiled, profiled = with_stub(StubWrapper(["ok"]), scenario)
+    finally:
+        agent.DEBUG_TOKEN = previous
+    assert unprofiled.status_code == 200, unprofiled.text
+    assert "X-Profile-Id" not in unprofiled.headers
+    # Profiling needs a configured debug token
+    assert profiled.status_code == 404
+    print("✅ X-Profile: 0 left profiling off")
+
+
+class RecordingDB:
+    """Stands in for TelemetryDB behind the writer, keeping each record_inferences call"""
+
+    def __init__(self):
+        self.calls = []
+
+    def record_inferences(self, records):
+        self.calls.append(list(records))
+
+
+def test_batch_returns_per_item_results_and_writes_once():
+    """Each item gets a result or its own error, and telemetry lands in one bulk write"""
+    print("\n📦 Testing /inference/batch results and bulk telemetry...")
+    previous_writer, previous_resident = agent.telemetry_writer, agent.ensure_model_resident
+    db = RecordingDB()
+    agent.telemetry_writer = TelemetryWriter(db, flush_interval=60)
+    agent.telemetry_writer.start()
+
+    async def ensure_model_resident(model_id):
+        if model_id == "broken":
+            raise HTTPException(status_code=400, detail="Failed to switch to model: broken")
+
+    # A hot-swap load failure must not turn into the evicted-model 503 for its items
+    agent.ensure_model_resident = ensure_model_resident
+    hot_swap = model_manager.hot_swap_enabled
+    model_manager.hot_swap_enabled = lambda: True
+
+    async def scenario():
+        async with client() as c:
+            return await c.post("/inference/batch", json={"items": [
+                {"prompt": "one"}, {"prompt": "fail"}, {"prompt": "two", "model_id": "broken"}, {"prompt": "three"}
+            ]})
+
+    try:
+        response = with_stub(StubWrapper(["ok"], fail_with=RuntimeError("decode failed")), scenario)
+        agent.telemetry_writer.stop()
+    finally:
+        agent.telemetry_writer, agent.ensure_model_resident = previous_writer, previous_resident
+        model_manager.hot_swap_enabled = hot_swap
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["succeeded"] == 2 and body["failed"] == 2
+    results = body["results"]
+    assert [result["index"] for result in results] == [0, 1, 2, 3]
+    assert results[0]["response"] == "ok" and results[0]["model_info"]["model_id"] == "stub"
+    assert results[1]["error"] == "Inference failed: decode failed"
+    assert results[2]["error"] == "Failed to switch to model: broken"
+    assert results[3]["response"] == "ok"
+    assert len(db.calls) == 1 and len(db.calls[0]) == 2, db.calls
+    errors = agent.inference_metrics.render()
+    assert 'edgefoundry_request_errors_total{model="broken",endpoint="batch"}' in errors
+    assert 'edgefoundry_request_errors_total{model="stub",endpoint="batch"}' in errors
+    print("✅ 2 results, 2 errors, 1 telemetry write")
+
+
+def test_batch_rejects_empty_oversized_and_overloaded():
+    """Empty batches are a 400, oversized ones a 413 and a full admission queue a 429"""
+    print("\n🚫 Testing /inference/batch rejections...")
+    previous_config, previous_admission = agent.executor_config, agent.admission
+    agent.executor_config = {**previous_config, "max_batch_size": 2}
+    agent.admission = AdmissionController(max_queue_depth=1, max_wait_ms=None)
+    # Occupies the stub model's only queue slot
+    held = agent.admission.admit("stub")
+
+    async def scenario():
+        async with client() as c:
+            return (
+                await c.post("/inference/batch", json={"items": []}),
+                await c.post("/inference/batch", json={"items": [{"prompt": "x"}] * 3}),
+                await c.post("/inference/batch", json={"items": [{"prompt": "x"}]})
+            )
+
+    try:
+        empty, oversized, overloaded = with_stub(StubWrapper(["ok"]), scenario)
+    finally:
+        held.abandon()
+        agent.executor_config, agent.admission = previous_config, previous_admission
+
+    assert empty.status_code == 400
+    assert oversized.status_code == 413 and "limit of 2" in oversized.json()["detail"]
+    assert overloaded.status_code == 429 and "Retry-After" in overloaded.headers
+    print("✅ 400, 413 and 429 returned")
+
+
+def test_evicted_model_is_a_retryable_503():
+    """A model evicted between prepare_model and generation is not reloaded on the worker"""
+    print("\n♻️  Testing eviction after prepare_model...")
+
+    class EvictedManager:
+        """Resident when checked, gone by the time the request acquires it"""
+
+        def __init__(self, manager):
+            self._manager = manager
+
+        def __getattr__(self, name):
+            return getattr(self._manager, name)
+
+        def run_inference(self, prompt, model_id=None, **kwargs):
+            raise ModelNotResidentError(model_id)
+
+        def stream_inference(self, prompt, usage=None, model_id=None, **kwargs):
+            raise ModelNotResidentError(model_id)
+            yield
+
+    async def scenario():
+        async with client() as c:
+            return (
+                await c.post("/inference", json={"prompt": "hi"}),
+                await c.post("/inference/stream", json={"prompt": "hi"})
+            )
+
+    agent.model_manager = EvictedManager(model_manager)
+    try:
+        plain, streamed = with_stub(StubWrapper(["ok"]), scenario)
+    finally:
+        agent.model_manager = model_manager
+
+    assert plain.status_code == 503 and plain.headers["Retry-After"] == "1"
+    assert "was unloaded before the request ran" in plain.json()["detail"]
+    assert parse_sse(streamed.text)[-1] == ("error", {"detail": "Model stub was unloaded before the request ran, retry"})
+    print("✅ 503 with Retry-After instead of an inline load")
+
+
+if __name__ == "__main__":
+    print("Edge Foundry Agent Test Suite")
+    print("=" * 40)
+    test_stream_relays_tokens_then_done()
+    test_stream_reports_generation_errors()
+    test_stream_disconnect_cancels_generation()
+    test_metrics_with_admission_disabled()
+    test_full_telemetry_buffer_does_not_block_the_loop()
+    test_x_profile_header_values()
+    test_batch_returns_per_item_results_and_writes_once()
+    test_batch_rejects_empty_oversized_and_overloaded()
+    test_evicted_model_is_a_retryable_503()
+    print("\n🎉 All agent tests passed!")
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Test script for the Edge Foundry continuous batching scheduler.
+Runs the scheduler against a stub llama.cpp binding instead of a real model: the
+stub "model" always predicts the letter after the last token it decoded.
+"""
+
+import ctypes
+import os
+import sys
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import batch_scheduler
+from batch_scheduler import ContinuousBatchScheduler
+
+# Tokens 0-25 are the letters a-z; "z" is followed by end of sequence
+EOS = 26
+BOS = 27
+N_VOCAB = 28
+
+
+class StubLlama:
+    """The parts of llama_cpp.Llama the scheduler uses"""
+
+    model = "stub-model"
+    model_path = "stub.gguf"
+    context_params = None
+    n_batch = 8
+
+    def n_ctx(self):
+        return 64
+
+    def n_vocab(self):
+        return N_VOCAB
+
+    def token_eos(self):
+        return EOS
+
+    def tokenize(self, text, add_bos=True, special=True):
+        return [BOS] + [ord(char) - ord("a") for char in text.decode("utf-8")]
+
+    def detokenize(self, tokens):
+        return "".join(chr(ord("a") + token) for token in tokens).encode("utf-8")
+
+
+class StubBinding:
+    """Module-level llama_cpp functions, recording decoded batches and freed sequences"""
+
+    def __init__(self, fail_decode=False, decode_delay=0.0):
+        self.fail_decode = fail_decode
+        self.decode_delay = decode_delay
+        self.batches = []
+        self.removed = []
+        self.freed = False
+        self.llama_context_params = SimpleNamespace(
+            from_buffer_copy=lambda params: SimpleNamespace(n_ctx=0, n_batch=0, n_ubatch=512, n_seq_max=1)
+        )
+        self._logits = []
+
+    def llama_model_get_vocab(self, model):
+        return "vocab"
+
+    def llama_init_from_model(self, model, params):
+        return SimpleNamespace(params=params)
+
+    def llama_n_ctx(self, ctx):
+        return ctx.params.n_ctx
+
+    def llama_batch_init(self, n_tokens, embd, n_seq_max):
+        return SimpleNamespace(
+            token=[0] * n_tokens, pos=[0] * n_tokens, n_seq_id=[0] * n_tokens,
+            seq_id=[[0] for _ in range(n_tokens)], logits=[False] * n_tokens, n_tokens=0
+        )
+
+    def llama_decode(self, ctx, batch):
+        time.sleep(self.decode_delay)
+        if self.fail_decode:
+            return -1
+        rows = [(batch.seq_id[i][0], batch.token[i], batch.pos[i], batch.logits[i]) for i in range(batch.n_tokens)]
+        self.batches.append(rows)
+        self._logits = []
+        for _, token, _, want_logits in rows:
+            logits = (ctypes.c_float * N_VOCAB)()
+            if want_logits:
+                logits[EOS if token == 25 else (token + 1) % 26] = 10.0
+            self._logits.append(logits)
+        return 0
+
+    def llama_get_logits_ith(self, ctx, row):
+        return self._logits[row]
+
+    def llama_vocab_is_eog(self, vocab, token):
+        return token == EOS
+
+    def llama_get_memory(self, ctx):
+        return ctx
+
+    def llama_memory_seq_rm(self, memory, seq_id, start, end):
+        self.removed.append(seq_id)
+
+    def llama_batch_free(self, batch):
+        pass
+
+    def llama_free(self, ctx):
+        self.freed = True
+
+
+class SplitUtf8Llama(StubLlama):
+    """Detokenizes "b" and "c" to the two halves of "é", recording every call"""
+
+    PIECES = {1: b"\xc3", 2: b"\xa9"}
+
+    def __init__(self):
+        self.detokenized = []
+
+    def detokenize(self, tokens):
+        self.detokenized.append(list(tokens))
+        return b"".join(self.PIECES.get(token) or super(SplitUtf8Llama, self).detokenize([token]) for token in tokens)
+
+
+@contextmanager
+def stub_scheduler(max_sequences=2, n_ctx=64, llama=None, **binding_options):
+    """A scheduler wired to a StubBinding, stopped and unpatched afterwards"""
+    binding = StubBinding(**binding_options)
+    original = batch_scheduler.llama_cpp
+    batch_scheduler.llama_cpp = binding
+    scheduler = ContinuousBatchScheduler(llama or StubLlama(), max_sequences=max_sequences, n_ctx=n_ctx, seed=7)
+    try:
+        yield scheduler, binding
+    finally:
+        scheduler.stop()
+        batch_scheduler.llama_cpp = original
+
+
+def wait_until_idle(scheduler, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        stats = scheduler.get_stats()
+        if stats["active_sequences"] == 0 and stats["waiting"] == 0:
+            return stats
+        time.sleep(0.01)
+    raise AssertionError(f"Scheduler still busy: {scheduler.get_stats()}")
+
+
+def test_sampling_modes():
+    """Temperature 0 is greedy; otherwise samples stay inside top-k and top-p"""
+    print("\n🎲 Testing token sampling...")
+    with stub_scheduler() as (scheduler, _):
+        logits = np.array([0.0, 1.0, 5.0, 4.5, -3.0], dtype=np.float32)
+        assert scheduler._sample(logits, 0.0) == 2
+
+        scheduler.top_k, scheduler.top_p = 2, 1.0
+        samples = {scheduler._sample(logits, 1.0) for _ in range(200)}
+        assert samples == {2, 3}, samples
+
+        scheduler.top_k, scheduler.top_p = 5, 0.0
+        assert {scheduler._sample(logits, 1.0) for _ in range(50)} == {2}
+    print("✅ Greedy, top-k and top-p sampling")
+
+
+def test_completions_share_decode_steps():
+    """Sequences decode in shared batches, finish on EOS or max_tokens and reuse freed ids"""
+    print("\n🧮 Testing slot admission, retirement and seq id reuse...")
+    with stub_scheduler(max_sequences=2) as (scheduler, binding):
+        futures = [
+            scheduler.submit("abc", max_tokens=3, temperature=0),
+            scheduler.submit("wx", max_tokens=10, temperature=0),
+            scheduler.submit("hi", max_tokens=2, temperature=0),
+        ]
+        results = [future.result(timeout=5) for future in futures]
+        stats = wait_until_idle(scheduler)
+
+    assert [result["choices"][0]["text"] for result in results] == ["def", "yz", "jk"]
+    assert [result["choices"][0]["finish_reason"] for result in results] == ["length", "stop", "length"]
+    assert results[0]["usage"]["prompt_tokens"] == 4 and results[0]["usage"]["completion_tokens"] == 3
+
+    # Only two slots: the third request waits for one and takes over its id
+    used = {seq_id for batch in binding.batches for seq_id, _, _, _ in batch}
+    assert used == {0, 1}
+    assert any(len({row[0] for row in batch}) == 2 for batch in binding.batches)
+    assert sorted(binding.removed) == [0, 0, 1]
+    assert stats["completed"] == 3 and stats["failed"] == 0
+    assert sorted(scheduler._free_seq_ids) == [0, 1]
+    assert binding.freed
+    print(f"✅ 3 completions over {stats['decode_steps']} shared decode steps")
+
+
+def test_stop_strings_are_held_back():
+    """Streamed text never includes the start of a stop string that later matches"""
+    print("\n✂️  Testing stop-string holdback...")
+    with stub_scheduler() as (scheduler, _):
+        usage = {}
+        pieces = list(scheduler.stream("abc", max_tokens=10, temperature=0, stop=["fg"], usage=usage))
+        result = scheduler.submit("abc", max_tokens=10, temperature=0, stop=["fg"]).result(timeout=5)
+
+    # "f" was generated but held back until "g" showed it starts the stop string
+    assert pieces == ["d", "e"], pieces
+    assert result["choices"][0]["text"] == "de"
+    assert usage["completion_tokens"] == 4
+    print(f"✅ Streamed {pieces} and cut the stop string")
+
+
+def test_tokens_are_detokenized_once():
+    """Each token is detokenized alone, with UTF-8 split across tokens reassembled"""
+    print("\n🔤 Testing incremental detokenization...")
+    llama = SplitUtf8Llama()
+    with stub_scheduler(llama=llama) as (scheduler, _):
+        pieces = list(scheduler.stream("a", max_tokens=5, temperature=0, stop=["", "ef"]))
+        result = scheduler.submit("a", max_tokens=4, temperature=0).result(timeout=5)
+
+    assert result["choices"][0]["text"] == "éde"
+    # The stop string spans two tokens; the empty one is ignored
+    assert "".join(pieces) == "éd", pieces
+    assert all(len(tokens) == 1 for tokens in llama.detokenized), llama.detokenized
+    print(f"✅ {len(llama.detokenized)} single-token detokenize calls")
+
+
+def test_decode_errors_reach_futures_and_streams():
+    """A failed decode step fails every active sequence, streamed or not"""
+    print("\n💥 Testing error propagation...")
+    with stub_scheduler(fail_decode=True) as (scheduler, _):
+        future = scheduler.submit("abc", temperature=0)
+        stream_error = None
+        try:
+            list(scheduler.stream("hi", temperature=0))
+        except RuntimeError as e:
+            stream_error = e
+        try:
+            future.result(timeout=5)
+            future_error = None
+        except RuntimeError as e:
+            future_error = e
+        stats = wait_until_idle(scheduler)
+
+    assert "llama_decode returned -1" in str(stream_error)
+    assert "llama_decode returned -1" in str(future_error)
+    assert stats["failed"] == 2 and stats["completed"] == 0
+    print("✅ Decode failure raised to both callers")
+
+
+def test_closing_a_stream_cancels_its_sequence():
+    """A consumer that stops reading frees the sequence instead of decoding to max_tokens"""
+    print("\n🔌 Testing stream cancellation...")
+    with stub_scheduler(max_sequences=1, n_ctx=4096, decode_delay=0.005) as (scheduler, binding):
+        stream = scheduler.stream("a", max_tokens=2000, temperature=0)
+        assert [next(stream), next(stream)] == ["b", "c"]
+        stream.close()
+        stats = wait_until_idle(scheduler)
+        # The freed slot serves the next request
+        follow_up = scheduler.submit("x", max_tokens=5, temperature=0).result(timeout=5)
+
+    assert stats["cancelled"] == 1 and stats["failed"] == 0
+    assert stats["tokens_generated"] < 100, stats
+    assert binding.removed[0] == 0
+    assert follow_up["choices"][0]["text"] == "yz"
+    print(f"✅ Sequence retired after {stats['tokens_generated']} of 2000 tokens")
+
+
+if __name__ == "__main__":
+    print("Edge Foundry Batch Scheduler Test Suite")
+    print("=" * 40)
+    test_sampling_modes()
+    test_completions_share_decode_steps()
+    test_stop_strings_are_held_back()
+    test_tokens_are_detokenized_once()
+    test_decode_errors_reach_futures_and_streams()
+    test_closing_a_stream_cancels_its_sequence()
+    print("\n🎉 All batch scheduler tests passed!")
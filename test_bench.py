@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Test script for the Edge Foundry load-testing bench.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench import (
+    compare_reports, config_differences, load_prompts, load_report, make_stream_sender, run_bench, write_report
+)
+
+
+class StreamingAgent(BaseHTTPRequestHandler):
+    """Stands in for /inference/stream: two token events and a done event, or 429 for busy prompts"""
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if "busy" in payload["prompt"]:
+            self.send_response(429)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for index, token in enumerate(("Hello", " there")):
+            self.wfile.write(f"event: token\ndata: {json.dumps({'token': token, 'index': index})}\n\n".encode())
+        usage = {"prompt_tokens": len(payload["prompt"]), "completion_tokens": payload["max_tokens"]}
+        self.wfile.write(f"event: done\ndata: {json.dumps({'response': 'Hello there', 'usage': usage})}\n\n".encode())
+
+    def log_message(self, *args):
+        pass
+
+
+def test_bench_runs_closed_and_open_loop():
+    """Both load modes replay the prompt set and summarize successes, errors and percentiles"""
+    print("\n🏋️  Testing bench runs...")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StreamingAgent)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    send = make_stream_sender(f"http://127.0.0.1:{server.server_port}", max_tokens=4, timeout=10)
+    items = [{"prompt": "hello"}, {"prompt": "world"}, {"prompt": "busy"}]
+
+    closed = run_bench(send, items, mode="closed", concurrency=3, total=9, warmup=1)
+    summary = closed["summary"]
+    assert [record["index"] for record in closed["records"]] == list(range(9))
+    assert summary["requests"] == 9 and summary["succeeded"] == 6
+    assert summary["errors"] == {"HTTP 429": 3} and summary["error_rate"] == round(3 / 9, 4)
+    assert summary["completion_tokens"] == 6 * 4 and summary["prompt_tokens"] == 6 * 5
+    assert summary["tokens_per_second"] > 0 and summary["requests_per_second"] > 0
+    latency, ttft = summary["latency_ms"], summary["ttft_ms"]
+    assert latency["p50"] <= latency["p90"] <= latency["p99"] <= latency["max"]
+    assert all(record["ttft_ms"] <= record["latency_ms"] for record in closed["records"] if record["ok"])
+    assert ttft["p50"] <= latency["max"]
+
+    open_loop = run_bench(send, items, mode="open", rate=200, arrival="uniform", total=10)
+    assert open_loop["summary"]["requests"] == 10
+    assert [record["sent_at_ms"] for record in open_loop["records"]][:3] == [0.0, 5.0, 10.0]
+    assert open_loop["config"]["concurrency"] is None and open_loop["config"]["rate"] == 200
+    server.shutdown()
+    print(f"✅ {summary['succeeded']} closed-loop and {open_loop['summary']['succeeded']} open-loop successes")
+
+
+def test_seeded_runs_replay_the_same_load():
+    """The seed fixes the prompt order and poisson arrival schedule"""
+    print("\n🎲 Testing reproducible runs...")
+    items = [{"prompt": f"prompt {i}"} for i in range(8)]
+
+    def run(seed):
+        sent = []
+
+        def send(item, due_at):
+            sent.append(item["prompt"])
+            return {"ok": True, "error": None, "ttft_ms": 1.0, "latency_ms": 2.0,
+                    "prompt_tokens": 1, "completion_tokens": 1}
+
+        report = run_bench(send, items, mode="open", rate=500, total=8, seed=seed)
+        return sent, [record["sent_at_ms"] for record in report["records"]], report
+
+    first_order, first_schedule, first = run(7)
+    second_order, second_schedule, second = run(7)
+    other_order, _, _ = run(8)
+    assert first_order == second_order != other_order
+    assert sorted(first_order) == sorted(item["prompt"] for item in items)
+    assert first_schedule == second_schedule
+    assert first["config"]["prompt_set_sha256"] == second["config"]["prompt_set_sha256"]
+    print("✅ Same seed, same load")
+
+
+def test_prompts_reports_and_compare():
+    """Prompt sets load from demo models or JSONL, and compare flags regressions"""
+    print("\n📊 Testing prompt sets and report comparison...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        demo_path = os.path.join(tmp_dir, "demo_models.yaml")
+        with open(demo_path, "w") as f:
+            f.write("demo_models:\n"
+                    "  a:\n    sample_prompts: [one, two]\n"
+                    "  b:\n    sample_prompts: [three]\n")
+        assert [item["prompt"] for item in load_prompts(demo_models_path=demo_path)] == ["one", "two", "three"]
+        assert load_prompts(model_id="b", demo_models_path=demo_path) == [{"prompt": "three", "model_id": "b"}]
+
+        jsonl_path = os.path.join(tmp_dir, "prompts.jsonl")
+        with open(jsonl_path, "w") as f:
+            f.write('"plain prompt"\n\n{"prompt": "long one", "max_tokens": 256}\n')
+        assert load_prompts(jsonl_path) == [{"prompt": "plain prompt"}, {"prompt": "long one", "max_tokens": 256}]
+
+        baseline = {
+            "version": 1,
+            "config": {"mode": "closed", "concurrency": 4, "prompt_set_sha256": "abc"},
+            "summary": {"requests_per_second": 10.0, "tokens_per_second": 500.0, "error_rate": 0.0,
+                        "latency_ms": {"p50": 100.0, "p95": 200.0, "p99": 300.0},
+                        "ttft_ms": {"p50": 20.0, "p95": 40.0}},
+        }
+        report_path = os.path.join(tmp_dir, "baseline.json")
+        write_report(baseline, report_path)
+        assert load_report(report_path) == baseline
+
+    candidate = json.loads(json.dumps(baseline))
+    candidate["config"]["concurrency"] = 8
+    candidate["summary"].update(requests_per_second=10.4, error_rate=0.1)
+    candidate["summary"]["latency_ms"]["p95"] = 260.0
+    candidate["summary"]["ttft_ms"]["p50"] = 19.0
+
+    rows = {row["metric"]: row for row in compare_reports(baseline, candidate, threshold_pct=5.0)}
+    assert rows["latency_ms.p95"]["change_pct"] == 30.0 and rows["latency_ms.p95"]["regression"]
+    assert not rows["requests_per_second"]["regression"] and not rows["ttft_ms.p50"]["regression"]
+    assert rows["error_rate"]["change_pct"] is None and rows["error_rate"]["regression"]
+    assert [metric for metric, row in rows.items() if row["regression"]] == ["latency_ms.p95", "error_rate"]
+    assert config_differences(baseline, candidate) == {"concurrency": (4, 8)}
+    print("✅ Regressions flagged")
+
+
+if __name__ == "__main__":
+    print("Edge Foundry Bench Test Suite")
+    print("=" * 40)
+    test_bench_runs_closed_and_open_loop()
+    test_seeded_runs_replay_the_same_load()
+    test_prompts_reports_and_compare()
+    print("\n🎉 All bench tests passed!")
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Test script for the Edge Foundry request dispatcher.
+Workers are simulated with an httpx mock transport, so no agents need to run.
+"""
+
+import asyncio
+import json
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+from fastapi import Request
+import dispatcher
+from dispatcher import WorkerPool
+
+
+def test_pick_least_busy_worker():
+    """The worker with the fewest requests in flight is picked"""
+    print("\n⚖️  Testing least-busy routing...")
+    pool = WorkerPool(["http://w0", "http://w1", "http://w2"])
+    pool.in_flight["http://w0"] = 2
+    pool.in_flight["http://w1"] = 1
+    pool.in_flight["http://w2"] = 3
+    assert pool.pick() == "http://w1"
+    assert pool.pick(exclude={"http://w1"}) == "http://w0"
+    assert pool.pick(exclude=pool.urls) is None
+
+    # Idle workers take turns
+    idle = WorkerPool(["http://w0", "http://w1"])
+    assert {idle.pick(), idle.pick()} == {"http://w0", "http://w1"}
+    print("✅ Least busy worker picked")
+
+
+def test_forward_skips_unreachable_worker():
+    """Requests go to a reachable worker when another refuses connections"""
+    print("\n🔁 Testing failover between workers...")
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "down":
+            raise httpx.ConnectError("connection refused", request=request)
+        body = json.dumps({"worker": request.url.host, "path": request.url.path}).encode()
+        # A raw stream, as a real worker connection would deliver it
+        return httpx.Response(200, headers={"Content-Type": "application/json"}, stream=httpx.ByteStream(body))
+
+    original_pool, original_client = dispatcher.pool, dispatcher.client
+    dispatcher.pool = WorkerPool(["http://down", "http://up"])
+    dispatcher.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    try:
+        async def call():
+            transport = httpx.ASGITransport(app=dispatcher.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://dispatcher") as client:
+                return [await client.get("/metrics/records") for _ in range(3)]
+
+        responses = asyncio.run(call())
+        assert all(response.json() == {"worker": "up", "path": "/metrics/records"} for response in responses)
+        assert dispatcher.pool.in_flight == {"http://down": 0, "http://up": 0}
+        assert dispatcher.pool.completed["http://up"] == 3
+        assert dispatcher.pool.failures["http://down"] >= 1
+    finally:
+        dispatcher.pool, dispatcher.client = original_pool, original_client
+    print("✅ Unreachable worker skipped")
+
+
+def test_per_process_endpoints_reach_every_worker():
+    """Per-process endpoints are combined across workers or pinned to the first one"""
+    print("\n🧩 Testing per-process endpoints...")
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        worker = request.url.host
+        path = request.url.path
+        if path == "/metrics":
+            body = {"summary": {"total_inferences": 5}, "admission": {"m": {"queue_depth": len(worker)}}}
+        elif path == "/debug/traces":
+            start = 2 if worker == "w1" else 1
+            body = {"traces": [{"trace_id": f"t-{worker}", "start_time_unix_nano": start}], "tracer": {}}
+        elif path == "/debug/traces/t-w1" and worker == "w1":
+            body = {"trace_id": "t-w1", "spans": []}
+        elif path.startswith("/debug/traces/"):
+            return httpx.Response(404, json={"detail": "Trace not found"})
+        elif path == "/metrics/prometheus":
+            text = f"# HELP requests_total Requests\n# TYPE requests_total counter\nrequests_total {len(worker)}\n"
+            return httpx.Response(200, text=text)
+        else:
+            body = {"worker": worker}
+        return httpx.Response(200, headers={"Content-Type": "application/json"},
+                              stream=httpx.ByteStream(json.dumps(body).encode()))
+
+    original_pool, original_client = dispatcher.pool, dispatcher.client
+    dispatcher.pool = WorkerPool(["http://w0", "http://w1"])
+    dispatcher.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    try:
+        async def call():
+            transport = httpx.ASGITransport(app=dispatcher.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://dispatcher") as client:
+                return (
+                    await client.get("/metrics"),
+                    await client.get("/debug/traces", params={"limit": 1}),
+                    await client.get("/debug/traces/t-w1"),
+                    await client.get("/debug/traces/missing"),
+                    await client.get("/metrics/prometheus"),
+                    [await client.get("/metrics/stream") for _ in range(3)]
+                )
+
+        metrics, traces, trace, missing, prometheus, streams = asyncio.run(call())
+        assert metrics.json()["summary"] == {"total_inferences": 5}
+        assert "admission" not in metrics.json()
+        assert [worker["url"] for worker in metrics.json()["workers"]] == ["http://w0", "http://w1"]
+        assert traces.json()["traces"] == [{"trace_id": "t-w1", "start_time_unix_nano": 2}]
+        assert trace.json()["trace_id"] == "t-w1"
+        assert missing.status_code == 404
+        assert prometheus.text.count("# TYPE requests_total counter") == 1
+        assert 'requests_total{worker="http://w0"} 2' in prometheus.text
+        assert 'requests_total{worker="http://w1"} 2' in prometheus.text
+        assert all(stream.json() == {"worker": "w0"} for stream in streams)
+    finally:
+        dispatcher.pool, dispatcher.client = original_pool, original_client
+    print("✅ Metrics and traces combined, live stream pinned")
+
+
+def test_dashboard_streams_do_not_count_as_in_flight():
+    """An open /metrics/stream relay leaves in_flight alone; an inference stream counts"""
+    print("\n📺 Testing in-flight accounting for streams...")
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, headers={"Content-Type": "text/event-stream"},
+                              stream=httpx.ByteStream(b"event: snapshot\ndata: {}\n\n"))
+
+    def request_for(method: str, path: str) -> Request:
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+        scope = {"type": "http", "method": method, "path": f"/{path}", "headers": [], "query_string": b""}
+        return Request(scope, receive)
+
+    original_pool, original_client = dispatcher.pool, dispatcher.client
+    dispatcher.pool = WorkerPool(["http://w0", "http://w1"])
+    dispatcher.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    try:
+        async def call():
+            counts = []
+            for method, path in (("GET", "metrics/stream"), ("POST", "inference/stream")):
+                response = await dispatcher.forward(path, request_for(method, path))
+                counts.append(sum(dispatcher.pool.in_flight.values()))
+                async for _ in response.body_iterator:
+                    pass
+            return counts
+
+        open_counts = asyncio.run(call())
+        assert open_counts == [0, 1], open_counts
+        assert dispatcher.pool.in_flight == {"http://w0": 0, "http://w1": 0}
+    finally:
+        dispatcher.pool, dispatcher.client = original_pool, original_client
+    print("✅ Dashboard streams left out of least-busy routing")
+
+
+def test_partial_switch_reports_every_worker():
+    """A switch that fails on some workers lists each outcome instead of one worker's error"""
+    print("\n🔀 Testing partial model switches...")
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        model_id = json.loads(request.content)["model_id"]
+        if request.url.host == "w1" and model_id == "big":
+            return httpx.Response(400, json={"detail": "Failed to switch to model: big"})
+        if model_id == "missing":
+            return httpx.Response(400, json={"detail": "Unknown model: missing"})
+        return httpx.Response(200, json={"message": f"Successfully switched to model: {model_id}"})
+
+    original_pool, original_client = dispatcher.pool, dispatcher.client
+    dispatcher.pool = WorkerPool(["http://w0", "http://w1"])
+    dispatcher.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    try:
+        async def call():
+            transport = httpx.ASGITransport(app=dispatcher.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://dispatcher") as client:
+                return [
+                    await client.post("/demo-models/switch", json={"model_id": model_id})
+                    for model_id in ("small", "big", "missing")
+                ]
+
+        switched, partial, refused = asyncio.run(call())
+    finally:
+        dispatcher.pool, dispatcher.client = original_pool, original_client
+
+    assert switched.status_code == 200
+    assert partial.status_code == 207
+    outcomes = partial.json()["workers"]
+    assert [(outcome["url"], outcome["status_code"]) for outcome in outcomes] == [("http://w0", 200), ("http://w1", 400)]
+    assert outcomes[1]["response"]["detail"] == "Failed to switch to model: big"
+    # Nobody switched, so the worker's own error is passed on
+    assert refused.status_code == 400 and refused.json()["detail"] == "Unknown model: missing"
+    print("✅ Partial switch answered with a 207 per-worker report")
+
+
+def test_switch_job_history_is_bounded():
+    """Finished hot-swap jobs are answered from memory and the history is capped"""
+    print("\n🗂️  Testing dispatcher switch job history...")
+    polls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.method == "POST":
+            return httpx.Response(202, json={"job": {"job_id": f"job-{request.url.host}", "status": "loading"}})
+        polls.append(request.url.host)
+        status = "completed" if request.url.host == "w0" or len(polls) > 2 else "loading"
+        return httpx.Response(200, json={"job": {"job_id": request.url.path.rsplit("/", 1)[1], "status": status}})
+
+    original_pool, original_client = dispatcher.pool, dispatcher.client
+    original_jobs = dict(dispatcher.switch_jobs)
+    dispatcher.switch_jobs.clear()
+    dispatcher.pool = WorkerPool(["http://w0", "http://w1"])
+    dispatcher.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    try:
+        async def call():
+            transport = httpx.ASGITransport(app=dispatcher.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://dispatcher") as client:
+                started = await client.post("/demo-models/switch", json={"model_id": "a"})
+                job_id = started.json()["job"]["job_id"]
+                return job_id, [(await client.get(f"/demo-models/switch/{job_id}")).json() for _ in range(3)]
+
+        job_id, statuses = asyncio.run(call())
+        assert [status["job"]["status"] for status in statuses] == ["loading", "completed", "completed"]
+        assert all(status["job"]["job_id"] == job_id for status in statuses)
+        # The last poll was answered without asking the workers
+        assert len(polls) == 4
+        assert dispatcher.switch_jobs[job_id]["workers"] == []
+
+        for index in range(dispatcher.MAX_SWITCH_JOBS):
+            dispatcher.remember_switch_job(f"extra-{index}", [("http://w0", f"worker-{index}")])
+        assert len(dispatcher.switch_jobs) == dispatcher.MAX_SWITCH_JOBS
+        # The finished job went first, then the oldest unfinished ones
+        assert job_id not in dispatcher.switch_jobs and "extra-0" in dispatcher.switch_jobs
+        dispatcher.remember_switch_job("one-more", [("http://w0", "worker-x")])
+        assert "extra-0" not in dispatcher.switch_jobs and len(dispatcher.switch_jobs) == dispatcher.MAX_SWITCH_JOBS
+    finally:
+        dispatcher.pool, dispatcher.client = original_pool, original_client
+        dispatcher.switch_jobs.clear()
+        dispatcher.switch_jobs.update(original_jobs)
+    print("✅ Finished jobs cached and history capped")
+
+
+if __name__ == "__main__":
+    print("Edge Foundry Dispatcher Test Suite")
+    print("=" * 40)
+    test_pick_least_busy_worker()
+    test_forward_skips_unreachable_worker()
+    test_per_process_endpoints_reach_every_worker()
+    test_dashboard_streams_do_not_count_as_in_flight()
+    test_partial_switch_reports_every_worker()
+    test_switch_job_history_is_bounded()
+    print("\n🎉 All dispatcher tests passed!")
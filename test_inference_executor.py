@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test script for the Edge Foundry inference executor.
+Exercises queueing, timing and rejection without loading a real model.
+"""
+
+import asyncio
+import time
+from inference_executor import InferenceExecutor, QueueFullError
+
+
+def slow_job(duration: float, value: str) -> str:
+    """Stand-in for a blocking llama.cpp generation."""
+    time.sleep(duration)
+    return value
+
+
+def test_queue_wait_is_separate_from_execution():
+    """A job queued behind another reports its wait separately from its run time."""
+    print("🧪 Testing queue wait vs execution timing...")
+    executor = InferenceExecutor(max_workers=1, max_queue_size=4)
+
+    first = executor.submit(slow_job, 0.2, "first")
+    second = executor.submit(slow_job, 0.05, "second")
+
+    result, timings = second.result(timeout=5)
+    assert result == "second"
+    assert timings["queue_wait_ms"] >= 150, timings
+    assert timings["execution_ms"] < 150, timings
+    assert first.result(timeout=5)[0] == "first"
+
+    stats = executor.get_stats()
+    assert stats["completed"] == 2
+    print(f"✅ Queue wait {timings['queue_wait_ms']:.1f}ms, execution {timings['execution_ms']:.1f}ms")
+    executor.shutdown()
+
+
+def test_full_queue_is_rejected():
+    """Submitting past max_queue_size fails fast instead of waiting."""
+    print("🧪 Testing bounded queue rejection...")
+    executor = InferenceExecutor(max_workers=1, max_queue_size=1)
+
+    running = executor.submit(slow_job, 0.2, "running")
+    time.sleep(0.05)  # Let the worker pick up the first job
+    queued = executor.submit(slow_job, 0.0, "queued")
+
+    rejected = False
+    try:
+        executor.submit(slow_job, 0.0, "rejected")
+    except QueueFullError:
+        rejected = True
+
+    assert rejected
+    assert executor.get_stats()["rejected"] == 1
+    assert running.result(timeout=5)[0] == "running"
+    assert queued.result(timeout=5)[0] == "queued"
+    print("✅ Full queue rejected the extra job")
+    executor.shutdown()
+
+
+def test_event_loop_stays_responsive():
+    """Awaiting a job leaves the event loop free for other coroutines."""
+    print("🧪 Testing event loop responsiveness...")
+    executor = InferenceExecutor(max_workers=1, max_queue_size=4)
+
+    async def main():
+        job = asyncio.ensure_future(executor.run(slow_job, 0.3, "done"))
+        started = time.time()
+        await asyncio.sleep(0.01)
+        loop_delay = time.time() - started
+        result, _ = await job
+        return result, loop_delay
+
+    result, loop_delay = asyncio.run(main())
+    assert result == "done"
+    assert loop_delay < 0.1, loop_delay
+    print(f"✅ Event loop answered in {loop_delay * 1000:.1f}ms during generation")
+    executor.shutdown()
+
+
+if __name__ == "__main__":
+    print("Edge Foundry Inference Executor Test Suite")
+    print("=" * 40)
+    test_queue_wait_is_separate_from_execution()
+    test_full_queue_is_rejected()
+    test_event_loop_stays_responsive()
+    print("\n🎉 All tests completed!")
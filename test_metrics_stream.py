@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Test script for the Edge Foundry live metrics stream.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from metrics_stream import MetricsBroadcaster
+from telemetry import TelemetryDB
+
+
+def make_record(i: int, **extra) -> dict:
+    return {
+        "prompt_length": i,
+        "latency_ms": 100.0 + i,
+        "tokens_generated": 5,
+        "memory_mb": 1.0,
+        "model_path": "stream-model",
+        **extra
+    }
+
+
+def test_live_summary_matches_database():
+    """Seeded totals plus published records agree with the database summary"""
+    print("\n📡 Testing live metrics summary...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = TelemetryDB(os.path.join(tmp_dir, "stream_telemetry.db"))
+        db.record_inferences([make_record(i) for i in range(5)])
+
+        broadcaster = MetricsBroadcaster(db, recent_limit=4)
+        broadcaster.seed()
+        later = [make_record(i, queue_wait_ms=2.0) for i in range(5, 9)] + [make_record(9, cache_hit=True)]
+        for record in later:
+            broadcaster.publish(record)
+        db.record_inferences(later)
+
+        live = broadcaster.snapshot()
+        stored = db.get_metrics_summary(4)
+        for key in ("total_inferences", "avg_latency_ms", "avg_tokens_per_second", "avg_memory_mb",
+                    "avg_queue_wait_ms", "cache_hits"):
+            assert live["summary"][key] == stored["summary"][key], key
+        assert live["percentiles"]["latency_ms"]["count"] == 9
+        assert live["percentiles"]["latency_ms"]["p50"] == stored["percentiles"]["latency_ms"]["p50"]
+        assert [row[1] for row in live["recent_records"]] == [9, 8, 7, 6]
+        assert live["worker"] is None
+        assert MetricsBroadcaster(db, worker="1").snapshot()["worker"] == "1"
+        db.close()
+    print("✅ Live summary matches the database")
+
+
+def test_subscribers_receive_events():
+    """Every subscriber gets each inference, then one summary per interval with news"""
+    print("\n📬 Testing metrics subscriptions...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = TelemetryDB(os.path.join(tmp_dir, "stream_telemetry.db"))
+        broadcaster = MetricsBroadcaster(db, max_queue_size=2)
+
+        async def scenario():
+            first, second = broadcaster.subscribe(), broadcaster.subscribe()
+            broadcaster.publish(make_record(1), model="tiny")
+            broadcaster.publish(make_record(2), model="tiny")
+            assert broadcaster.flush_summary()
+            assert not broadcaster.flush_summary()
+            await asyncio.sleep(0)
+
+            events = [await first.get(timeout=1) for _ in range(2)]
+            assert [name for name, _ in events] == ["inference", "inference"]
+            assert events[0][1]["record"]["model"] == "tiny"
+            # The queue holds two events, so the summary was dropped for both viewers
+            assert await first.get(timeout=0.01) is None
+            assert broadcaster.get_stats()["dropped"] == 2
+
+            broadcaster.unsubscribe(second)
+            broadcaster.publish(make_record(3))
+            broadcaster.flush_summary()
+            await asyncio.sleep(0)
+            names = [(await first.get(timeout=1))[0] for _ in range(2)]
+            assert names == ["inference", "summary"]
+            assert broadcaster.get_stats()["subscribers"] == 1
+
+        asyncio.run(scenario())
+        db.close()
+    print("✅ Subscribers received events")
+
+
+if __name__ == "__main__":
+    print("Edge Foundry Metrics Stream Test Suite")
+    print("=" * 40)
+    test_live_summary_matches_database()
+    test_subscribers_receive_events()
+    print("\n🎉 All metrics stream tests passed!")
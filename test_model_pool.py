@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Test script for the resident model pool in ModelManager.
+Uses a stand-in wrapper so no model files are needed.
+"""
+
+import os
+import sys
+import tempfile
+import yaml
+from contextlib import contextmanager
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import model_manager as model_manager_module
+from model_manager import ModelManager
+
+
+class FakeWrapper:
+    """Records load/unload calls instead of loading a GGUF"""
+
+    loads = 0
+
+    def __init__(self):
+        self.model_config = None
+        self.unloaded = False
+
+    def load_model(self, config):
+        FakeWrapper.loads += 1
+        self.model_config = config
+
+    def unload(self):
+        self.unloaded = True
+
+
+def make_manager(tmp_dir: str, cache_models: bool = True, budget_mb: int = 250) -> ModelManager:
+    """Create a manager over three 100 MB models with the given pool settings"""
+    config = {
+        "demo_models": {
+            model_id: {"name": model_id, "model_path": f"{model_id}.gguf", "memory_mb": 100}
+            for model_id in ("default", "a", "b")
+        },
+        "default_model": "default",
+        "model_switching": {"cache_models": cache_models, "memory_budget_mb": budget_mb}
+    }
+    path = os.path.join(tmp_dir, "demo_models.yaml")
+    with open(path, "w") as f:
+        yaml.safe_dump(config, f)
+    return ModelManager(path)
+
+
+@contextmanager
+def fake_manager(cache_models: bool = True, budget_mb: int = 250):
+    """A manager from make_manager whose models load as FakeWrapper"""
+    original = model_manager_module.LlamaCPPWrapper
+    model_manager_module.LlamaCPPWrapper = FakeWrapper
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            yield make_manager(tmp_dir, cache_models=cache_models, budget_mb=budget_mb)
+    finally:
+        model_manager_module.LlamaCPPWrapper = original
+
+
+def test_resident_switch_does_not_reload():
+    """Switching back to a resident model reuses the loaded wrapper"""
+    print("\n♻️  Testing resident model switching...")
+    with fake_manager() as manager:
+        FakeWrapper.loads = 0
+        assert manager.switch_model("default")
+        assert manager.switch_model("a")
+        first_a = manager.current_wrapper
+        assert manager.switch_model("default")
+        assert manager.switch_model("a")
+        assert manager.current_wrapper is first_a
+        assert FakeWrapper.loads == 2
+        stats = manager.get_pool_stats()
+        assert stats["hits"] == 2
+        assert stats["memory_used_mb"] == 200
+    print("✅ Resident models switch without reloading")
+
+
+def test_lru_eviction_keeps_pinned_default():
+    """Loading past the budget evicts the least recently used unpinned model"""
+    print("\n📌 Testing LRU eviction with a pinned default...")
+    with fake_manager(budget_mb=250) as manager:
+        manager.switch_model("a")
+        wrapper_a = manager.current_wrapper
+        manager.switch_model("default")
+        # default was used last but is pinned, so "a" goes
+        manager.switch_model("b")
+        assert list(manager.resident) == ["default", "b"]
+        assert wrapper_a.unloaded
+        assert manager.get_pool_stats()["evictions"] == 1
+    print("✅ Least recently used model evicted, default kept")
+
+
+def test_cache_disabled_keeps_one_model():
+    """Without cache_models only the current model stays loaded"""
+    print("\n1️⃣  Testing single-model mode...")
+    with fake_manager(cache_models=False) as manager:
+        manager.switch_model("default")
+        wrapper_default = manager.current_wrapper
+        manager.switch_model("a")
+        assert list(manager.resident) == ["a"]
+        assert wrapper_default.unloaded
+    print("✅ Previous model freed on switch")
+
+
+def test_evicted_model_drains_before_unload():
+    """A model swapped out mid-request is freed only after the request finishes"""
+    print("\n🚰 Testing in-flight drain...")
+    with fake_manager(cache_models=False) as manager:
+        manager.switch_model("a")
+        with manager.acquire() as wrapper_a:
+            manager.switch_model("b")
+            assert manager.current_model == "b"
+            assert not wrapper_a.unloaded
+            assert manager.get_pool_stats()["draining"] == 1
+        assert wrapper_a.unloaded
+        assert manager.get_pool_stats()["draining"] == 0
+    print("✅ Old model freed once drained")
+
+
+def test_background_switch_job():
+    """start_switch loads in the background and reports its job status"""
+    print("\n🔀 Testing background switch jobs...")
+    with fake_manager() as manager:
+        manager.switch_model("default")
+        job = manager.start_switch("a")
+        assert job["status"] == "loading"
+        assert manager.switch_future(job["job_id"]).result(timeout=5)
+        assert manager.get_switch_job(job["job_id"])["status"] == "completed"
+        assert manager.current_model == "a"
+
+        failed = manager.start_switch("missing")
+        assert not manager.switch_future(failed["job_id"]).result(timeout=5)
+        assert manager.get_switch_job(failed["job_id"])["status"] == "failed"
+        assert manager.current_model == "a"
+        # Finished jobs drop out of the bounded history
+        assert manager.switch_future("pruned-job") is None
+    print("✅ Switch jobs complete and fail as expected")
+
+
+def test_hot_swap_acquire_never_loads_inline():
+    """In hot-swap mode, acquiring a model that is not resident raises instead of loading"""
+    print("\n🚫 Testing acquire without inline loads...")
+    with fake_manager() as manager:
+        manager.switch_model("default")
+        manager.switching_config["hot_swap"] = True
+        FakeWrapper.loads = 0
+        try:
+            with manager.acquire("a"):
+                pass
+            assert False, "acquire should not load in hot-swap mode"
+        except model_manager_module.ModelNotResidentError as e:
+            assert e.model_id == "a"
+        assert FakeWrapper.loads == 0 and not manager.is_resident("a")
+
+        # Without hot swap the request still loads what it needs
+        manager.switching_config["hot_swap"] = False
+        with manager.acquire("a") as wrapper:
+            assert wrapper.model_config["name"] == "a"
+        assert FakeWrapper.loads == 1
+    print("✅ Evicted model reported instead of loaded on the request")
+
+
+if __name__ == "__main__":
+    print("Edge Foundry Model Pool Test Suite")
+    print("=" * 40)
+    test_resident_switch_does_not_reload()
+    test_lru_eviction_keeps_pinned_default()
+    test_cache_disabled_keeps_one_model()
+    test_evicted_model_drains_before_unload()
+    test_background_switch_job()
+    test_hot_swap_acquire_never_loads_inline()
+    print("\n🎉 All model pool tests passed!")
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Test script for the Edge Foundry profiler.
+"""
+
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from profiler import StackSampler, profile_call, profile_name, write_call_profile, write_sampled_profile
+
+
+def busy_worker(stop: threading.Event):
+    while not stop.is_set():
+        sum(i * i for i in range(1000))
+
+
+def test_sampler_writes_collapsed_and_pstats():
+    """Sampled stacks of a busy thread show up in both output formats"""
+    print("\n🔥 Testing stack sampler...")
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_worker, args=(stop,), name="busy-worker")
+    worker.start()
+    sampler = StackSampler(interval=0.002)
+    sampler.start()
+    time.sleep(0.3)
+    sampler.stop()
+    stop.set()
+    worker.join()
+
+    assert sampler.samples > 10
+    collapsed = sampler.collapsed()
+    busy_lines = [line for line in collapsed.splitlines() if line.startswith("busy-worker;")]
+    assert busy_lines and all("busy_worker (test_profiler.py:" in line for line in busy_lines)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in collapsed.splitlines())
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        name = profile_name("sampled")
+        files = write_sampled_profile(sampler, tmp_dir, name)
+        stats = pstats.Stats(os.path.join(tmp_dir, files["pstats"]))
+        keys = [key for key in stats.stats if key[2] == "busy_worker"]
+        assert len(keys) == 1
+        # Nearly every sample of the worker thread is inside busy_worker
+        _, calls, _, cumulative, callers = stats.stats[keys[0]]
+        assert calls >= sampler.samples * 0.8 and cumulative > 0
+        assert any(caller[2] == "run" for caller in callers)
+    print(f"✅ {sampler.samples} samples written as collapsed stacks and pstats")
+
+
+def test_profile_call_report():
+    """A single call is profiled exactly with cProfile"""
+    print("\n🧪 Testing per-call profiling...")
+    result, profile = profile_call(sorted, range(100000, 0, -1))
+    assert result[0] == 1
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        files = write_call_profile(profile, tmp_dir, profile_name("request"))
+        assert set(files) == {"pstats", "report"}
+        assert "function calls" in open(os.path.join(tmp_dir, files["report"])).read()
+        assert pstats.Stats(os.path.join(tmp_dir, files["pstats"])).total_calls >= 1
+    print("✅ Call profile written")
+
+
+if __name__ == "__main__":
+    print("Edge Foundry Profiler Test Suite")
+    print("=" * 40)
+    test_sampler_writes_collapsed_and_pstats()
+    test_profile_call_report()
+    print("\n🎉 All profiler tests passed!")
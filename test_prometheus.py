@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Test script for the Edge Foundry Prometheus exposition.
+"""
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from prometheus import InferenceMetrics, Registry, label_expositions
+
+
+def test_render_text_format():
+    """Counters, gauges and histograms render in the Prometheus text format"""
+    print("\n📈 Testing Prometheus text rendering...")
+    registry = Registry()
+    requests = registry.counter("demo_requests_total", "Requests", ["model"])
+    depth = registry.gauge("demo_queue_depth", "Queue depth")
+    latency = registry.histogram("demo_latency_seconds", "Latency", ["model"], buckets=(0.1, 1.0))
+
+    requests.inc(model='tiny "q4"')
+    requests.inc(2, model='tiny "q4"')
+    registry.add_collector(lambda: depth.set(3))
+    for value in (0.05, 0.5, 5.0):
+        latency.observe(value, model="tiny")
+
+    text = registry.render()
+    assert "# TYPE demo_requests_total counter" in text
+    assert 'demo_requests_total{model="tiny \\"q4\\""} 3' in text
+    assert "demo_queue_depth 3" in text
+    assert 'demo_latency_seconds_bucket{model="tiny",le="0.1"} 1' in text
+    assert 'demo_latency_seconds_bucket{model="tiny",le="1"} 2' in text
+    assert 'demo_latency_seconds_bucket{model="tiny",le="+Inf"} 3' in text
+    assert 'demo_latency_seconds_count{model="tiny"} 3' in text
+    assert text.endswith("\n")
+
+    try:
+        requests.inc(endpoint="inference")
+        assert False, "unknown labels should be refused"
+    except ValueError:
+        pass
+    print("✅ Text exposition rendered")
+
+
+def test_inference_metrics_observe():
+    """A telemetry record updates request, token and latency metrics for its model"""
+    print("\n🔢 Testing inference metrics...")
+    metrics = InferenceMetrics()
+    metrics.observe("inference", "tiny", {
+        "prompt_length": 12, "latency_ms": 250.0, "tokens_generated": 8,
+        "queue_wait_ms": 5.0, "cached_prompt_tokens": 4
+    })
+    metrics.observe("stream", "tiny", {
+        "prompt_length": 3, "latency_ms": 100.0, "tokens_generated": 2, "ttft_ms": 40.0
+    })
+    # Cache hits count as requests but stay out of the latency histograms
+    metrics.observe("inference", "tiny", {
+        "prompt_length": 12, "latency_ms": 1.0, "tokens_generated": 8, "cache_hit": True
+    })
+    metrics.observe_error("batch", "tiny")
+
+    text = metrics.render()
+    assert 'edgefoundry_requests_total{model="tiny",endpoint="inference"} 2' in text
+    assert 'edgefoundry_tokens_generated_total{model="tiny"} 18' in text
+    assert 'edgefoundry_cached_prompt_tokens_total{model="tiny"} 4' in text
+    assert 'edgefoundry_response_cache_hits_total{model="tiny"} 1' in text
+    assert 'edgefoundry_request_latency_seconds_count{model="tiny"} 2' in text
+    assert 'edgefoundry_time_to_first_token_seconds_count{model="tiny"} 1' in text
+    assert 'edgefoundry_request_errors_total{model="tiny",endpoint="batch"} 1' in text
+    print("✅ Inference metrics recorded")
+
+
+def test_label_expositions():
+    """Expositions from several workers merge into one, each series labelled by worker"""
+    print("\n🏷️  Testing per-worker exposition labelling...")
+    texts = []
+    for worker, count in (("w0", 2), ("w1", 5)):
+        metrics = InferenceMetrics()
+        for _ in range(count):
+            metrics.observe("inference", "tiny", {"prompt_length": 1, "latency_ms": 10.0, "tokens_generated": 1})
+        depth = metrics.registry.gauge("edgefoundry_queue_depth", "Queue depth")
+        depth.set(count)
+        texts.append((worker, metrics.render()))
+
+    text = label_expositions(texts)
+    assert text.count("# TYPE edgefoundry_requests_total counter") == 1
+    assert 'edgefoundry_requests_total{worker="w0",model="tiny",endpoint="inference"} 2' in text
+    assert 'edgefoundry_requests_total{worker="w1",model="tiny",endpoint="inference"} 5' in text
+    assert 'edgefoundry_request_latency_seconds_bucket{worker="w1",model="tiny",le="+Inf"} 5' in text
+    assert 'edgefoundry_queue_depth{worker="w0"} 2' in text
+    # Samples of a family stay together under its header
+    lines = text.splitlines()
+    start = lines.index("# TYPE edgefoundry_queue_depth gauge")
+    assert lines[start + 1:start + 3] == ['edgefoundry_queue_depth{worker="w0"} 2', 'edgefoundry_queue_depth{worker="w1"} 5']
+    print("✅ Worker label added to every series")
+
+
+if __name__ == "__main__":
+    print("Edge Foundry Prometheus Test Suite")
+    print("=" * 40)
+    test_render_text_format()
+    test_inference_metrics_observe()
+    test_label_expositions()
+    print("\n🎉 All Prometheus tests passed!")
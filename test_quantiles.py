@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Test script for Edge Foundry quantile sketches.
+"""
+
+import os
+import random
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from quantiles import QuantileSketch
+
+
+def exact_quantile(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def test_quantiles_within_relative_accuracy():
+    """Every reported quantile is within the sketch's relative error"""
+    print("\n🎯 Testing sketch accuracy...")
+    rng = random.Random(7)
+    values = [rng.lognormvariate(5, 1) for _ in range(20000)]
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    sketch.update(values)
+
+    assert sketch.count == len(values)
+    for q in (0.5, 0.9, 0.95, 0.99):
+        exact = exact_quantile(values, q)
+        assert abs(sketch.quantile(q) - exact) / exact <= 0.02, q
+    assert sketch.quantile(0) == min(values)
+    assert sketch.quantile(1) == max(values)
+    assert QuantileSketch().quantile(0.5) is None
+    print("✅ Quantiles within 1% of exact values")
+
+
+def test_merge_and_serialization():
+    """Merged and round-tripped sketches answer like one sketch over all values"""
+    print("\n🔗 Testing sketch merge and serialization...")
+    rng = random.Random(11)
+    first_values = [rng.uniform(1, 100) for _ in range(1000)]
+    second_values = [rng.uniform(50, 500) for _ in range(1000)] + [0.0] * 50
+
+    combined = QuantileSketch()
+    combined.update(first_values + second_values)
+
+    first, second = QuantileSketch(), QuantileSketch()
+    first.update(first_values)
+    second.update(second_values)
+    merged = QuantileSketch.from_json(first.to_json())
+    merged.merge(QuantileSketch.from_json(second.to_json()))
+
+    assert merged.count == combined.count == 2050
+    assert merged.zero_count == 50
+    assert merged.quantiles() == combined.quantiles()
+    assert merged.quantile(0.01) == 0.0
+
+    try:
+        merged.merge(QuantileSketch(relative_accuracy=0.05))
+        assert False, "sketches with different accuracy should not merge"
+    except ValueError:
+        pass
+    print("✅ Merged sketch matches a single sketch")
+
+
+if __name__ == "__main__":
+    print("Edge Foundry Quantile Sketch Test Suite")
+    print("=" * 40)
+    test_quantiles_within_relative_accuracy()
+    test_merge_and_serialization()
+    print("\n🎉 All quantile sketch tests passed!")
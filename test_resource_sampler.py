@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Test script for the Edge Foundry resource sampler.
+"""
+
+import os
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from resource_sampler import ResourceSampler
+from telemetry import TelemetryDB, RESOURCE_SAMPLE_COLUMNS
+
+
+def test_samples_are_stored_and_pruned():
+    """Samples carry every column, reach the database in batches and follow raw retention"""
+    print("\n🩺 Testing resource samples...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = TelemetryDB(os.path.join(tmp_dir, "resource_telemetry.db"))
+        sampler = ResourceSampler(db, interval=0.02, batch_size=3)
+        sampler.start()
+        time.sleep(0.3)
+        sampler.stop()
+
+        samples = db.get_resource_samples()
+        assert len(samples) == sampler.get_stats()["samples"] >= 3
+        assert set(samples[0]) == set(RESOURCE_SAMPLE_COLUMNS)
+        assert samples[-1] == sampler.get_latest()
+        assert samples[0]["rss_mb"] > 0 and samples[0]["num_threads"] >= 1
+        assert samples[0]["pid"] == os.getpid()
+        assert samples[1]["cpu_percent"] is not None
+        assert [s["timestamp"] for s in samples] == sorted(s["timestamp"] for s in samples)
+        assert len(db.get_resource_samples(limit=2)) == 2
+
+        db.record_resource_samples([{"timestamp": "2000-01-01T00:00:00", "rss_mb": 1.0}])
+        assert db.compact(raw_days=1)["samples_deleted"] == 1
+        assert len(db.get_resource_samples()) == len(samples)
+        db.close()
+    print(f"✅ {len(samples)} samples stored")
+
+
+def test_track_reports_peak_rss():
+    """A request's peak RSS includes memory it allocated and freed before finishing"""
+    print("\n⛰️  Testing per-request peak RSS...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = TelemetryDB(os.path.join(tmp_dir, "resource_telemetry.db"))
+        sampler = ResourceSampler(db, interval=60, peak_interval=0.01, include_mapped_files=False)
+        sampler.start()
+        with sampler.track() as peak:
+            baseline = peak.peak_rss_mb
+            buffer = bytearray(64 * 1024 * 1024)
+            time.sleep(0.2)
+            del buffer
+        sampler.stop()
+        assert peak.peak_rss_mb >= baseline + 48, (baseline, peak.peak_rss_mb)
+        # The buffer was freed, so the before/after delta stays well below the peak
+        assert peak.delta_mb == peak.end_rss_mb - peak.start_rss_mb < peak.peak_rss_mb - baseline
+        assert sampler.get_stats()["active_requests"] == 0
+        assert sampler.get_latest()["mapped_file_mb"] is None
+        db.close()
+    print(f"✅ Peak RSS {peak.peak_rss_mb:.1f} MB (baseline {baseline:.1f} MB)")
+
+
+if __name__ == "__main__":
+    print("Edge Foundry Resource Sampler Test Suite")
+    print("=" * 40)
+    test_samples_are_stored_and_pruned()
+    test_track_reports_peak_rss()
+    print("\n🎉 All resource sampler tests passed!")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Test script for the Edge Foundry response cache.
+"""
+
+import os
+import tempfile
+from response_cache import ResponseCache
+
+
+def make_response(text: str) -> dict:
+    """Build a cached response payload like the agent stores."""
+    return {
+        "response": text,
+        "prompt_tokens": 5,
+        "tokens_generated": len(text.split()),
+        "model_info": {"model_path": "test-model"}
+    }
+
+
+def test_keys_cover_generation_parameters():
+    """Requests that could generate different text get different keys."""
+    print("🧪 Testing cache keys...")
+    base = ResponseCache.make_key("tinyllama", "Human: hi\nAssistant:", 64, 0.0, 1337)
+    assert base == ResponseCache.make_key("tinyllama", "Human: hi\nAssistant:", 64, 0.0, 1337)
+    assert base != ResponseCache.make_key("phi-3-mini", "Human: hi\nAssistant:", 64, 0.0, 1337)
+    assert base != ResponseCache.make_key("tinyllama", "Human: hi\nAssistant:", 32, 0.0, 1337)
+    assert base != ResponseCache.make_key("tinyllama", "Human: hi\nAssistant:", 64, 0.0, 42)
+    print("✅ Cache keys include model, prompt, max_tokens, temperature and seed")
+
+
+def test_lru_eviction_under_byte_budget():
+    """The least recently used entry is evicted when the budget is exceeded."""
+    print("🧪 Testing LRU eviction...")
+    cache = ResponseCache(max_bytes=400)
+    for name in ["a", "b", "c"]:
+        cache.put(name, make_response(f"answer {name} " * 3))
+
+    # Touch "a" so "b" becomes the least recently used entry
+    assert cache.get("a") is not None
+    cache.put("d", make_response("answer d " * 3))
+
+    stats = cache.get_stats()
+    assert stats["bytes"] <= 400
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert stats["evictions"] >= 1
+    print(f"✅ Evicted {stats['evictions']} entries, {stats['bytes']} bytes in use")
+
+
+def test_persistence_round_trip():
+    """Saved entries are available to a new cache instance."""
+    print("🧪 Testing cache persistence...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "response_cache.json")
+        cache = ResponseCache(persist_path=path)
+        cache.put("key", make_response("Paris"))
+        cache.save()
+
+        restored = ResponseCache(persist_path=path)
+        restored.load()
+        assert restored.get("key")["response"] == "Paris"
+        assert restored.get_stats()["hits"] == 1
+    print("✅ Cache restored from disk")
+
+
+if __name__ == "__main__":
+    print("Edge Foundry Response Cache Test Suite")
+    print("=" * 40)
+    test_keys_cover_generation_parameters()
+    test_lru_eviction_under_byte_budget()
+    test_persistence_round_trip()
+    print("\n🎉 All tests completed!")
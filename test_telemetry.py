@@ -4,11 +4,14 @@ Test script for Edge Foundry telemetry system.
 This script can be used to test the telemetry functionality without requiring the full model setup.
 """
 
+import os
 import time
 import random
 import sqlite3
-from datetime import datetime
-from telemetry import TelemetryDB, get_memory_usage, count_tokens
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from telemetry import TelemetryDB, TelemetryWriter, TelemetryCompactor, SCHEMA_VERSION, get_memory_usage, count_tokens, token_counts
 
 def generate_test_data(db: TelemetryDB, num_records: int = 10):
     """Generate test telemetry data for demonstration purposes."""
@@ -72,6 +75,364 @@ def test_telemetry_db():
     print("\n✅ All telemetry tests passed!")
     return db
 
+def test_bulk_record_inferences():
+    """Test that a batch of records is written in one call."""
+    print("\n📦 Testing bulk telemetry insert...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = TelemetryDB(os.path.join(tmp_dir, "bulk_telemetry.db"))
+        db.record_inferences([
+            {
+                "prompt_length": 10 + i,
+                "latency_ms": 100.0,
+                "tokens_generated": 5,
+                "memory_mb": 1.0,
+                "model_path": "bulk-model",
+                "queue_wait_ms": float(i),
+                "cached_prompt_tokens": i
+            }
+            for i in range(5)
+        ])
+
+        records = db.get_all_records()
+        assert len(records) == 5
+        summary = db.get_metrics_summary(5)["summary"]
+        assert summary["total_inferences"] == 5
+        assert summary["avg_tokens_per_second"] == 50.0
+        assert summary["avg_queue_wait_ms"] == 2.0
+        assert summary["cached_prompt_tokens"] == 10
+    print("✅ Bulk insert recorded 5 rows")
+
+def make_record(i: int) -> dict:
+    return {
+        "prompt_length": i,
+        "latency_ms": 100.0,
+        "tokens_generated": 5,
+        "memory_mb": 1.0,
+        "model_path": "writer-model"
+    }
+
+def test_telemetry_writer_batches():
+    """Test that the background writer batches records and flushes on stop."""
+    print("\n🧵 Testing buffered telemetry writer...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = TelemetryDB(os.path.join(tmp_dir, "writer_telemetry.db"))
+        writer = TelemetryWriter(db, batch_size=4, flush_interval=0.05)
+        writer.start()
+        assert writer.submit_many([make_record(i) for i in range(10)]) == 10
+        assert writer.flush()
+        assert len(db.get_all_records()) == 10
+
+        # Records still buffered at shutdown are written
+        writer.flush_interval = 60
+        writer.submit(make_record(10))
+        writer.stop()
+        assert len(db.get_all_records()) == 11
+
+        stats = writer.get_stats()
+        assert stats["written"] == 11
+        assert stats["batches"] >= 3
+        assert stats["dropped"] == 0
+    print("✅ Writer batched and flushed 11 records")
+
+def test_telemetry_writer_drops_when_full():
+    """Test that a full buffer drops records and counts them."""
+    print("\n🪣 Testing telemetry writer drops...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = TelemetryDB(os.path.join(tmp_dir, "drop_telemetry.db"))
+        # Not started, so nothing drains the buffer
+        writer = TelemetryWriter(db, max_queue_size=3)
+        accepted = writer.submit_many([make_record(i) for i in range(5)])
+        assert accepted == 3
+        assert writer.get_stats()["dropped"] == 2
+        assert writer.get_stats()["queued"] == 3
+    print("✅ Full buffer dropped 2 records")
+
+def test_existing_database_upgrades_in_place():
+    """Test that an old-schema telemetry.db gains the new columns and indexes."""
+    print("\n🗄️  Testing schema migrations...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "old_telemetry.db")
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("""
+                CREATE TABLE telemetry (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp TEXT NOT NULL,
+                    prompt_length INTEGER NOT NULL,
+                    latency_ms REAL NOT NULL,
+                    tokens_generated INTEGER NOT NULL,
+                    tokens_per_second REAL NOT NULL,
+                    memory_mb REAL NOT NULL,
+                    model_path TEXT,
+                    temperature REAL,
+                    max_tokens INTEGER
+                )
+            """)
+            conn.execute("""
+                INSERT INTO telemetry (timestamp, prompt_length, latency_ms, tokens_generated,
+                                       tokens_per_second, memory_mb, model_path)
+                VALUES ('2024-01-01T00:00:00', 10, 100.0, 5, 50.0, 1.0, 'old-model')
+            """)
+        conn.close()
+
+        db = TelemetryDB(db_path)
+        assert db.get_metrics_summary()["summary"]["total_inferences"] == 1
+        db.record_inference(prompt_length=1, latency_ms=10.0, tokens_generated=1,
+                            memory_mb=1.0, queue_wait_ms=2.0, tokens_exact=1, peak_rss_mb=512.0)
+        # memory_mb keeps its meaning; peak RSS gets its own column, empty for old rows
+        assert [(r["memory_mb"], r["peak_rss_mb"]) for r in db.get_records()["records"]] == [(1.0, 512.0), (1.0, None)]
+        # The old row's whitespace token count is flagged as approximate
+        assert db.get_metrics_summary()["summary"]["approximate_token_inferences"] == 1
+        assert [record["tokens_exact"] for record in db.get_records()["records"]] == [1, 0]
+        db.close()
+
+        conn = sqlite3.connect(db_path)
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        indexes = {row[1] for row in conn.execute("PRAGMA index_list(telemetry)")}
+        assert {"idx_telemetry_timestamp", "idx_telemetry_model_timestamp"} <= indexes
+        assert "pid" in {row[1] for row in conn.execute("PRAGMA table_info(resource_samples)")}
+        conn.close()
+    print("✅ Old database upgraded to schema version", SCHEMA_VERSION)
+
+def test_token_counts_prefer_model_usage():
+    """Test that token counts come from llama.cpp usage, with flagged estimates as fallback."""
+    print("\n🔤 Testing token accounting...")
+    usage = {"prompt_tokens": 14, "completion_tokens": 3, "cached_prompt_tokens": 0}
+    assert token_counts(usage, "Human: hi\nAssistant:", "Hello there") == {
+        "prompt_tokens": 14, "completion_tokens": 3, "tokens_exact": True
+    }
+    assert token_counts({}, "Human: hi\nAssistant:", "Hello there") == {
+        "prompt_tokens": 3, "completion_tokens": 2, "tokens_exact": False
+    }
+    print("✅ Token counts taken from usage")
+
+def test_phase_timings_stored():
+    """Test that per-phase latency is stored with each record."""
+    print("\n⏱️  Testing latency phases...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = TelemetryDB(os.path.join(tmp_dir, "phase_telemetry.db"))
+        db.record_inference(prompt_length=31, latency_ms=12.0, tokens_generated=8, memory_mb=1.0,
+                            queue_wait_ms=3.0, tokenize_ms=0.1, prompt_eval_ms=4.5, decode_ms=6.4,
+                            decode_per_token_ms=0.8, postprocess_ms=0.2)
+        db.record_inference(prompt_length=1, latency_ms=1.0, tokens_generated=1, memory_mb=1.0)
+        records = db.get_records()["records"]
+        assert records[1]["prompt_eval_ms"] == 4.5 and records[1]["decode_per_token_ms"] == 0.8
+        assert records[0]["decode_ms"] is None
+        db.close()
+    print("✅ Latency phases stored")
+
+def test_read_only_reader_alongside_writer():
+    """Test that a read-only handle sees new rows and never writes."""
+    print("\n👀 Testing read-only telemetry access...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "shared_telemetry.db")
+        writer_db = TelemetryDB(db_path)
+        reader_db = TelemetryDB(db_path, read_only=True)
+
+        writer_db.record_inferences([make_record(i) for i in range(3)])
+        assert reader_db.get_metrics_summary()["summary"]["total_inferences"] == 3
+        writer_db.record_inferences([make_record(3)])
+        assert len(reader_db.get_all_records()) == 4
+
+        try:
+            reader_db.record_inference(prompt_length=1, latency_ms=1.0, tokens_generated=1, memory_mb=1.0)
+            assert False, "read-only database should refuse writes"
+        except RuntimeError:
+            pass
+        reader_db.close()
+        writer_db.close()
+    print("✅ Reader saw the writer's rows without blocking it")
+
+def test_rollups_match_raw_rows():
+    """Test that summaries and timeseries from the rollups agree with the raw rows."""
+    print("\n🧮 Testing rollup tables...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = TelemetryDB(os.path.join(tmp_dir, "rollup_telemetry.db"))
+        records = []
+        for i in range(12):
+            record = make_record(i)
+            record["timestamp"] = f"2024-01-01T{10 + i % 2}:0{i % 3}:30"
+            record["latency_ms"] = 100.0 + i
+            record["cache_hit"] = i == 0
+            records.append(record)
+        # Two batches land in the same buckets and must merge
+        db.record_inferences(records[:5])
+        db.record_inferences(records[5:])
+
+        summary = db.get_metrics_summary()["summary"]
+        assert summary["total_inferences"] == 12
+        assert summary["cache_hits"] == 1
+        assert summary["avg_latency_ms"] == round(sum(100.0 + i for i in range(1, 12)) / 11, 2)
+        assert summary["first_inference"] == "2024-01-01T10:00:30"
+
+        hours = db.get_timeseries("hour")
+        assert [bucket["bucket"] for bucket in hours] == ["2024-01-01T10:00:00", "2024-01-01T11:00:00"]
+        assert [bucket["inferences"] for bucket in hours] == [6, 6]
+
+        minutes = db.get_timeseries("minute", since="2024-01-01T11:01:59", model_path="writer-model")
+        assert [bucket["bucket"] for bucket in minutes] == ["2024-01-01T11:01:00", "2024-01-01T11:02:00"]
+        assert db.get_timeseries("minute", model_path="other-model") == []
+
+        # Percentiles come from sketches persisted per bucket, cache hits excluded
+        percentiles = db.get_metrics_summary()["percentiles"]
+        assert percentiles["latency_ms"]["count"] == 11
+        assert abs(percentiles["latency_ms"]["p50"] - 106.0) <= 1.1
+        assert percentiles["queue_wait_ms"]["count"] == 0
+        assert db.get_percentiles(since="2024-01-01T11:00:00")["latency_ms"]["count"] == 6
+    print("✅ Rollups agree with raw rows")
+
+def test_concurrent_writers_roll_up_once():
+    """Test that writers on separate connections, like worker processes, never double count rollups."""
+    print("\n👥 Testing concurrent writers...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "shared_telemetry.db")
+        writers = [TelemetryDB(path) for _ in range(3)]
+
+        def write(db):
+            for _ in range(20):
+                db.record_inferences([make_record(i) for i in range(5)])
+
+        threads = [threading.Thread(target=write, args=(db,)) for db in writers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        reader = TelemetryDB(path)
+        rows = reader._reader().execute("SELECT COUNT(*) FROM telemetry").fetchone()[0]
+        assert rows == 3 * 20 * 5
+        assert reader.get_metrics_summary()["summary"]["total_inferences"] == rows
+        assert sum(bucket["inferences"] for bucket in reader.get_timeseries("minute")) == rows
+        for db in writers + [reader]:
+            db.close()
+    print("✅ Rollups count every row once")
+
+def test_all_time_percentiles_reuse_settled_sketches():
+    """Test that all-time percentiles merge old hourly sketches once and re-read only recent ones."""
+    print("\n🗃️  Testing cached all-time sketches...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = TelemetryDB(os.path.join(tmp_dir, "sketch_telemetry.db"))
+        old = [dict(make_record(i), timestamp=f"2024-01-0{1 + i % 3}T10:00:00") for i in range(6)]
+        db.record_inferences(old)
+
+        loads = []
+        load_sketches = db._load_sketches
+        def counting_load(resolution, since_bucket, until_bucket, model_path):
+            loads.append((resolution, since_bucket, until_bucket))
+            return load_sketches(resolution, since_bucket, until_bucket, model_path)
+        db._load_sketches = counting_load
+
+        assert db.get_percentiles()["latency_ms"]["count"] == 6
+        assert [since for _, since, until in loads if until] == [None]
+        db.record_inferences([make_record(i) for i in range(3)])
+        loads.clear()
+        assert db.get_percentiles()["latency_ms"]["count"] == 9
+        # Only the buckets still receiving records were read again
+        assert len(loads) == 1 and loads[0][1] is not None and loads[0][2] is None
+
+        # A late record for a settled hour invalidates the cache
+        db.record_inferences([dict(make_record(0), timestamp="2024-01-01T10:30:00")])
+        assert db.get_percentiles()["latency_ms"]["count"] == 10
+        assert db.get_percentiles(model_path="other-model")["latency_ms"]["count"] == 0
+        db.close()
+    print("✅ Settled sketches merged once")
+
+def test_compact_applies_retention():
+    """Test that compaction prunes old rows, keeps their aggregates and frees pages."""
+    print("\n🧹 Testing telemetry retention and compaction...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "compact_telemetry.db")
+        db = TelemetryDB(db_path)
+        now = datetime.now()
+        records = []
+        for i, days_old in enumerate([0, 1, 10, 10, 40, 400]):
+            record = make_record(i)
+            record["timestamp"] = (now - timedelta(days=days_old)).isoformat()
+            records.append(record)
+        db.record_inferences(records)
+
+        result = db.compact(raw_days=7, minute_days=30, hour_days=365, batch_size=1)
+        assert result["raw_deleted"] == 4
+        assert result["minute_deleted"] == 2
+        assert result["hour_deleted"] == 1
+        assert len(db.get_all_records()) == 2
+        # Hourly aggregates outlive the raw rows
+        assert db.get_metrics_summary()["summary"]["total_inferences"] == 5
+        assert db.get_percentiles()["latency_ms"]["count"] == 5
+
+        with sqlite3.connect(db_path) as conn:
+            assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+            assert conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
+        conn.close()
+
+        # A limit of 0 keeps data forever
+        compactor = TelemetryCompactor(db, raw_days=0, minute_days=0, hour_days=0)
+        assert compactor.run_once()["raw_deleted"] == 0
+        assert compactor.get_stats()["runs"] == 1
+        db.close()
+    print("✅ Old telemetry pruned, aggregates kept")
+
+def test_compact_converts_old_databases_only_on_request():
+    """Test that only an explicit vacuum runs the full VACUUM on a pre-incremental database."""
+    print("\n🗜️  Testing incremental auto-vacuum conversion...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "legacy_telemetry.db")
+        # A database created before telemetry enabled incremental auto-vacuum
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("CREATE TABLE legacy (id INTEGER)")
+        conn.close()
+        db = TelemetryDB(db_path)
+        db.record_inferences([make_record(i) for i in range(3)])
+
+        result = db.compact(raw_days=7)
+        assert result["converted_to_incremental_vacuum"] is False
+        assert result["pages_freed"] == 0
+        assert db._writer().execute("PRAGMA auto_vacuum").fetchone()[0] == 0
+
+        assert db.compact(raw_days=7, vacuum=True)["converted_to_incremental_vacuum"] is True
+        assert db._writer().execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        assert db.compact(raw_days=7, vacuum=True)["converted_to_incremental_vacuum"] is False
+        db.close()
+    print("✅ Background compaction leaves old databases alone")
+
+def test_keyset_pagination_and_deltas():
+    """Test that records page by id, filter, and return only unseen rows in delta mode."""
+    print("\n📑 Testing paginated record queries...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = TelemetryDB(os.path.join(tmp_dir, "paging_telemetry.db"))
+        records = []
+        for i in range(25):
+            record = make_record(i)
+            record["latency_ms"] = float(i)
+            record["model_path"] = "model-a" if i % 2 else "model-b"
+            records.append(record)
+        db.record_inferences(records)
+
+        seen = []
+        cursor = None
+        while True:
+            page = db.get_records(limit=5, before_id=cursor, model_path="model-a", min_latency_ms=4)
+            seen.extend(record["latency_ms"] for record in page["records"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                assert not page["has_more"]
+                break
+        assert seen == [float(i) for i in range(23, 4, -2)]
+
+        newest_id = db.get_records(limit=1)["records"][0]["id"]
+        db.record_inferences([make_record(100), make_record(101)])
+        delta = db.get_records(since_id=newest_id)
+        assert [record["prompt_length"] for record in delta["records"]] == [100, 101]
+        assert db.get_records(since_id=delta["records"][-1]["id"])["records"] == []
+
+        try:
+            db.get_records(before_id=10, since_id=5)
+            assert False, "before_id and since_id are exclusive"
+        except ValueError:
+            pass
+        db.close()
+    print("✅ Pages and deltas returned the expected records")
+
 def simulate_api_calls():
     """Simulate API calls to test the full system."""
     print("\n🌐 Simulating API calls...")
@@ -128,6 +489,27 @@ if __name__ == "__main__":
     # Test 1: Database functionality
     db = test_telemetry_db()
     
+    # Test 1b: Bulk inserts
+    test_bulk_record_inferences()
+    
+    # Test 1c: Buffered writer
+    test_telemetry_writer_batches()
+    test_telemetry_writer_drops_when_full()
+    
+    # Test 1d: Migrations and read-only access
+    test_existing_database_upgrades_in_place()
+    test_read_only_reader_alongside_writer()
+    test_token_counts_prefer_model_usage()
+    test_phase_timings_stored()
+    
+    # Test 1e: Rollups
+    test_rollups_match_raw_rows()
+    test_concurrent_writers_roll_up_once()
+    test_all_time_percentiles_reuse_settled_sketches()
+    test_compact_applies_retention()
+    test_compact_converts_old_databases_only_on_request()
+    test_keyset_pagination_and_deltas()
+    
     # Test 2: Memory usage function
     print(f"\n💾 Current memory usage: {get_memory_usage():.2f} MB")
     
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Test script for Edge Foundry telemetry export.
+"""
+
+import csv
+import gzip
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from telemetry import TelemetryDB, TELEMETRY_COLUMN_TYPES
+from telemetry_export import export_telemetry, parse_time
+
+
+def make_db(tmp_dir: str) -> TelemetryDB:
+    db = TelemetryDB(os.path.join(tmp_dir, "export_telemetry.db"))
+    db.record_inferences([
+        {
+            "prompt_length": i,
+            "latency_ms": 100.0 + i,
+            "tokens_generated": 5,
+            "memory_mb": 1.0,
+            "model_path": "model-a" if i % 2 else "model-b",
+            "timestamp": f"2024-01-0{1 + i % 3}T12:00:00"
+        }
+        for i in range(30)
+    ])
+    return db
+
+
+def test_export_csv_and_jsonl_in_chunks():
+    """Filtered rows are streamed to CSV and gzipped JSON Lines"""
+    print("\n📤 Testing CSV and JSONL export...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = make_db(tmp_dir)
+        progress = []
+
+        csv_path = os.path.join(tmp_dir, "export.csv")
+        written = export_telemetry(db, csv_path, "csv", model_path="model-a", chunk_size=4,
+                                   progress=progress.append)
+        assert written == 15
+        assert progress == [4, 8, 12, 15]
+        with open(csv_path, newline="") as f:
+            rows = list(csv.reader(f))
+        assert rows[0] == list(TELEMETRY_COLUMN_TYPES)
+        assert len(rows) == 16
+        assert all(row[rows[0].index("model_path")] == "model-a" for row in rows[1:])
+
+        jsonl_path = os.path.join(tmp_dir, "export.jsonl.gz")
+        written = export_telemetry(db, jsonl_path, "jsonl", since="2024-01-02T00:00:00",
+                                   until="2024-01-03T00:00:00", compression="gzip")
+        with gzip.open(jsonl_path, "rt") as f:
+            records = [json.loads(line) for line in f]
+        assert written == len(records) == 10
+        assert all(record["timestamp"].startswith("2024-01-02") for record in records)
+        assert [record["id"] for record in records] == sorted(record["id"] for record in records)
+
+        try:
+            export_telemetry(db, csv_path, "csv", compression="zstd")
+            assert False, "zstd is only available for parquet"
+        except ValueError:
+            pass
+        db.close()
+    print("✅ CSV and JSONL exports written")
+
+
+def test_export_parquet():
+    """Parquet export writes a typed file when pyarrow is installed"""
+    print("\n🧱 Testing Parquet export...")
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("⏭️  pyarrow not installed, skipping")
+        return
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = make_db(tmp_dir)
+        path = os.path.join(tmp_dir, "export.parquet")
+        assert export_telemetry(db, path, "parquet", chunk_size=7) == 30
+        table = pq.read_table(path)
+        assert table.num_rows == 30
+        assert table.column_names == list(TELEMETRY_COLUMN_TYPES)
+        db.close()
+    print("✅ Parquet export written")
+
+
+def test_parse_time():
+    """Ages and ISO timestamps both become ISO timestamps"""
+    assert parse_time(None) is None
+    assert parse_time("2024-01-02T03:04:05") == "2024-01-02T03:04:05"
+    age = datetime.now() - datetime.fromisoformat(parse_time("2h"))
+    assert 7190 < age.total_seconds() < 7210
+    try:
+        parse_time("yesterday")
+        assert False, "unparseable times should be refused"
+    except ValueError:
+        pass
+
+
+if __name__ == "__main__":
+    print("Edge Foundry Telemetry Export Test Suite")
+    print("=" * 40)
+    test_export_csv_and_jsonl_in_chunks()
+    test_export_parquet()
+    test_parse_time()
+    print("\n🎉 All telemetry export tests passed!")
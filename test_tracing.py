@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Test script for Edge Foundry request tracing.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from inference_executor import InferenceExecutor
+from tracing import (
+    NOOP_SPAN, JsonlSpanExporter, OtlpHttpSpanExporter, RingSpanExporter, Tracer, parse_traceparent
+)
+
+TRACEPARENT = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+
+
+def test_spans_follow_the_request_across_threads():
+    """A continued trace nests spans from the event loop and the inference worker"""
+    print("\n🧵 Testing span propagation...")
+    assert parse_traceparent(TRACEPARENT) == ("0af7651916cd43dd8448eb211c80319c", "b7ad6b7169203331", True)
+    for invalid in (None, "garbage", "ff-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01",
+                    "00-00000000000000000000000000000000-b7ad6b7169203331-01"):
+        assert parse_traceparent(invalid) is None
+
+    ring = RingSpanExporter()
+    tracer = Tracer([ring], sample_ratio=0.0)
+    executor = InferenceExecutor()
+
+    def job():
+        with tracer.span("worker.job", step=1):
+            tracer.record_span("worker.phase", 1, 2)
+        with tracer.span("worker.fail"):
+            raise ValueError("boom")
+
+    async def scenario():
+        # Outside a trace, and for a caller that chose not to sample, nothing is recorded
+        assert tracer.span("untraced") is NOOP_SPAN
+        assert tracer.start_trace("root") is NOOP_SPAN
+        assert tracer.start_trace("root", TRACEPARENT[:-2] + "00") is NOOP_SPAN
+
+        with tracer.start_trace("POST /inference", TRACEPARENT) as root:
+            try:
+                await executor.run(job)
+            except ValueError:
+                pass
+        return root
+
+    root = asyncio.run(scenario())
+    executor.shutdown()
+    tracer.flush()
+
+    spans = {span["name"]: span for span in ring.get_trace(root.trace_id)}
+    assert set(spans) == {"POST /inference", "worker.job", "worker.phase", "worker.fail"}
+    assert spans["POST /inference"]["parent_span_id"] == "b7ad6b7169203331"
+    assert spans["POST /inference"]["kind"] == "server"
+    assert spans["worker.job"]["parent_span_id"] == root.span_id
+    assert spans["worker.phase"]["parent_span_id"] == spans["worker.job"]["span_id"]
+    assert spans["worker.job"]["attributes"] == {"step": 1}
+    assert spans["worker.fail"]["status"] == {"code": "error", "message": "ValueError: boom"}
+    summary = ring.get_traces()[0]
+    assert summary["root"] == "POST /inference" and summary["spans"] == 4 and summary["error"]
+    assert tracer.get_stats()["traces"] == 1
+    tracer.stop()
+    print(f"✅ {summary['spans']} spans in trace {root.trace_id}")
+
+
+def test_exporters_write_jsonl_and_otlp():
+    """Finished spans reach a JSONL file and a local OTLP/HTTP collector stand-in"""
+    print("\n📤 Testing span exporters...")
+    received = []
+
+    class Collector(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            received.append((self.path, json.loads(body)))
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Collector)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        jsonl_path = os.path.join(tmp_dir, "traces", "spans.jsonl")
+        tracer = Tracer([
+            JsonlSpanExporter(jsonl_path),
+            OtlpHttpSpanExporter(f"http://127.0.0.1:{server.server_port}", service_name="edge-test")
+        ])
+        with tracer.start_trace("POST /inference", **{"http.status_code": 200}):
+            with tracer.span("llama_cpp.generate", prompt_tokens=12, cached=False, ratio=0.5):
+                pass
+        tracer.stop()
+
+        lines = [json.loads(line) for line in open(jsonl_path)]
+        assert [span["name"] for span in lines] == ["llama_cpp.generate", "POST /inference"]
+    server.shutdown()
+
+    assert len(received) == 1 and received[0][0] == "/v1/traces"
+    resource_spans = received[0][1]["resourceSpans"][0]
+    assert resource_spans["resource"]["attributes"][0]["value"] == {"stringValue": "edge-test"}
+    child, root = resource_spans["scopeSpans"][0]["spans"]
+    assert child["parentSpanId"] == root["spanId"] and "parentSpanId" not in root
+    assert root["kind"] == 2 and child["kind"] == 1
+    assert {a["key"]: a["value"] for a in child["attributes"]} == {
+        "prompt_tokens": {"intValue": "12"}, "cached": {"boolValue": False}, "ratio": {"doubleValue": 0.5}
+    }
+    assert int(child["endTimeUnixNano"]) >= int(child["startTimeUnixNano"])
+    print("✅ Spans exported as JSONL and OTLP")
+
+
+if __name__ == "__main__":
+    print("Edge Foundry Tracing Test Suite")
+    print("=" * 40)
+    test_spans_follow_the_request_across_threads()
+    test_exporters_write_jsonl_and_otlp()
+    print("\n🎉 All tracing tests passed!")
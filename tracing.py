@@ -0,0 +1,478 @@
+#!/usr/bin/env python3
+"""
+Request tracing for Edge Foundry
+Lightweight spans that follow the OpenTelemetry data model: trace and span ids use
+W3C Trace Context, so a caller's `traceparent` header continues its trace, and
+finished spans are exported from a background thread as JSON lines, into an
+in-memory ring, or as OTLP/HTTP JSON to a collector. Outside a sampled request,
+span() only reads a context variable and returns a shared no-op span.
+"""
+
+import json
+import logging
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_RE = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+# Span kinds and status codes as numbered by OTLP
+SPAN_KINDS = {"internal": 1, "server": 2}
+STATUS_CODES = {"unset": 0, "ok": 1, "error": 2}
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """(trace_id, parent span id, sampled) from a W3C traceparent header, or None if invalid"""
+    if not header:
+        return None
+    match = TRACEPARENT_RE.match(header.strip().lower())
+    if match is None:
+        return None
+    version, trace_id, span_id, flags = match.groups()
+    if version == "ff" or trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return trace_id, span_id, bool(int(flags, 16) & 1)
+
+
+class NoopSpan:
+    """Stands in for a span when the request is not sampled; every method does nothing"""
+
+    sampled = False
+    trace_id = None
+    span_id = None
+
+    def __enter__(self) -> "NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_attributes(self, **attributes):
+        pass
+
+    def record_error(self, error: BaseException):
+        pass
+
+    def end(self, end_ns: Optional[int] = None):
+        pass
+
+    def traceparent(self) -> Optional[str]:
+        return None
+
+
+NOOP_SPAN = NoopSpan()
+
+# The span new spans are created under; None outside sampled requests
+current_span: ContextVar[Optional["Span"]] = ContextVar("edgefoundry_current_span", default=None)
+
+
+class Span:
+    """
+    One timed operation. Used as a context manager it becomes the current span for
+    its block and ends on exit, recording an escaping exception as an error.
+    """
+
+    sampled = True
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent_span_id: Optional[str],
+                 kind: str = "internal", start_ns: Optional[int] = None,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = "%016x" % random.getrandbits(64)
+        self.parent_span_id = parent_span_id
+        self.kind = kind
+        self.start_ns = start_ns if start_ns is not None else time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = dict(attributes or {})
+        self.status = "unset"
+        self.status_message: Optional[str] = None
+        self._token = None
+
+    def __enter__(self) -> "Span":
+        self._token = current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        current_span.reset(self._token)
+        if exc is not None:
+            self.record_error(exc)
+        self.end()
+        return False
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes):
+        self.attributes.update(attributes)
+
+    def record_error(self, error: BaseException):
+        self.status = "error"
+        self.status_message = f"{type(error).__name__}: {error}"
+
+    def end(self, end_ns: Optional[int] = None):
+        """Finish the span and hand it to the exporters; later calls are ignored"""
+        if self.end_ns is not None:
+            return
+        self.end_ns = end_ns if end_ns is not None else time.time_ns()
+        self.tracer._finish(self)
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "status": {"code": self.status, "message": self.status_message},
+        }
+
+
+class JsonlSpanExporter:
+    """Appends one JSON object per finished span to a file"""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def export(self, spans: List[Dict[str, Any]]):
+        with open(self.path, "a") as f:
+            for span in spans:
+                f.write(json.dumps(span, default=str) + "\n")
+
+
+class RingSpanExporter:
+    """Keeps the most recent max_spans finished spans in memory, for the debug endpoints"""
+
+    def __init__(self, max_spans: int = 2048):
+        self._spans: deque = deque(maxlen=max(1, max_spans))
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Dict[str, Any]]):
+        with self._lock:
+            self._spans.extend(spans)
+
+    def get_traces(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Summaries of the newest traces: root span, span count and total duration"""
+        with self._lock:
+            spans = list(self._spans)
+        traces: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        for span in reversed(spans):
+            traces.setdefault(span["trace_id"], []).append(span)
+
+        summaries = []
+        for trace_id, trace_spans in list(traces.items())[:limit]:
+            span_ids = {span["span_id"] for span in trace_spans}
+            roots = [span for span in trace_spans if span["parent_span_id"] not in span_ids]
+            root = min(roots, key=lambda span: span["start_time_unix_nano"])
+            start = min(span["start_time_unix_nano"] for span in trace_spans)
+            end = max(span["end_time_unix_nano"] for span in trace_spans)
+            summaries.append({
+                "trace_id": trace_id,
+                "root": root["name"],
+                "spans": len(trace_spans),
+                "start_time_unix_nano": start,
+                "duration_ms": round((end - start) / 1e6, 3),
+                "error": any(span["status"]["code"] == "error" for span in trace_spans),
+            })
+        return summaries
+
+    def get_trace(self, trace_id: str) -> List[Dict[str, Any]]:
+        """A trace's spans in start order"""
+        with self._lock:
+            spans = [span for span in self._spans if span["trace_id"] == trace_id]
+        return sorted(spans, key=lambda span: span["start_time_unix_nano"])
+
+
+def otlp_value(value: Any) -> Dict[str, Any]:
+    """An attribute value in OTLP's JSON AnyValue encoding"""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def otlp_span(span: Dict[str, Any]) -> Dict[str, Any]:
+    encoded = {
+        "traceId": span["trace_id"],
+        "spanId": span["span_id"],
+        "name": span["name"],
+        "kind": SPAN_KINDS.get(span["kind"], 1),
+        "startTimeUnixNano": str(span["start_time_unix_nano"]),
+        "endTimeUnixNano": str(span["end_time_unix_nano"]),
+        "attributes": [{"key": key, "value": otlp_value(value)} for key, value in span["attributes"].items()],
+        "status": {"code": STATUS_CODES[span["status"]["code"]]},
+    }
+    if span["parent_span_id"]:
+        encoded["parentSpanId"] = span["parent_span_id"]
+    if span["status"]["message"]:
+        encoded["status"]["message"] = span["status"]["message"]
+    return encoded
+
+
+class OtlpHttpSpanExporter:
+    """
+    Posts spans as OTLP/HTTP JSON to a collector, e.g. an OpenTelemetry Collector or
+    Jaeger listening on http://localhost:4318. A bare endpoint gets /v1/traces appended.
+    """
+
+    def __init__(self, endpoint: str, service_name: str = "edgefoundry",
+                 headers: Optional[Dict[str, str]] = None, timeout: float = 5.0):
+        endpoint = endpoint.rstrip("/")
+        self.endpoint = endpoint if endpoint.endswith("/v1/traces") else f"{endpoint}/v1/traces"
+        self.service_name = service_name
+        self.headers = {"Content-Type": "application/json", **(headers or {})}
+        self.timeout = timeout
+
+    def encode(self, spans: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    {"key": "service.name", "value": otlp_value(self.service_name)}
+                ]},
+                "scopeSpans": [{
+                    "scope": {"name": "edgefoundry"},
+                    "spans": [otlp_span(span) for span in spans],
+                }],
+            }]
+        }
+
+    def export(self, spans: List[Dict[str, Any]]):
+        body = json.dumps(self.encode(spans)).encode("utf-8")
+        request = urllib.request.Request(self.endpoint, data=body, headers=self.headers, method="POST")
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class Tracer:
+    """
+    Creates spans and exports finished ones from a background thread in batches of up
+    to batch_size. New traces are sampled at sample_ratio unless an incoming
+    traceparent has already decided; without exporters nothing is sampled.
+    """
+
+    _STOP = object()
+
+    def __init__(self, exporters: Optional[Iterable[Any]] = None, sample_ratio: float = 1.0,
+                 max_queue_size: int = 4096, batch_size: int = 256, flush_interval: float = 1.0):
+        self.exporters = list(exporters or [])
+        self.sample_ratio = sample_ratio
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        # Counters exposed through get_stats()
+        self._traces = 0
+        self._exported = 0
+        self._dropped = 0
+        self._failed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.exporters)
+
+    def configure(self, exporters: Iterable[Any], sample_ratio: float = 1.0):
+        """Replace the exporters and sampling ratio, e.g. from edgefoundry.yaml"""
+        self.exporters = list(exporters)
+        self.sample_ratio = sample_ratio
+
+    def get_exporter(self, exporter_type: type) -> Optional[Any]:
+        return next((e for e in self.exporters if isinstance(e, exporter_type)), None)
+
+    def start_trace(self, name: str, traceparent: Optional[str] = None,
+                    **attributes) -> Union[Span, NoopSpan]:
+        """
+        Root span of a request, continuing the caller's trace when traceparent is valid.
+        Returns NOOP_SPAN when the request is not sampled.
+        """
+        if not self.exporters:
+            return NOOP_SPAN
+        parent = parse_traceparent(traceparent)
+        if parent is not None:
+            trace_id, parent_span_id, sampled = parent
+        else:
+            trace_id, parent_span_id = "%032x" % random.getrandbits(128), None
+            sampled = random.random() < self.sample_ratio
+        if not sampled:
+            return NOOP_SPAN
+        with self._lock:
+            self._traces += 1
+        return Span(self, name, trace_id, parent_span_id, kind="server", attributes=attributes)
+
+    def span(self, name: str, **attributes) -> Union[Span, NoopSpan]:
+        """Child of the current span; use as a context manager"""
+        parent = current_span.get()
+        if parent is None:
+            return NOOP_SPAN
+        return Span(self, name, parent.trace_id, parent.span_id, attributes=attributes)
+
+    def record_span(self, name: str, start_ns: int, end_ns: int, parent: Optional[Span] = None,
+                    **attributes) -> Union[Span, NoopSpan]:
+        """
+        Record an already finished operation, such as a phase llama.cpp timed itself,
+        under parent (the current span by default)
+        """
+        parent = parent if parent is not None else current_span.get()
+        if parent is None or not parent.sampled:
+            return NOOP_SPAN
+        span = Span(self, name, parent.trace_id, parent.span_id, start_ns=start_ns, attributes=attributes)
+        span.end(end_ns)
+        return span
+
+    def _finish(self, span: Span):
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put_nowait(span.to_dict())
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+
+    def start(self):
+        """Start the export thread (idempotent)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        """Export queued spans and stop the export thread"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            self._queue.put(Tracer._STOP)
+            thread.join(timeout)
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """Wait until every span finished so far has been exported"""
+        if self._thread is None:
+            return True
+        flushed = threading.Event()
+        self._queue.put(flushed)
+        return flushed.wait(timeout)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            batch = []
+            flushed = None
+            while True:
+                if item is Tracer._STOP:
+                    stopping = True
+                    break
+                if isinstance(item, threading.Event):
+                    flushed = item
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._export(batch)
+            if flushed is not None:
+                flushed.set()
+
+    def _export(self, batch: List[Dict[str, Any]]):
+        for exporter in self.exporters:
+            try:
+                exporter.export(batch)
+            except Exception as e:
+                logger.error(f"{type(exporter).__name__} failed to export {len(batch)} spans: {e}")
+                with self._lock:
+                    self._failed += len(batch)
+        with self._lock:
+            self._exported += len(batch)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "sample_ratio": self.sample_ratio,
+                "exporters": [type(exporter).__name__ for exporter in self.exporters],
+                "traces": self._traces,
+                "spans_exported": self._exported,
+                "spans_dropped": self._dropped,
+                "export_failures": self._failed,
+                "pending": self._queue.qsize(),
+            }
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware that opens a root span for requests to the given paths, makes it
+    current while the app (including a streamed body) runs, and returns its
+    traceparent to the caller
+    """
+
+    def __init__(self, app, tracer: Tracer, paths: Iterable[str]):
+        self.app = app
+        self.tracer = tracer
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths or not self.tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = dict(scope["headers"]).get(b"traceparent")
+        span = self.tracer.start_trace(
+            f"{scope['method']} {scope['path']}",
+            traceparent.decode("latin-1") if traceparent else None,
+            **{"http.method": scope["method"], "http.route": scope["path"]}
+        )
+        if not span.sampled:
+            await self.app(scope, receive, send)
+            return
+
+        async def traced_send(message):
+            if message["type"] == "http.response.start":
+                span.set_attribute("http.status_code", message["status"])
+                if message["status"] >= 500:
+                    span.status = "error"
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"traceparent", span.traceparent().encode("latin-1"))
+                ]
+            await send(message)
+
+        with span:
+            await self.app(scope, receive, traced_send)
+
+
+# Global tracer; the agent adds exporters from the `tracing` section of edgefoundry.yaml
+tracer = Tracer()